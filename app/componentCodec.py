@@ -0,0 +1,131 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Conversion between Maya component strings and NumPy index arrays.
+    Selections are read unflattened, every "node.vtx[a:b]" range goes straight into a start/end
+    array pair and is expanded with NumPy. Index arrays or boolean masks go back to Maya
+    as the minimal list of contiguous "node.vtx[a:b]" ranges, selected in a single cmds.select.
+
+How to: (how to execute the core of this module)
+    selected = get_selected_components()             # {shape long name: vertex indices}
+    select_components({"|body|bodyShape": weights > 0.5})
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import re
+
+import numpy as np
+
+from maya import cmds
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+# node.component[start] or node.component[start:end], "*" for every element
+COMPONENT_PATTERN = re.compile(r"^(?P<node>[^.]+)\.(?P<component>\w+)\[(?P<start>\d+|\*)(?::(?P<end>\d+))?\]$")
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_index_runs(indices):
+    """
+        Split sorted unique indices into contiguous runs.
+
+        :return: (starts, ends) int arrays, ends inclusive
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if not indices.size:
+        return indices, indices
+
+    breaks = np.flatnonzero(np.diff(indices) != 1)
+    starts = indices[np.concatenate(([0], breaks + 1))]
+    ends = indices[np.concatenate((breaks, [indices.size - 1]))]
+    return starts, ends
+
+
+def to_indices(indices_or_mask):
+    """ Sorted unique indices from an index array or a boolean mask. """
+    values = np.asarray(indices_or_mask)
+    if values.dtype == bool:
+        return np.flatnonzero(values)
+    return np.unique(values.astype(np.int64))
+
+
+def parse_components(components, component="vtx"):
+    """
+        Parse unflattened component strings into index arrays.
+
+        :param components: e.g. ["body.vtx[0:1500]", "body.vtx[1502]", "cube.vtx[3:7]"]
+        :param component: component name to keep, other components are ignored
+        :return: {node: sorted unique int64 indices}
+    """
+    ranges = {}
+    for name in components:
+        match = COMPONENT_PATTERN.match(name)
+        if match is None or match.group("component") != component or match.group("start") == "*":
+            continue
+        start = int(match.group("start"))
+        end = int(match.group("end")) if match.group("end") is not None else start
+        ranges.setdefault(match.group("node"), []).append((start, end))
+
+    result = {}
+    for node, node_ranges in ranges.items():
+        bounds = np.array(node_ranges, dtype=np.int64)
+        lengths = bounds[:, 1] - bounds[:, 0] + 1
+        offsets = np.repeat(bounds[:, 0] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        result[node] = np.unique(np.arange(lengths.sum()) + offsets)
+
+    return result
+
+
+def format_components(node, indices_or_mask, component="vtx"):
+    """ Minimal list of "node.component[a:b]" range strings. """
+    starts, ends = get_index_runs(to_indices(indices_or_mask))
+    return ["{}.{}[{}:{}]".format(node, component, start, end) if start != end
+            else "{}.{}[{}]".format(node, component, start)
+            for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def get_selected_components(component="vtx"):
+    """
+        Selected components per shape, from one unflattened cmds.ls.
+
+        :return: {shape long name: sorted unique int64 indices}
+    """
+    selection = cmds.ls(selection=True, flatten=False) or []
+    result = {}
+    for node, indices in parse_components(selection, component).items():
+        shapes = cmds.ls(node, long=True, shapes=True) or \
+                 cmds.listRelatives(node, shapes=True, noIntermediate=True, fullPath=True) or []
+        if shapes:
+            result[shapes[0]] = np.union1d(result.get(shapes[0], indices), indices)
+
+    return result
+
+
+def select_components(indices_by_node, component="vtx", add=False, deselect=False):
+    """
+        Select (or deselect) components of several nodes in a single cmds.select call.
+
+        :param indices_by_node: {node: index array or boolean mask}
+        :return: the selected range strings
+    """
+    components = []
+    for node, indices_or_mask in indices_by_node.items():
+        components.extend(format_components(node, indices_or_mask, component))
+
+    if deselect:
+        if components:
+            cmds.select(components, deselect=True)
+    elif components:
+        cmds.select(components, add=add, replace=not add)
+    elif not add:
+        cmds.select(clear=True)
+
+    return components
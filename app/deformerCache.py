@@ -0,0 +1,255 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Persistent cache of per-geometry deformer stacks keyed by node UUID, along with the
+    influences/targets of the deformers that were expanded in the UI.
+    Entries are dropped by DG callbacks when one of the nodes they were built from
+    gets connected/disconnected, added back (undo), removed or renamed, so reselecting
+    an unchanged geometry only costs a dictionary lookup. The per-node callbacks only drop
+    entries, they stay registered until clear(): a callback cannot be removed from its own dispatch.
+
+How to: (how to execute the core of this module)
+    cache = DeformerCache(registry=callbackUtils.CallbackRegistry())
+    cache.install()
+    scene_query = cache.query_selection(cmds.ls(selection=True, long=True))
+    cache.uninstall()
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import meshDeformer
+from MeshDeformer.app.util import callbackUtils
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_uuids(names):
+    """
+        Return {name: (uuid, MObject)} for every existing node in names.
+    """
+    result = {}
+    for name in names:
+        # One list per name, a shared MSelectionList merges duplicates and shifts indices
+        selection_list = om.MSelectionList()
+        try:
+            selection_list.add(name)
+        except RuntimeError:
+            continue
+        node = selection_list.getDependNode(0)
+        result[name] = (om.MFnDependencyNode(node).uuid().asString(), node)
+
+    return result
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class DeformerCache:
+    # Attribute messages that can change a deformer stack or its target aliases, on any plug
+    INVALIDATING_ATTRIBUTE_MESSAGES = (om.MNodeMessage.kAttributeRenamed |
+                                       om.MNodeMessage.kAttributeAdded |
+                                       om.MNodeMessage.kAttributeRemoved)
+    # Element messages only count on the multi attributes listing influences, targets and inputs,
+    # the weightList/weights elements added by painting or setWeights keep the entries
+    ARRAY_MESSAGES = om.MNodeMessage.kAttributeArrayAdded | om.MNodeMessage.kAttributeArrayRemoved
+    ARRAY_ATTRIBUTES = frozenset(("matrix", "weight", "input", "inputTarget", "inputTargetGroup"))
+
+    # Entry of a selected node that is not a geometry (joint, locator, ...), so it is not queried again
+    NOT_GEOMETRY = None
+
+    # Registry owner of the scene wide callbacks, per-node callbacks are owned by the node uuid
+    CALLBACK_OWNER = "DeformerCache"
+
+    def __init__(self, registry=None):
+        """
+            :param registry: callbackUtils.CallbackRegistry the callbacks are registered in,
+                             a private one is created when None
+        """
+        self.registry = registry or callbackUtils.CallbackRegistry()
+        self._entries = {}          # geometry uuid -> GeometryRecord | ("children", deformer uuid) -> DeformerRecord
+        self._dependents = {}       # dependency uuid -> {entry keys}
+        self._dependencies = {}     # entry key -> {dependency uuids}
+        self._watched = set()       # uuids with per-node callbacks, kept until clear()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        # Optional callable run after entries were dropped, e.g. to schedule a UI refresh
+        self.on_invalidated = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, uuid):
+        return uuid in self._entries
+
+    # ------------------------------------------------------------------ callbacks
+    def install(self):
+        """ Register the scene wide DG callbacks, entries are only trusted while installed. """
+        if self.CALLBACK_OWNER in self.registry:
+            return
+
+        self.registry.add_messages([
+            om.MDGMessage.addConnectionCallback(self._on_connection),
+            om.MDGMessage.addNodeAddedCallback(self._on_node_added_or_removed, "dependNode"),
+            om.MDGMessage.addNodeRemovedCallback(self._on_node_added_or_removed, "dependNode"),
+        ], owner=self.CALLBACK_OWNER)
+
+    def uninstall(self):
+        """ Remove every callback and forget all entries. """
+        self.registry.remove_owner(self.CALLBACK_OWNER)
+        self.clear()
+
+    def _on_connection(self, src_plug, dst_plug, made, client_data):
+        if not self._dependents:
+            return
+        for plug in (src_plug, dst_plug):
+            self.invalidate(om.MFnDependencyNode(plug.node()).uuid().asString())
+
+    def _on_node_added_or_removed(self, node, client_data):
+        # Deleted nodes come back with their UUID on undo, both ways invalidate the stacks using them
+        if not self._dependents:
+            return
+        self.invalidate(om.MFnDependencyNode(node).uuid().asString())
+
+    def _on_attribute_changed(self, message, plug, other_plug, client_data):
+        if client_data not in self._dependents:
+            return
+        if message & self.INVALIDATING_ATTRIBUTE_MESSAGES:
+            self.invalidate(client_data)
+        elif message & self.ARRAY_MESSAGES and om.MFnAttribute(plug.attribute()).name in self.ARRAY_ATTRIBUTES:
+            self.invalidate(client_data)
+
+    def _on_name_changed(self, node, previous_name, client_data):
+        self.invalidate(client_data)
+
+    def _watch(self, uuid, node):
+        """ Per-node callbacks for renames and alias changes on a dependency. """
+        if uuid in self._watched:
+            return
+
+        self._watched.add(uuid)
+        self.registry.add_messages([
+            om.MNodeMessage.addNameChangedCallback(node, self._on_name_changed, uuid),
+            om.MNodeMessage.addAttributeChangedCallback(node, self._on_attribute_changed, uuid),
+        ], owner=uuid)
+
+    # ------------------------------------------------------------------ entries
+    def clear(self):
+        for uuid in self._watched:
+            self.registry.remove_owner(uuid)
+        self._watched.clear()
+        self._entries.clear()
+        self._dependents.clear()
+        self._dependencies.clear()
+
+    def invalidate(self, uuid):
+        """ Drop every entry built from the node with the given uuid. """
+        keys = self._dependents.get(uuid)
+        if not keys:
+            return
+
+        for key in list(keys):
+            self._entries.pop(key, None)
+            self.invalidations += 1
+
+            for dependency in self._dependencies.pop(key, ()):
+                dependents = self._dependents.get(dependency)
+                if dependents is None:
+                    continue
+                dependents.discard(key)
+                if not dependents:
+                    # Its callbacks stay registered, this may run from one of them
+                    del self._dependents[dependency]
+
+        if self.on_invalidated is not None:
+            self.on_invalidated()
+
+    def _store(self, key, value, dependencies):
+        self._entries[key] = value
+        self._dependencies[key] = set(dependencies)
+
+        for uuid, node in dependencies.items():
+            self._dependents.setdefault(uuid, set()).add(key)
+            self._watch(uuid, node)
+
+    def query_selection(self, selection):
+        """
+            Same result as DeformerUtils.query_selection with load_children=False, but only objects
+            missing from the cache are queried from the scene, in one batched SelectionQuery.
+
+            :param selection: list of long object names
+            :return: meshDeformer.SelectionQuery
+        """
+        selection_uuids = get_uuids(selection)
+
+        missing = [obj for obj in selection
+                   if obj in selection_uuids and selection_uuids[obj][0] not in self._entries]
+        self.hits += len(selection_uuids) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = meshDeformer.SelectionQuery(missing, load_children=False)
+
+            for obj in missing:
+                uuid = selection_uuids[obj][0]
+                record = fresh.records.get(obj)
+                if record is None:
+                    # Negative result, only a connection, rename or deletion of the node itself drops it
+                    self._store(uuid, self.NOT_GEOMETRY, {uuid: selection_uuids[obj][1]})
+                    continue
+
+                names = [obj] + fresh.shapes.get(obj, [])
+                names.extend(deformer.name for deformer in record.deformers)
+
+                dependencies = dict(get_uuids(names).values())
+                dependencies[uuid] = selection_uuids[obj][1]
+                self._store(uuid, record, dependencies)
+
+        result = meshDeformer.SelectionQuery([])
+        for obj in selection:
+            uuid = selection_uuids.get(obj, (None,))[0]
+            record = self._entries.get(uuid, self.NOT_GEOMETRY)
+            if record is self.NOT_GEOMETRY:
+                continue
+            result.objects.append(obj)
+            result.uuids[obj] = uuid
+            result.records[obj] = record
+            result.node_types[obj] = record.node_type
+
+        return result
+
+    def get_deformer_children(self, deformer, deformer_type):
+        """
+            Cached DeformerUtils.get_deformer_children, dropped with the deformer or any of the
+            influences it returned.
+
+            :return: meshDeformer.DeformerRecord with its children loaded
+        """
+        deformer_uuids = get_uuids([deformer])
+        if deformer not in deformer_uuids:
+            return meshDeformer.DeformerRecord(deformer, deformer_type, [])
+
+        uuid, node = deformer_uuids[deformer]
+        key = ("children", uuid)
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        record = meshDeformer.DeformerUtils.get_deformer_children(deformer, deformer_type)
+
+        dependencies = {uuid: node}
+        if deformer_type == meshDeformer.DeformerUtils.SKINCLUSTER:
+            dependencies.update(get_uuids(record.child_names).values())
+        self._store(key, record, dependencies)
+
+        return record
@@ -0,0 +1,353 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Item model of the "Geometries" panel.
+    The tree is a compact index of slotted nodes (object > deformer type > deformer > joint/target)
+    exposed through a QAbstractItemModel, so a QTreeView only creates and paints the visible rows.
+    Objects are inserted and removed with fine grained row signals, the children of
+    skinClusters and blendShapes are fetched on demand through fetchMore.
+    Every row carries a precomputed deformer type bitmask that DeformerFilterProxyModel
+    filters on, switching the type filter never touches the scene.
+    Joint rows show the vertex count, total and max weight of their influence. Painting a joint
+    row never reads the scene: it shows a placeholder and requests the stats, load_stats then
+    loads them for all the joints of a skinCluster at once through stats_loader, from the
+    scheduler on_stats_requested notifies.
+
+How to: (how to execute the core of this module)
+    model = DeformerTreeModel(children_loader=cache.get_deformer_children, stats_loader=stats_cache.get)
+    model.on_stats_requested = stats_scheduler.mark_dirty     # stats_scheduler runs model.load_stats
+    model.insert_object(0, "|body", DeformerUtils.get_deformers_from_object("|body"))
+    proxy = DeformerFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_deformer_types(["skinCluster"])
+    tree_view.setModel(proxy)
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+try:    # older DCC versions
+    from PySide2 import QtGui, QtCore
+except: # newer DCC versions
+    from PySide6 import QtGui, QtCore
+
+from MeshDeformer.app import meshDeformer
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class TreeNode:
+    """ One row of the deformer index. """
+    __slots__ = ("name", "kind", "parent", "children", "row", "data", "loaded", "mask", "index", "stats")
+
+    OBJECT = 0
+    TYPE = 1
+    DEFORMER = 2
+    CHILD = 3
+
+    def __init__(self, name, kind, parent=None, data=None, loaded=True, mask=0, index=-1):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.children = []
+        self.row = 0
+        self.data = data        # object long name, deformer type or None
+        self.loaded = loaded    # False until the lazy children of a deformer are fetched
+        self.mask = mask        # deformer type bits found in this row and below
+        self.index = index      # matrix or weight logical index of a joint/target row
+        self.stats = None       # (vertex count, total weight, max weight) of a joint row, None until loaded
+
+    def append(self, node):
+        node.parent = self
+        node.row = len(self.children)
+        self.children.append(node)
+        return node
+
+    def renumber(self, start=0):
+        for row in range(start, len(self.children)):
+            self.children[row].row = row
+
+
+class DeformerTreeModel(QtCore.QAbstractItemModel):
+    # Deformers whose children (joints, targets) are loaded on expand
+    LAZY_DEFORMER_TYPES = (meshDeformer.DeformerUtils.SKINCLUSTER, meshDeformer.DeformerUtils.BLENDSHAPE)
+
+    FullNameRole = QtCore.Qt.UserRole
+    DeformerTypeRole = QtCore.Qt.UserRole + 1
+    KindRole = QtCore.Qt.UserRole + 2
+    MaskRole = QtCore.Qt.UserRole + 3
+    LogicalIndexRole = QtCore.Qt.UserRole + 4
+    StatsRole = QtCore.Qt.UserRole + 5
+
+    STATS_FORMAT = "{}    {} vtx | {:.2f} | max {:.2f}"
+    # Joint row text until its stats are loaded
+    PENDING_STATS_FORMAT = "{}    ..."
+
+    def __init__(self, children_loader=None, stats_loader=None, parent=None):
+        """
+            :param children_loader: callable(deformer, deformer_type) returning a DeformerRecord
+                                    with its joints or targets loaded
+            :param stats_loader: callable(skin_cluster) returning {matrix logical index:
+                                 (vertex count, total weight, max weight)}, no joint stats when None
+        """
+        super(DeformerTreeModel, self).__init__(parent)
+        self.root = TreeNode("", None)
+        self.objects = {}   # object long name -> TreeNode
+        self.children_loader = children_loader or meshDeformer.DeformerUtils.get_deformer_children
+        self.stats_loader = stats_loader
+        self.icons = {}     # node type ("mesh", "nurbsSurface", "joint") -> QIcon
+        self.default_icon = QtGui.QIcon()
+
+        # skinCluster rows whose joint stats were requested by a paint, loaded by load_stats
+        self._requested_stats = set()
+        # Optional callable() run when a first joint stats request comes in
+        self.on_stats_requested = None
+
+    # ------------------------------------------------------------------ index
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def node_index(self, node, column=0):
+        if node is self.root or node is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, column, node)
+
+    def object_index(self, obj):
+        return self.node_index(self.objects.get(obj))
+
+    def is_skin_joint(self, node):
+        return node.kind == TreeNode.CHILD and node.data == meshDeformer.DeformerUtils.SKINCLUSTER
+
+    def get_stats(self, node):
+        """ Loaded stats of a joint row, None until then: the stats of its skinCluster are requested. """
+        if node.stats is None and self.stats_loader is not None and node.parent not in self._requested_stats:
+            self._requested_stats.add(node.parent)
+            if self.on_stats_requested is not None:
+                self.on_stats_requested()
+        return node.stats
+
+    def is_attached(self, node):
+        """ False once the object row of node was removed from the model. """
+        while node.kind != TreeNode.OBJECT:
+            node = node.parent
+        return self.objects.get(node.data[0]) is node
+
+    def load_stats(self):
+        """ Load the requested joint stats, one stats_loader call and one dataChanged per skinCluster row. """
+        deformer_nodes, self._requested_stats = self._requested_stats, set()
+        for deformer_node in deformer_nodes:
+            if not deformer_node.children or not self.is_attached(deformer_node):
+                continue
+
+            stats = self.stats_loader(deformer_node.name)
+            for child in deformer_node.children:
+                child.stats = stats.get(child.index, (0, 0.0, 0.0))
+            self.dataChanged.emit(self.node_index(deformer_node.children[0]),
+                                  self.node_index(deformer_node.children[-1]),
+                                  [QtCore.Qt.DisplayRole, self.StatsRole])
+
+    @staticmethod
+    def get_object_name(index):
+        """ Long name of the object row an index belongs to. """
+        node = index.internalPointer()
+        while node is not None and node.kind != TreeNode.OBJECT:
+            node = node.parent
+        return node.data[0] if node is not None else None
+
+    # ------------------------------------------------------------------ model interface
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        parent_node = self._node(parent)
+        if column != 0 or not 0 <= row < len(parent_node.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, parent_node.children[row])
+
+    def parent(self, index=QtCore.QModelIndex()):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.node_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        return bool(node.children) or not node.loaded
+
+    def canFetchMore(self, parent):
+        return not self._node(parent).loaded
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node.loaded:
+            return
+
+        node.loaded = True
+        record = self.children_loader(node.name, node.data)
+        names = record.child_names or ()
+        if not names:
+            # Drops the placeholder arrow
+            self.dataChanged.emit(parent, parent)
+            return
+
+        self.beginInsertRows(parent, 0, len(names) - 1)
+        for name, logical_index in zip(names, record.child_indices):
+            node.append(TreeNode(name, TreeNode.CHILD, data=node.data, mask=node.mask, index=logical_index))
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole and section == 0:
+            return "Geometries"
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            if self.stats_loader is not None and self.is_skin_joint(node):
+                stats = self.get_stats(node)
+                if stats is None:
+                    return self.PENDING_STATS_FORMAT.format(node.name)
+                return self.STATS_FORMAT.format(node.name, *stats)
+            return node.name
+
+        if role == QtCore.Qt.DecorationRole:
+            if node.kind == TreeNode.OBJECT:
+                return self.icons.get(node.data[1], self.default_icon)
+            if self.is_skin_joint(node):
+                return self.icons.get("joint")
+            return None
+
+        if role == self.FullNameRole:
+            return node.data[0] if node.kind == TreeNode.OBJECT else node.name
+
+        if role == self.DeformerTypeRole:
+            return node.data if node.kind in (TreeNode.TYPE, TreeNode.DEFORMER, TreeNode.CHILD) else None
+
+        if role == self.KindRole:
+            return node.kind
+
+        if role == self.MaskRole:
+            return node.mask
+
+        if role == self.LogicalIndexRole:
+            return node.index
+
+        if role == self.StatsRole:
+            return self.get_stats(node) if self.is_skin_joint(node) else None
+
+        return None
+
+    # ------------------------------------------------------------------ edition
+    def build_object_node(self, obj, record):
+        """ Build the detached index of obj from its GeometryRecord: object > deformer type > deformer. """
+        obj_node = TreeNode(obj.split('|')[-1], TreeNode.OBJECT, data=(obj, record.node_type), mask=record.mask)
+
+        for deformer_type, deformer_list in record.by_type().items():
+            mask = deformer_list[0].mask
+            lazy = deformer_type in self.LAZY_DEFORMER_TYPES
+
+            type_node = obj_node.append(TreeNode(deformer_type, TreeNode.TYPE, data=deformer_type, mask=mask))
+            for deformer in deformer_list:
+                deformer_node = type_node.append(TreeNode(deformer.name, TreeNode.DEFORMER, data=deformer_type,
+                                                          loaded=not lazy, mask=mask))
+                if lazy and deformer.loaded:
+                    deformer_node.loaded = True
+                    for name, logical_index in zip(deformer.child_names, deformer.child_indices):
+                        deformer_node.append(TreeNode(name, TreeNode.CHILD, data=deformer_type, mask=mask,
+                                                      index=logical_index))
+
+        return obj_node
+
+    def insert_object(self, row, obj, record):
+        """ Insert obj at row with a single rowsInserted signal, return its index. """
+        row = max(0, min(row, len(self.root.children)))
+        obj_node = self.build_object_node(obj, record)
+        obj_node.parent = self.root
+
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.root.children.insert(row, obj_node)
+        self.root.renumber(row)
+        self.objects[obj] = obj_node
+        self.endInsertRows()
+
+        return self.node_index(obj_node)
+
+    def remove_object(self, obj):
+        """ Remove obj with a single rowsRemoved signal, return the row it had. """
+        obj_node = self.objects.pop(obj)
+        row = obj_node.row
+
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.root.children[row]
+        self.root.renumber(row)
+        self.endRemoveRows()
+
+        return row
+
+    def invalidate_stats(self, deformers):
+        """ Drop the joint stats of the deformers with one dataChanged per loaded deformer row, requested again on paint. """
+        deformers = set(deformers)
+        for obj_node in self.objects.values():
+            for type_node in obj_node.children:
+                if type_node.data != meshDeformer.DeformerUtils.SKINCLUSTER:
+                    continue
+                for deformer_node in type_node.children:
+                    if deformer_node.name not in deformers or not deformer_node.children:
+                        continue
+                    for child in deformer_node.children:
+                        child.stats = None
+                    self.dataChanged.emit(self.node_index(deformer_node.children[0]),
+                                          self.node_index(deformer_node.children[-1]),
+                                          [QtCore.Qt.DisplayRole, self.StatsRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self.root.children = []
+        self.objects = {}
+        self._requested_stats = set()
+        self.endResetModel()
+
+
+class DeformerFilterProxyModel(QtCore.QSortFilterProxyModel):
+    """ Client side deformer type filter, one bitwise AND per row against the source TreeNode mask.
+        Object rows are always shown by the "All" filter. """
+
+    def __init__(self, parent=None):
+        super(DeformerFilterProxyModel, self).__init__(parent)
+        self.type_mask = meshDeformer.DeformerUtils.ALL_DEFORMER_TYPES_MASK
+        self.setDynamicSortFilter(True)
+
+    def set_deformer_types(self, deformer_types):
+        self.set_type_mask(meshDeformer.DeformerUtils.get_type_mask(deformer_types))
+
+    def set_type_mask(self, mask):
+        if mask == self.type_mask:
+            return
+        self.type_mask = mask
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        parent_node = source_parent.internalPointer() if source_parent.isValid() else self.sourceModel().root
+        node = parent_node.children[source_row]
+        # "All" shows every selected object, undeformed ones (mask 0) included
+        if node.kind == TreeNode.OBJECT and self.type_mask == meshDeformer.DeformerUtils.ALL_DEFORMER_TYPES_MASK:
+            return True
+        return bool(node.mask & self.type_mask)
@@ -0,0 +1,245 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Per-vertex weights of wrap, proximityWrap, deltaMush, cluster and blendShape (base or target)
+    deformers as float32 NumPy arrays.
+    The whole array is read with one multi-index getAttr and written back with one ranged setAttr,
+    every weight operation (Set Value, Invert, Clear, ...) then runs vectorized on the array.
+
+How to: (how to execute the core of this module)
+    weights = DeformerWeights("deltaMush1", "|body").read()
+    weights.invert()
+    weights.smooth(meshTopology.MeshTopology.from_mesh("|body"), iterations=2)
+    weights.write()
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+
+from maya import cmds
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import meshDeformer
+from MeshDeformer.app import componentCodec
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_geometry_path(geometry):
+    """ MDagPath of a geometry (transform or shape) name. """
+    selection_list = om.MSelectionList()
+    selection_list.add(geometry)
+    dag_path = selection_list.getDagPath(0)
+    if dag_path.hasFn(om.MFn.kTransform):
+        dag_path.extendToShape()
+    return dag_path
+
+
+def set_weight_runs(plug, indices, values):
+    """
+        Write values on the elements indices of a weight multi, one ranged setAttr per contiguous run.
+
+        :param plug: weight multi attribute (DeformerWeights.plug)
+        :param indices: sorted unique vertex indices
+        :param values: weights of indices, same length
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    starts, ends = componentCodec.get_index_runs(indices)
+    offsets = np.searchsorted(indices, starts)
+    for start, end, offset in zip(starts.tolist(), ends.tolist(), offsets.tolist()):
+        run = values[offset:offset + end - start + 1].tolist()
+        cmds.setAttr("{}[{}:{}]".format(plug, start, end), *run, size=len(run))
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class DeformerWeights:
+    # Deformers with a weightList[geometry].weights multi
+    WEIGHT_LIST_TYPES = (
+        meshDeformer.DeformerUtils.CLUSTER,
+        meshDeformer.DeformerUtils.WRAP,
+        meshDeformer.DeformerUtils.PROXIMITYWRAP,
+        meshDeformer.DeformerUtils.DELTAMUSH,
+        meshDeformer.DeformerUtils.LATTICE,
+        meshDeformer.DeformerUtils.WIRE,
+    )
+    SUPPORTED_TYPES = WEIGHT_LIST_TYPES + (meshDeformer.DeformerUtils.BLENDSHAPE,)
+
+    # Value of the weight elements Maya does not store
+    DEFAULT_WEIGHT = 1.0
+
+    def __init__(self, deformer, geometry=None, target=None):
+        """
+            :param deformer: deformer name
+            :param geometry: deformed transform or shape, the first geometry of the deformer when None
+            :param target: blendShape target weight index, None for the blendShape base weights
+        """
+        self.deformer = deformer
+        self.deformer_type = cmds.nodeType(deformer)
+        if self.deformer_type not in self.SUPPORTED_TYPES:
+            raise TypeError("{} ({}) has no per-vertex weights".format(deformer, self.deformer_type))
+
+        self.geometry, self.geometry_index = self._resolve_geometry(deformer, geometry)
+        self.target = target
+        self.vertex_count = om.MItGeometry(get_geometry_path(self.geometry)).count()
+        self.weights = None
+
+    def __repr__(self):
+        return "DeformerWeights({!r}, {!r}, target={!r})".format(self.deformer, self.geometry, self.target)
+
+    def __len__(self):
+        return self.vertex_count
+
+    @staticmethod
+    def _resolve_geometry(deformer, geometry):
+        """ Return the (shape, logical geometry index) of geometry in deformer. """
+        shapes = cmds.ls(cmds.deformer(deformer, query=True, geometry=True) or [], long=True)
+        indices = cmds.deformer(deformer, query=True, geometryIndices=True) or []
+        if not shapes:
+            raise RuntimeError("{} does not deform any geometry".format(deformer))
+
+        if geometry is None:
+            return shapes[0], indices[0]
+
+        candidates = set(cmds.ls(geometry, long=True))
+        candidates.update(cmds.listRelatives(geometry, shapes=True, fullPath=True) or [])
+        for shape, index in zip(shapes, indices):
+            if shape in candidates:
+                return shape, index
+
+        raise RuntimeError("{} does not deform {}".format(deformer, geometry))
+
+    @property
+    def plug(self):
+        """ Multi attribute holding the weights. """
+        if self.deformer_type == meshDeformer.DeformerUtils.BLENDSHAPE:
+            if self.target is None:
+                return "{}.inputTarget[{}].baseWeights".format(self.deformer, self.geometry_index)
+            return "{}.inputTarget[{}].inputTargetGroup[{}].targetWeights".format(
+                self.deformer, self.geometry_index, self.target)
+
+        return "{}.weightList[{}].weights".format(self.deformer, self.geometry_index)
+
+    @property
+    def is_default(self):
+        """ True when every weight still has the value Maya creates the deformer with. """
+        return self.weights is not None and bool(np.all(self.weights == self.DEFAULT_WEIGHT))
+
+    # ------------------------------------------------------------------ io
+    def read(self):
+        """ Read the whole weight array, elements Maya does not store get DEFAULT_WEIGHT. """
+        weights = np.full(self.vertex_count, self.DEFAULT_WEIGHT, dtype=np.float32)
+
+        plug = self.plug
+        indices = cmds.getAttr(plug, multiIndices=True) or []
+        if indices:
+            values = cmds.getAttr(plug)
+            # A single element comes back as a bare float
+            values = np.atleast_1d(np.asarray(values, dtype=np.float32)).ravel()
+            indices = np.asarray(indices, dtype=np.int64)
+            valid = indices < self.vertex_count
+            weights[indices[valid]] = values[:len(indices)][valid]
+
+        self.weights = weights
+        return self
+
+    def write(self, indices=None):
+        """
+            Write the weights back to the deformer.
+
+            :param indices: sorted vertex indices to write, the whole array in one setAttr when None,
+                            otherwise one ranged setAttr per contiguous run
+        """
+        if self.weights is None:
+            raise RuntimeError("{} has no weights loaded, call read() first".format(self))
+
+        if indices is None:
+            set_weight_runs(self.plug, np.arange(self.vertex_count), self.weights)
+        else:
+            indices = np.unique(np.asarray(indices, dtype=np.int64))
+            set_weight_runs(self.plug, indices, self.weights[indices])
+
+        return self
+
+    # ------------------------------------------------------------------ operations
+    def _select(self, indices):
+        """ Index usable on self.weights, every vertex when indices is None. """
+        if self.weights is None:
+            self.read()
+        return slice(None) if indices is None else np.asarray(indices, dtype=np.int64)
+
+    def set_weights(self, values, indices=None):
+        """ Assign values (scalar or array) to the given vertices. """
+        selection = self._select(indices)
+        self.weights[selection] = np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0)
+        return self
+
+    def set_value(self, value, indices=None):
+        return self.set_weights(value, indices)
+
+    def invert(self, indices=None):
+        selection = self._select(indices)
+        return self.set_weights(1.0 - self.weights[selection], indices)
+
+    def clear(self, indices=None):
+        return self.set_weights(0.0, indices)
+
+    def reset(self, indices=None):
+        return self.set_weights(self.DEFAULT_WEIGHT, indices)
+
+    def scale(self, factor, indices=None):
+        selection = self._select(indices)
+        return self.set_weights(self.weights[selection] * factor, indices)
+
+    def smooth(self, topology, iterations=1, strength=1.0, indices=None):
+        """
+            Laplacian smooth, vertices outside indices are pinned.
+
+            :param topology: meshTopology.MeshTopology of the deformed mesh
+        """
+        self._select(indices)
+        pinned = None
+        if indices is not None:
+            pinned = np.ones(self.vertex_count, dtype=bool)
+            pinned[np.asarray(indices, dtype=np.int64)] = False
+        return self.set_weights(topology.smooth(self.weights, iterations, strength, pinned))
+
+    def mirror(self, symmetry_map, source=1):
+        """
+            Copy the source side weights onto the other side.
+
+            :param symmetry_map: symmetry.SymmetryMap of the deformed mesh
+            :param source: SymmetryMap.POSITIVE (left to right) or SymmetryMap.NEGATIVE (right to left)
+        """
+        self._select(None)
+        return self.set_weights(symmetry_map.mirror(self.weights, source))
+
+    def flip(self, symmetry_map):
+        self._select(None)
+        return self.set_weights(symmetry_map.flip(self.weights))
+
+    def copy(self):
+        """ Detached float32 copy of the weights. """
+        if self.weights is None:
+            self.read()
+        return self.weights.copy()
+
+    def paste(self, values, indices=None):
+        """ Paste a full array (indices None) or values for the given vertices. """
+        values = np.asarray(values, dtype=np.float32)
+        if indices is None and values.shape != (self.vertex_count,):
+            raise ValueError("Expected {} weights, got {}".format(self.vertex_count, values.shape))
+        return self.set_weights(values, indices)
+
+    def indices_above(self, threshold):
+        """ Vertex indices whose weight is strictly greater than threshold. """
+        if self.weights is None:
+            self.read()
+        return np.flatnonzero(self.weights > threshold)
@@ -0,0 +1,123 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Per influence vertex count, total weight and max weight of skinClusters, shown on the joint
+    rows of the deformer tree. The stats of a skinCluster come from one SkinWeights.influence_stats
+    pass over its nonzero weights, are cached by skinCluster UUID and dropped when an attribute
+    changed callback reports a weight or matrix edit on it (painting, setWeights, new influences).
+    The callback only drops the entry, it stays registered until clear(): removing a callback
+    from its own dispatch is not safe.
+
+How to: (how to execute the core of this module)
+    cache = InfluenceStatsCache(registry=callbackUtils.CallbackRegistry())
+    stats = cache.get("skinCluster1")       # {matrix logical index: (vertex count, total, max)}
+    cache.clear()
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import deformerCache
+from MeshDeformer.app import skinWeights
+from MeshDeformer.app.util import callbackUtils
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class InfluenceStatsCache:
+    # skinCluster attributes whose edits change the stats
+    WEIGHT_ATTRIBUTES = frozenset(("weightList", "weights", "matrix"))
+    DIRTY_MESSAGES = (om.MNodeMessage.kAttributeSet |
+                      om.MNodeMessage.kAttributeArrayAdded |
+                      om.MNodeMessage.kAttributeArrayRemoved |
+                      om.MNodeMessage.kConnectionMade |
+                      om.MNodeMessage.kConnectionBroken)
+
+    # Registry owner prefix of the per skinCluster callbacks
+    CALLBACK_OWNER = "InfluenceStats"
+
+    def __init__(self, registry=None):
+        """
+            :param registry: callbackUtils.CallbackRegistry the callbacks are registered in,
+                             a private one is created when None
+        """
+        self.registry = registry or callbackUtils.CallbackRegistry()
+        self._entries = {}      # skinCluster uuid -> {logical index: (vertex count, total, max)}
+        self._watched = set()   # skinCluster uuids with a registered attribute changed callback
+
+        self.hits = 0
+        self.misses = 0
+
+        # Optional callable(skin_cluster) run when the stats of a skinCluster are dropped
+        self.on_dirty = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, uuid):
+        return uuid in self._entries
+
+    def _owner(self, uuid):
+        return (self.CALLBACK_OWNER, uuid)
+
+    def _on_attribute_changed(self, message, plug, other_plug, client_data):
+        if not message & self.DIRTY_MESSAGES or client_data not in self._entries:
+            return
+        if om.MFnAttribute(plug.attribute()).name in self.WEIGHT_ATTRIBUTES:
+            self.mark_dirty(client_data, om.MFnDependencyNode(plug.node()).name())
+
+    def mark_dirty(self, uuid, skin_cluster=None):
+        """ Drop the stats of a skinCluster, they are recomputed on the next get. """
+        if self._entries.pop(uuid, None) is None:
+            return
+        if self.on_dirty is not None and skin_cluster is not None:
+            self.on_dirty(skin_cluster)
+
+    def invalidate(self, skin_cluster):
+        """ mark_dirty by name, for writes that may not send attribute messages (MFnSkinCluster.setWeights). """
+        uuids = deformerCache.get_uuids([skin_cluster])
+        if skin_cluster in uuids:
+            self.mark_dirty(uuids[skin_cluster][0], skin_cluster)
+
+    def get(self, skin_cluster):
+        """
+            Cached stats of skin_cluster.
+
+            :return: {matrix logical index: (vertex count, total weight, max weight)}
+        """
+        uuids = deformerCache.get_uuids([skin_cluster])
+        if skin_cluster not in uuids:
+            return {}
+
+        uuid, node = uuids[skin_cluster]
+        if uuid in self._entries:
+            self.hits += 1
+            return self._entries[uuid]
+
+        self.misses += 1
+        weights = skinWeights.SkinWeights.read(skin_cluster)
+        counts, totals, maxima = weights.influence_stats()
+        stats = {index: (count, total, maximum) for index, count, total, maximum
+                 in zip(weights.influence_indices.tolist(), counts.tolist(), totals.tolist(), maxima.tolist())}
+
+        self._entries[uuid] = stats
+        if uuid not in self._watched:
+            self._watched.add(uuid)
+            self.registry.add_message(om.MNodeMessage.addAttributeChangedCallback(node, self._on_attribute_changed,
+                                                                                  uuid),
+                                      owner=self._owner(uuid))
+        return stats
+
+    def clear(self):
+        for uuid in self._watched:
+            self.registry.remove_owner(self._owner(uuid))
+        self._watched.clear()
+        self._entries.clear()
@@ -16,15 +16,53 @@ Dependencies:  maya
 
 # ---------------------------------------------------------------------------- #
 # ----------------------------------------------------------------- IMPORTS -- #
+import array
+import sys
 
-import pprint
 from maya import cmds
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
 
 # ---------------------------------------------------------------------------- #
 # ----------------------------------------------------------------- GLOBALS -- #
 
 # ---------------------------------------------------------------------------- #
 # --------------------------------------------------------------- FUNCTIONS -- #
+def get_logical_index(plug_name):
+    """ "skinCluster1.matrix[12]" or "weight[12]" -> 12 """
+    return int(plug_name.rpartition("[")[2].rstrip("]"))
+
+
+def parse_alias_list(alias_pairs):
+    """
+        Split [(alias, attribute), ...] into the target names and weight indices of a blendShape.
+        Aliases of anything else than weight[i] are skipped.
+    """
+    names = []
+    indices = []
+    for alias, attribute in alias_pairs:
+        if alias and attribute.startswith("weight["):
+            names.append(alias)
+            indices.append(get_logical_index(attribute))
+
+    return names, indices
+
+
+def parse_matrix_connections(connections):
+    """
+        Group the flat result of listConnections(skin.matrix, connections=True) into
+        {skinCluster: ([influences], [matrix indices])} sorted by matrix index.
+    """
+    indexed = {}
+    for plug, influence in zip(connections[::2], connections[1::2]):
+        indexed.setdefault(plug.partition(".")[0], []).append((get_logical_index(plug), influence))
+
+    result = {}
+    for skin_cluster, pairs in indexed.items():
+        pairs.sort()
+        result[skin_cluster] = ([influence for _, influence in pairs], [index for index, _ in pairs])
+
+    return result
 
 # ---------------------------------------------------------------------------- #
 # ----------------------------------------------------------------- CLASSES -- #
@@ -51,70 +89,431 @@ class DeformerUtils:
         WIRE
     ]
 
+    # One bit per deformer type, used to filter the UI without querying the scene
+    DEFORMER_TYPE_BITS = {deformer: 1 << i for i, deformer in enumerate(VALID_DEFORMERS_TYPES)}
+    ALL_DEFORMER_TYPES_MASK = (1 << len(VALID_DEFORMERS_TYPES)) - 1
+
+    @classmethod
+    def get_type_mask(cls, deformer_types):
+        """ Bitmask of the given deformer types. """
+        mask = 0
+        for deformer_type in deformer_types:
+            mask |= cls.DEFORMER_TYPE_BITS.get(deformer_type, 0)
+        return mask
+
+    # Discovery engines for get_deformers_from_object
+    ENGINE_CMDS = "cmds"
+    ENGINE_API = "api"
+    engine = ENGINE_API
+
+    # Maya API modules used by the "api" engine, swappable with an in-memory
+    # stand-in (see util.benchmarkUtils) to benchmark the walk outside a scene.
+    api = om
+    api_anim = oma
+
     @classmethod
-    def get_deformers_from_object(cls, obj):
+    def get_deformers_from_object(cls, obj, engine=None):
         """ Get deformers from a given object by checking its history.
-            Returns a dictionary with deformer types as keys and lists of deformer names as values."""
-        result = {deformer: [] for deformer in cls.VALID_DEFORMERS_TYPES}
-        
+            Returns a GeometryRecord holding one DeformerRecord per deformer found.
+
+            :param obj: transform or shape name
+            :param engine: ENGINE_API (single OpenMaya graph walk) or ENGINE_CMDS
+                           (listHistory + nodeType), defaults to cls.engine
+        """
+        engine = engine or cls.engine
+
+        if engine == cls.ENGINE_API:
+            return cls._get_deformers_from_object_api(obj)
+
+        if engine == cls.ENGINE_CMDS:
+            return cls._get_deformers_from_object_cmds(obj)
+
+        raise ValueError("Unknown deformer discovery engine: {}".format(engine))
+
+    @classmethod
+    def _get_deformers_from_object_cmds(cls, obj):
+        """ Original discovery path, one cmds.nodeType call per history node. """
         if not obj or not cmds.objExists(obj):
-            return result
+            return GeometryRecord(obj or "", None)
         
         object_history = cmds.listHistory(obj, pruneDagObjects=True) or []
+        deformers = []
         
         for node in object_history:
             node_type = cmds.nodeType(node)
             
             if node_type in cls.VALID_DEFORMERS_TYPES:
                 if node_type == cls.SKINCLUSTER:
-                    joints = cmds.skinCluster(node, query=True, influence=True) or []
-                    result[node_type].append({"name": node, "joints": joints})
+                    connections = cmds.listConnections(node + ".matrix", source=True, destination=False,
+                                                       connections=True) or []
+                    joints, indices = parse_matrix_connections(connections).get(node, ([], []))
+                    deformers.append(DeformerRecord(node, node_type, joints, indices))
                     
                 elif node_type == cls.BLENDSHAPE:
                     aliases = cmds.aliasAttr(node, query=True) or []
                     # aliases is a flat list: [alias1, attr1, alias2, attr2, ...]
-                    # We want only the alias names for weight attributes
-                    targets = []
-
-                    for i in range(0, len(aliases), 2):
-                        if aliases[i] and aliases[i] != '':
-                            targets.append(aliases[i])
-                    result[node_type].append({"name": node, "targets": targets})
+                    targets, indices = parse_alias_list(zip(aliases[::2], aliases[1::2]))
+                    deformers.append(DeformerRecord(node, node_type, targets, indices))
                                     
                 else:
-                    result[node_type].append(node)
+                    deformers.append(DeformerRecord(node, node_type))
                 
-        return result
+        shapes = cmds.listRelatives(obj, shapes=True, noIntermediate=True, fullPath=True) or [obj]
+        return GeometryRecord(obj, cmds.nodeType(shapes[0]), deformers)
+
+    @classmethod
+    def _get_deformers_from_object_api(cls, obj):
+        """ Single upstream MItDependencyGraph walk keeping the geometryFilter nodes.
+            The walk is pruned at every DAG node but the object's shapes, like
+            listHistory(pruneDagObjects=True): the deformers of wrap drivers, live blendShape
+            target meshes or influences are not reported.
+            No MEL command is issued, influences and targets are read from the API as well."""
+        if not obj:
+            return GeometryRecord("", None)
+
+        api = cls.api
+        selection_list = api.MSelectionList()
+        try:
+            selection_list.add(obj)
+        except RuntimeError:
+            return GeometryRecord(obj, None)
+
+        deformers = []
+        visited = set()
+        roots = cls._get_history_roots(selection_list)
+        for root in roots:
+            # No type filter, filtered nodes are skipped before they can be pruned
+            iterator = api.MItDependencyGraph(root,
+                                              api.MFn.kInvalid,
+                                              api.MItDependencyGraph.kUpstream,
+                                              api.MItDependencyGraph.kDepthFirst,
+                                              api.MItDependencyGraph.kNodeLevel)
+            while not iterator.isDone():
+                node = iterator.currentNode()
+                if node.hasFn(api.MFn.kDagNode) and node != root:
+                    iterator.prune()
+                    iterator.next()
+                    continue
+                iterator.next()
+
+                if not node.hasFn(api.MFn.kGeometryFilt):
+                    continue
+
+                node_fn = api.MFnDependencyNode(node)
+                node_type = node_fn.typeName
+                if node_type not in cls.DEFORMER_TYPE_BITS:
+                    continue
+
+                name = node_fn.name()
+                if name in visited:
+                    continue
+                visited.add(name)
+
+                deformers.append(cls._get_deformer_record_api(node, name, node_type))
+
+        node_type = api.MFnDependencyNode(roots[0]).typeName if roots else None
+        return GeometryRecord(obj, node_type, deformers)
+
+    @classmethod
+    def _get_history_roots(cls, selection_list):
+        """ Return the nodes the upstream walk starts from.
+            Transforms are replaced by their non-intermediate shapes, the way listHistory does."""
+        api = cls.api
+        try:
+            dag_path = selection_list.getDagPath(0)
+        except (RuntimeError, TypeError):
+            return [selection_list.getDependNode(0)]
+
+        if not dag_path.hasFn(api.MFn.kTransform):
+            return [dag_path.node()]
+
+        roots = []
+        for i in range(dag_path.numberOfShapesDirectlyBelow()):
+            shape_path = api.MDagPath(dag_path)
+            shape_path.extendToShape(i)
+            if not api.MFnDagNode(shape_path).isIntermediateObject:
+                roots.append(shape_path.node())
+
+        return roots
+
+    @classmethod
+    def _get_deformer_record_api(cls, node, name, node_type):
+        """ DeformerRecord of a deformer MObject, skinCluster influences and blendShape targets included. """
+        if node_type == cls.SKINCLUSTER:
+            # Matches cmds.skinCluster(query=True, influence=True), with the matrix indices
+            skin_fn = cls.api_anim.MFnSkinCluster(node)
+            paths = skin_fn.influenceObjects()
+            return DeformerRecord(name, node_type,
+                                  [path.partialPathName() for path in paths],
+                                  [skin_fn.indexForInfluenceObject(path) for path in paths])
+
+        if node_type == cls.BLENDSHAPE:
+            # Matches the weight aliases of cmds.aliasAttr(query=True)
+            targets, indices = parse_alias_list(cls.api.MFnDependencyNode(node).getAliasList())
+            return DeformerRecord(name, node_type, targets, indices)
+
+        return DeformerRecord(name, node_type)
+
+    @classmethod
+    def get_deformer_children(cls, deformer, deformer_type):
+        """ DeformerRecord of a deformer with its influences (skinCluster) or targets (blendShape) loaded.
+            Used to load the tree children of a deformer on demand."""
+        selection_list = cls.api.MSelectionList()
+        try:
+            selection_list.add(deformer)
+        except RuntimeError:
+            return DeformerRecord(deformer, deformer_type, [])
+
+        return cls._get_deformer_record_api(selection_list.getDependNode(0), deformer, deformer_type)
 
     @classmethod
     def get_deformers_from_selection(cls, selection=None):
         """ Get deformers from the current selection or a provided selection.
-            Returns a dictionary with object names as keys and lists of deformer names as values."""
+            Returns a dictionary with object names as keys and GeometryRecords as values."""
+        return cls.query_selection(selection).records
+
+    @classmethod
+    def query_selection(cls, selection=None):
+        """ Run one batched SelectionQuery over the current selection or a provided selection. """
         if selection is None:
             selection = cmds.ls(selection=True, long=True)
-        results = {}
-        
-        if not selection:
-            return results
-        
-        valid_types = {"mesh", "nurbsSurface"}
-        filtered_selection = []
 
-        for obj in selection:
-            shapes = cmds.listRelatives(obj, shapes=True, fullPath=True) or []
+        return SelectionQuery(selection or [])
+
+
+class InfluenceRecord:
+    """ A skinCluster influence and its matrix logical index. """
+    __slots__ = ("name", "index")
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class TargetRecord:
+    """ A blendShape target and its weight logical index. """
+    __slots__ = ("name", "index")
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class DeformerRecord:
+    """
+        A deformer of a geometry.
+        Children (influences or targets) are stored as a tuple of interned names and an
+        array of logical indices, child_names is None while they are not loaded.
+    """
+    __slots__ = ("name", "type", "child_names", "child_indices")
+
+    CHILD_RECORDS = {
+        DeformerUtils.SKINCLUSTER: InfluenceRecord,
+        DeformerUtils.BLENDSHAPE: TargetRecord,
+    }
+
+    def __init__(self, name, deformer_type, child_names=None, child_indices=None):
+        self.name = sys.intern(name)
+        self.type = deformer_type
+        self.child_names = None
+        self.child_indices = None
+
+        if child_names is not None:
+            self.set_children(child_names, child_indices)
+
+    def __repr__(self):
+        return "DeformerRecord({!r}, {!r})".format(self.name, self.type)
+
+    @property
+    def loaded(self):
+        return self.child_names is not None
+
+    @property
+    def mask(self):
+        return DeformerUtils.DEFORMER_TYPE_BITS.get(self.type, 0)
+
+    def set_children(self, names, indices=None):
+        self.child_names = tuple(sys.intern(name) for name in names)
+        self.child_indices = array.array("i", range(len(self.child_names)) if indices is None else indices)
+
+    def children(self):
+        """ InfluenceRecords or TargetRecords built from the array fields. """
+        record_class = self.CHILD_RECORDS.get(self.type)
+        if record_class is None or not self.loaded:
+            return []
+        return [record_class(name, index) for name, index in zip(self.child_names, self.child_indices)]
+
+    def as_legacy(self):
+        """ Former get_deformers_from_object entry: a name, or a {"name", "joints"/"targets"} dict. """
+        if self.type == DeformerUtils.SKINCLUSTER and self.loaded:
+            return {"name": self.name, "joints": list(self.child_names)}
+        if self.type == DeformerUtils.BLENDSHAPE and self.loaded:
+            return {"name": self.name, "targets": list(self.child_names)}
+        return self.name
+
+
+class GeometryRecord:
+    """
+        Deformer stack of a geometry.
+        Only the deformers present are stored, ordered by VALID_DEFORMERS_TYPES then history order.
+    """
+    __slots__ = ("name", "node_type", "deformers", "mask")
+
+    def __init__(self, name, node_type, deformers=()):
+        order = DeformerUtils.DEFORMER_TYPE_BITS
+        self.name = sys.intern(name)
+        self.node_type = node_type
+        self.deformers = tuple(sorted(deformers, key=lambda deformer: order[deformer.type]))
+
+        self.mask = 0
+        for deformer in self.deformers:
+            self.mask |= deformer.mask
+
+    def __repr__(self):
+        return "GeometryRecord({!r}, {!r}, {})".format(self.name, self.node_type, list(self.deformers))
 
-            for shape in shapes:
-                if cmds.nodeType(shape) in valid_types:
-                    filtered_selection.append(obj)
-                    break
+    def by_type(self):
+        """ {deformer type: [DeformerRecord]} for the types present only. """
+        result = {}
+        for deformer in self.deformers:
+            result.setdefault(deformer.type, []).append(deformer)
+        return result
+
+    def get(self, deformer_type):
+        return [deformer for deformer in self.deformers if deformer.type == deformer_type]
+
+    def as_dict(self):
+        """ Former get_deformers_from_object result, a list for every type in VALID_DEFORMERS_TYPES. """
+        result = {deformer_type: [] for deformer_type in DeformerUtils.VALID_DEFORMERS_TYPES}
+        for deformer in self.deformers:
+            result[deformer.type].append(deformer.as_legacy())
+        return result
+
+
+class SelectionQuery:
+    """
+        Batched scene query for a whole selection.
+
+        Shapes, node types, deformer stacks and skin influences of every selected object
+        are answered by a fixed number of list based Maya calls, the deformer stack of
+        each geometry is then resolved in Python from the connections returned.
+
+        :param selection: transform names, only the ones with a mesh or nurbsSurface shape are kept
+        :param load_children: when False skinCluster and blendShape records are left unloaded,
+                              their influences/targets are fetched later through
+                              DeformerUtils.get_deformer_children
+    """
+    VALID_SHAPE_TYPES = {"mesh", "nurbsSurface"}
+
+    def __init__(self, selection, load_children=True):
+        self.load_children = load_children
+        self.objects = []       # filtered objects, long names, selection order
+        self.shapes = {}        # object -> [shape long names]
+        self.node_types = {}    # object -> type of its first valid shape
+        self.records = {}       # object -> GeometryRecord, same result as get_deformers_from_object
+        self.influences = {}    # skinCluster -> ([influence names], [matrix indices])
+        self.uuids = {}         # object -> node uuid, filled when the query goes through DeformerCache
+        self.maya_calls = 0
+
+        if selection:
+            self._query(selection)
+
+    def _call(self, command, *args, **kwargs):
+        self.maya_calls += 1
+        return command(*args, **kwargs) or []
+
+    def _query(self, selection):
+        valid_deformers = DeformerUtils.VALID_DEFORMERS_TYPES
+
+        # --- shapes and their types, pairs of [name, type, name, type, ...]
+        selection = self._call(cmds.ls, selection, long=True)
+        selected = set(selection)
+        listed = self._call(cmds.ls, selection, dag=True, shapes=True, long=True, showType=True)
+
+        for shape, shape_type in zip(listed[::2], listed[1::2]):
+            parent = shape.rpartition("|")[0]
+            if parent not in selected:
+                continue
+            self.shapes.setdefault(parent, []).append(shape)
+            if shape_type in self.VALID_SHAPE_TYPES:
+                self.node_types.setdefault(parent, shape_type)
+
+        self.objects = [obj for obj in selection if obj in self.node_types]
+        if not self.objects:
+            return
+
+        # --- every history node of the selection, then the deformers among them
+        history = self._call(cmds.listHistory, self.objects, pruneDagObjects=True)
+        if not history:
+            self.records = {obj: GeometryRecord(obj, self.node_types[obj]) for obj in self.objects}
+            return
+
+        typed = self._call(cmds.ls, history, type=valid_deformers, showType=True)
+        deformer_types = dict(zip(typed[::2], typed[1::2]))
+
+        # --- downstream connections of the history nodes: [node.attr, destination, ...]
+        upstream = {}
+        connections = self._call(cmds.listConnections, history, source=False, destination=True,
+                                 connections=True, fullNodeName=True)
+        for plug, destination in zip(connections[::2], connections[1::2]):
+            upstream.setdefault(destination, set()).add(plug.partition(".")[0])
+
+        # --- skin influences, ordered by matrix logical index
+        skin_clusters = [d for d, t in deformer_types.items() if t == DeformerUtils.SKINCLUSTER]
+        if skin_clusters and self.load_children:
+            matrices = self._call(cmds.listConnections, [s + ".matrix" for s in skin_clusters],
+                                  source=True, destination=False, connections=True)
+            self.influences = parse_matrix_connections(matrices)
+
+        targets = {}
+        if self.load_children:
+            targets = self._get_blendshape_targets(
+                [d for d, t in deformer_types.items() if t == DeformerUtils.BLENDSHAPE])
+
+        # --- resolve each object's stack in Python, no more Maya calls
+        history_nodes = set(history)
+        for obj in self.objects:
+            deformers = []
+            for node in self._walk_upstream(self.shapes[obj], upstream, history_nodes):
+                node_type = deformer_types.get(node)
+                if not node_type:
+                    continue
+                if not self.load_children:
+                    deformers.append(DeformerRecord(node, node_type))
+                elif node_type == DeformerUtils.SKINCLUSTER:
+                    deformers.append(DeformerRecord(node, node_type, *self.influences.get(node, ([], []))))
+                elif node_type == DeformerUtils.BLENDSHAPE:
+                    deformers.append(DeformerRecord(node, node_type, *targets.get(node, ([], []))))
+                else:
+                    deformers.append(DeformerRecord(node, node_type))
+            self.records[obj] = GeometryRecord(obj, self.node_types[obj], deformers)
 
-        for obj in filtered_selection:
-            deformers = cls.get_deformers_from_object(obj)
-            results[obj] = deformers
+    @staticmethod
+    def _walk_upstream(shapes, upstream, history_nodes):
+        """ Depth first walk from the shapes through history nodes only, nearest nodes first. """
+        visited = set()
+        stack = []
+        for shape in reversed(shapes):
+            stack.extend(sorted(upstream.get(shape, ()), reverse=True))
 
-        pprint.pprint(results)
+        while stack:
+            node = stack.pop()
+            if node in visited or node not in history_nodes:
+                continue
+            visited.add(node)
+            yield node
+            stack.extend(sorted(upstream.get(node, ()), reverse=True))
 
-        return results
+    @staticmethod
+    def _get_blendshape_targets(blendshapes):
+        """ Weight aliases of every blendShape, read through the API instead of one aliasAttr per node. """
+        if not blendshapes:
+            return {}
 
+        selection_list = om.MSelectionList()
+        for blendshape in blendshapes:
+            selection_list.add(blendshape)
 
+        return {blendshape: parse_alias_list(om.MFnDependencyNode(selection_list.getDependNode(i)).getAliasList())
+                for i, blendshape in enumerate(blendshapes)}
 
@@ -28,9 +28,25 @@ except: # newer DCC versions
 
 from maya import cmds
 import maya.OpenMayaUI as omui
+import maya.api.OpenMaya as om
 
 from MeshDeformer.app import meshDeformer
+from MeshDeformer.app import deformerCache
+from MeshDeformer.app import deformerTreeModel
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import componentCodec
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app import symmetry
+from MeshDeformer.app import weightClipboard
+from MeshDeformer.app import weightUndo
+from MeshDeformer.app import weightIO
+from MeshDeformer.app import skinTransfer
+from MeshDeformer.app import skinClusterUtils
+from MeshDeformer.app import skinXfo
+from MeshDeformer.app import influenceStats
 from MeshDeformer.app.util import UI_launcherUtils
+from MeshDeformer.app.util import schedulerUtils
+from MeshDeformer.app.util import callbackUtils
 
 
 # ---------------------------------------------------------------------------- #
@@ -141,49 +157,17 @@ def radioButton(checked=False):
 class MeshDeformerWnd(QtWidgets.QDialog):
     WINDOW_TITLE = "Mesh Deformer"
 
+    # Quiet time after the last selection/scene event before the tree refreshes
+    REFRESH_DEBOUNCE_MS = 30
+
+    # Mirror plane normal and rest position matching distance of Mirror/Flip
+    SYMMETRY_AXIS = "x"
+    SYMMETRY_TOLERANCE = 0.001
+
     @classmethod
     def windowName(cls):
         return cls.__name__
         
-    @classmethod
-    def killScriptJobs(cls, func=None, event=None):
-        if callable(func):
-            func = func.__name__
-
-        jobs = set()
-        ids = set()
-        for job in cmds.scriptJob(listJobs=True):
-            'bound method {}.'.format(cls.__name__)
-            if cls.__name__ not in job:
-                continue
-
-            id, _, remaining = job.partition(':')
-            if event:
-                # Parses the job string to extract the event name
-                if 'event=' not in remaining:
-                    continue
-
-                _event, _, remaining = job.partition('event=')[-1][1:].partition(' ') # Parse and clean the event name
-                _event = _event.strip('"\',')
-                if event != _event:
-                    continue
-
-            if func:
-                if ' {}.{} '.format(cls.__name__, func) not in remaining:
-                    continue
-
-            jobs.add(job)
-            ids.add(id)
-
-        if ids:
-            cmnds = ['cmds.scriptJob(kill={}, force=True)'.format(i) for i in ids]
-            cmndsStr = '; '.join(cmnds)
-
-            cmds.evalDeferred(cmndsStr)
-
-        return jobs
-        
-
     def __init__(self, parent=None):
         super(MeshDeformerWnd, self).__init__(parent)
         
@@ -191,6 +175,29 @@ class MeshDeformerWnd(QtWidgets.QDialog):
         self.setWindowTitle(self.WINDOW_TITLE)
         self.setMinimumSize(800, 800)
 
+        # Every scriptJob and MMessage callback of the tool is owned by this registry
+        self.callback_registry = callbackUtils.CallbackRegistry()
+        self.deformer_cache = deformerCache.DeformerCache(registry=self.callback_registry)
+        self.refresh_scheduler = schedulerUtils.RefreshScheduler(self.update_tree_with_selection,
+                                                                 debounce_ms=self.REFRESH_DEBOUNCE_MS,
+                                                                 parent=self)
+        # Scene edits on displayed geometries refresh the tree through the same coalesced path
+        self.deformer_cache.on_invalidated = self.refresh_scheduler.mark_dirty
+
+        # Per influence stats of the joint rows, painting strokes end up in one reload on idle
+        self.influence_stats = influenceStats.InfluenceStatsCache(registry=self.callback_registry)
+        self.dirty_stats = set()
+        self.stats_scheduler = schedulerUtils.RefreshScheduler(self.refresh_influence_stats,
+                                                               debounce_ms=self.REFRESH_DEBOUNCE_MS,
+                                                               parent=self)
+        self.influence_stats.on_dirty = self.on_influence_stats_dirty
+
+        # Shape long name -> center edge index, these shapes mirror through the topological solver
+        self.center_edges = {}
+
+        # Weight edits go to Maya's undo queue as meshDeformerWeightEdit commands
+        weightUndo.load_plugin()
+
         self.base_layout()
         self.create_menu_action()
         self.widgets_and_layouts()
@@ -200,8 +207,11 @@ class MeshDeformerWnd(QtWidgets.QDialog):
         self.build_main_layout()
         self.create_connections()
 
+        self.deformer_cache.install()
+
         self.populate_tree_with_deformers()
-        self.selection_job = cmds.scriptJob(event=["SelectionChanged", self.on_selection_changed], protected=True)
+        self.selection_job = self.callback_registry.add_script_job(
+            event=["SelectionChanged", self.on_selection_changed], protected=True)
 
     def base_layout(self):
         ## ---  Main frame Layout
@@ -230,6 +240,9 @@ class MeshDeformerWnd(QtWidgets.QDialog):
             ['Mid_Layout',               [0,0,0,0]],
             ['Deformer_Layout',          [0,0,0,0]],
             ['SkinCluster_Layout',       [0,0,0,0]],
+            ['SkinWeights_Layout',       [0,0,0,0]],
+            ['SkinInfluence_Layout',     [0,0,0,0]],
+            ['SkinXfo_Layout',           [0,0,0,0]],
             ]
         
         self.hLayout = {}
@@ -257,18 +270,23 @@ class MeshDeformerWnd(QtWidgets.QDialog):
         self.header_deformer_text.setAlignment(QtCore.Qt.AlignLeft)    
         self.header_widgets = {}
 
+        self.header_filters = {}
+
+        deformer_utils = meshDeformer.DeformerUtils
         rows = [
-                ("All :", True),
-                ("SkinCluster :", False),
-                ("BlendShape :", False),
-                ("Wrap :", False),
-                ("Delta Mush :", False),
+                # name,             checked,    deformer types shown
+                ("All :",           True,       deformer_utils.VALID_DEFORMERS_TYPES),
+                ("SkinCluster :",   False,      [deformer_utils.SKINCLUSTER]),
+                ("BlendShape :",    False,      [deformer_utils.BLENDSHAPE]),
+                ("Wrap :",          False,      [deformer_utils.WRAP, deformer_utils.PROXIMITYWRAP]),
+                ("Delta Mush :",    False,      [deformer_utils.DELTAMUSH]),
                 ]
 
-        for name, is_checked in rows:
+        for name, is_checked, deformer_types in rows:
             self.label = addText(name)
             self.btn = radioButton(checked=is_checked)
             self.header_widgets[name] = (self.label, self.btn)
+            self.header_filters[name] = deformer_utils.get_type_mask(deformer_types)
 
     def create_button(self):
         """
@@ -290,8 +308,14 @@ class MeshDeformerWnd(QtWidgets.QDialog):
             ['Check Out',                  self.temp,             0,      self.colorWhite,    self.colorGrey,      self.hLayout['Deformer_Layout'],         '0,1,0,0',         125,   ''],
             ['Update',                     self.temp,             0,      self.colorWhite,    self.colorGrey,      self.hLayout['Deformer_Layout'],         '0,1,0,0',         125,   ''],
             ['Check In',                   self.temp,             0,      self.colorWhite,    self.colorGrey,      self.hLayout['Deformer_Layout'],         '0,1,0,0',         125,   ''],
-            ['Add SkinCluster',            self.temp,             0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinCluster_Layout'],      '0,1,0,0',         190,   ''],
-            ['Transfer SkinCluster',       self.temp,             0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinCluster_Layout'],      '0,1,0,0',         190,   ''],
+            ['Add SkinCluster',            self.add_skin_clusters,  0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinCluster_Layout'],      '0,1,0,0',         190,   ''],
+            ['Transfer SkinCluster',       self.transfer_skin_cluster,  0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinCluster_Layout'],      '0,1,0,0',         190,   ''],
+            ['Export Weights',             self.export_skin_weights,  0,  self.colorWhite,    self.colorGrey,      self.hLayout['SkinWeights_Layout'],      '0,1,0,0',         190,   ''],
+            ['Import Weights',             self.import_skin_weights,  0,  self.colorWhite,    self.colorGrey,      self.hLayout['SkinWeights_Layout'],      '0,1,0,0',         190,   ''],
+            ['Add Influences',             self.add_skin_influences,  0,  self.colorWhite,    self.colorGrey,      self.hLayout['SkinInfluence_Layout'],    '0,1,0,0',         190,   ''],
+            ['Create XFO',                 self.create_xfo,       0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinXfo_Layout'],          '0,1,0,0',         125,   ''],
+            ['Update XFO',                 self.update_xfo,       0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinXfo_Layout'],          '0,1,0,0',         125,   ''],
+            ['Remove XFO',                 self.remove_xfo,       0,      self.colorWhite,    self.colorGrey,      self.hLayout['SkinXfo_Layout'],          '0,1,0,0',         125,   ''],
             ]
 
         # Build Buttons
@@ -352,15 +376,26 @@ class MeshDeformerWnd(QtWidgets.QDialog):
         self.midCore_widget = QtWidgets.QWidget()
         self.midCore_widget.setLayout(self.hLayout["Mid_Layout"])
 
-        # Left container   
-        self.left_Qtree_wdg = QtWidgets.QTreeWidget()
+        # Left container, a view over the deformer index model, rows are only built when visible
+        self.deformer_model = deformerTreeModel.DeformerTreeModel(
+            children_loader=self.deformer_cache.get_deformer_children, stats_loader=self.influence_stats.get,
+            parent=self)
+        # Painted joint rows only request their stats, the stats scheduler loads them on idle
+        self.deformer_model.on_stats_requested = self.stats_scheduler.mark_dirty
+        self.set_model_icons()
+
+        self.deformer_proxy = deformerTreeModel.DeformerFilterProxyModel(parent=self)
+        self.deformer_proxy.setSourceModel(self.deformer_model)
+
+        self.left_Qtree_wdg = QtWidgets.QTreeView()
+        self.left_Qtree_wdg.setModel(self.deformer_proxy)
         self.left_Qtree_wdg.setHeaderHidden(False)
         self.left_Qtree_wdg.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.left_Qtree_wdg.setItemsExpandable(True)
-        self.left_Qtree_wdg.setHeaderLabel("Geometries")
+        self.left_Qtree_wdg.setUniformRowHeights(True)
         self.left_Qtree_wdg.setAlternatingRowColors(False)
         self.left_Qtree_wdg.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 alternate-background-color: #373737;
             }
         """)
@@ -382,6 +417,9 @@ class MeshDeformerWnd(QtWidgets.QDialog):
         self.labeled_divider02_wdg = LabeledDivider("SkinCluster")
         self.vLayout["Right_Layout"].addWidget(self.labeled_divider02_wdg)
         self.vLayout["Right_Layout"].addLayout(self.hLayout['SkinCluster_Layout'])
+        self.vLayout["Right_Layout"].addLayout(self.hLayout['SkinWeights_Layout'])
+        self.vLayout["Right_Layout"].addLayout(self.hLayout['SkinInfluence_Layout'])
+        self.vLayout["Right_Layout"].addLayout(self.hLayout['SkinXfo_Layout'])
 
         
         self.vLayout["Right_Layout"].addStretch(1)
@@ -405,122 +443,504 @@ class MeshDeformerWnd(QtWidgets.QDialog):
 
         self.about_action = QtWidgets.QAction("About", self)
         self.about_action.setIcon(QtGui.QIcon(":help.png"))
+
+        ##-----------------------------
+        ##---  Right-click menu of the deformer tree, "-" adds a separator, a list of entries a submenu
+        self.weightMenuAndFunctions = [
+            # name,                 function
+            ["Copy",                self.copy_weights],
+            ["Paste",               self.paste_weights],
+            ["-",                   None],
+            ["Set Value",           self.set_weights_value],
+            ["Invert",              self.invert_weights],
+            ["Clear",               self.clear_weights],
+            ["-",                   None],
+            ["Smooth",              self.smooth_weights],
+            ["-",                   None],
+            ["Mirror Left to Right", lambda: self.mirror_weights(symmetry.SymmetryMap.POSITIVE)],
+            ["Mirror Right to Left", lambda: self.mirror_weights(symmetry.SymmetryMap.NEGATIVE)],
+            ["Flip",                self.flip_weights],
+            ["Set Center Edge",     self.set_center_edge],
+            ["Clear Center Edge",   self.clear_center_edges],
+            ["-",                   None],
+            ["Select Vertices",     [
+                ["Weighted",        lambda: self.select_vertices_by_weight("weighted")],
+                ["Full Weight",     lambda: self.select_vertices_by_weight("full")],
+                ["Above...",        lambda: self.select_vertices_by_weight("threshold")],
+                ]],
+            ["Deselect Vertices",   [
+                ["Weighted",        lambda: self.select_vertices_by_weight("weighted", deselect=True)],
+                ["Full Weight",     lambda: self.select_vertices_by_weight("full", deselect=True)],
+                ["Above...",        lambda: self.select_vertices_by_weight("threshold", deselect=True)],
+                ]],
+            ]
         
     def create_connections(self):
         self.about_action.triggered.connect(self.about)
 
+        for name, (_, button) in self.header_widgets.items():
+            button.toggled.connect(lambda checked, name=name: checked and self.on_filter_changed(name))
+
+        self.left_Qtree_wdg.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.left_Qtree_wdg.customContextMenuRequested.connect(self.show_weight_menu)
+
 
     # def on_clicked(self):
     #     print("Button Clicked")
     
     def temp(self):
         pass
-        
-    def populate_tree_with_deformers(self, selection=None):
-        """ Populates the left_Qtree_wdg with the deformers from the current selection,
-            and assigns Maya outliner icons (mesh, nurbsSurface, joint) to the top-level items."""
-        
-        self.left_Qtree_wdg.clear()
-        joint_icon_path = os.path.join(ICON_DIR, "out_joint.png")
-        joint_icon = QtGui.QIcon(joint_icon_path) if os.path.exists(joint_icon_path) else QtGui.QIcon()
 
-        deformer_data = meshDeformer.DeformerUtils.get_deformers_from_selection(selection)
+    ##-----------------------------
+    ##---  Deformer weights
+    def get_selected_weight_targets(self):
+        """ Return [(deformer, object, blendShape target index or None)] for the selected rows
+            holding per-vertex weights: deformers (blendShape base weights) and blendShape targets."""
+        model = self.deformer_model
+        targets = []
+
+        for view_index in self.left_Qtree_wdg.selectionModel().selectedRows(0):
+            index = self.deformer_proxy.mapToSource(view_index)
+            kind = model.data(index, model.KindRole)
+            deformer_type = model.data(index, model.DeformerTypeRole)
+            if deformer_type not in deformerWeights.DeformerWeights.SUPPORTED_TYPES:
+                continue
+
+            obj = model.get_object_name(index)
+            if kind == deformerTreeModel.TreeNode.DEFORMER:
+                targets.append((model.data(index), obj, None))
+
+            elif kind == deformerTreeModel.TreeNode.CHILD:
+                targets.append((model.data(index.parent()), obj, model.data(index, model.LogicalIndexRole)))
+
+        return targets
+
+    def show_weight_menu(self, position):
+        if not self.get_selected_weight_targets():
+            return
+
+        menu = QtWidgets.QMenu(self)
+        self.fill_menu(menu, self.weightMenuAndFunctions)
+        menu.exec_(self.left_Qtree_wdg.viewport().mapToGlobal(position))
+
+    def fill_menu(self, menu, entries):
+        """ Add [name, function] entries to menu, "-" adds a separator and a list of entries a submenu. """
+        for name, function in entries:
+            if name == "-":
+                menu.addSeparator()
+            elif isinstance(function, list):
+                self.fill_menu(menu.addMenu(name), function)
+            else:
+                menu.addAction(name, function)
+
+    def run_weight_operation(self, operation, name="meshDeformerWeights", use_components=False):
+        """ Read and modify the weights of every selected row, the changed values are written back
+            as a single undo step holding only the sparse deltas (weightUndo).
+
+            :param operation: callable receiving a deformerWeights.DeformerWeights and the selected
+                              vertex indices of its geometry (None for every vertex)
+            :param use_components: restrict the operation to the selected vertices of each geometry,
+                                   geometries without selected vertices are edited as a whole
+        """
+        targets = self.get_selected_weight_targets()
+        if not targets:
+            return
+
+        selected = componentCodec.get_selected_components() if use_components else {}
+
+        deltas = []
+        for deformer, obj, target in targets:
+            weights = deformerWeights.DeformerWeights(deformer, obj, target).read()
+            before = weights.weights.copy()
+            operation(weights, selected.get(weights.geometry))
+            deltas.append(weightUndo.WeightDelta.from_weights(weights, before))
+
+        weightUndo.execute(deltas, name)
+
+    def copy_weights(self):
+        """ Copy the weights of the first selected row to the session clipboard. """
+        targets = self.get_selected_weight_targets()
+        if targets:
+            deformer, obj, target = targets[0]
+            weightClipboard.clipboard.copy(deformerWeights.DeformerWeights(deformer, obj, target).read())
+
+    def paste_weights(self):
+        """ Paste onto every selected row, remapped by closest point when the topology differs. """
+        if not weightClipboard.clipboard:
+            cmds.warning("Copy deformer weights first")
+            return
+        self.run_weight_operation(
+            lambda weights, indices: weights.paste(weightClipboard.clipboard.paste(weights.geometry)),
+            "meshDeformerPaste")
+
+    def set_weights_value(self):
+        value, ok = QtWidgets.QInputDialog.getDouble(self, "Set Value", "Weight :", 1.0, 0.0, 1.0, 3)
+        if ok:
+            self.run_weight_operation(lambda weights, indices: weights.set_value(value, indices),
+                                      "meshDeformerSetValue", use_components=True)
+
+    def invert_weights(self):
+        self.run_weight_operation(lambda weights, indices: weights.invert(indices),
+                                  "meshDeformerInvert", use_components=True)
+
+    def clear_weights(self):
+        self.run_weight_operation(lambda weights, indices: weights.clear(indices),
+                                  "meshDeformerClear", use_components=True)
+
+    def smooth_weights(self):
+        iterations, ok = QtWidgets.QInputDialog.getInt(self, "Smooth", "Iterations :", 1, 1, 100)
+        if not ok:
+            return
+
+        def smooth(weights, indices):
+            # Cached per topology hash, deformers sharing a mesh only build the adjacency once
+            weights.smooth(meshTopology.MeshTopology.from_mesh(weights.geometry), iterations, indices=indices)
+
+        self.run_weight_operation(smooth, "meshDeformerSmooth", use_components=True)
+
+    def select_vertices_by_weight(self, mode, deselect=False):
+        """ (De)select the vertices of every selected row by weight in a single cmds.select.
+
+            :param mode: "weighted" (> 0), "full" (= 1) or "threshold" (asks for a value)
+        """
+        targets = self.get_selected_weight_targets()
+        if not targets:
+            return
+
+        threshold = 0.0
+        if mode == "threshold":
+            threshold, ok = QtWidgets.QInputDialog.getDouble(self, "Select Vertices", "Weight above :",
+                                                              0.5, 0.0, 1.0, 3)
+            if not ok:
+                return
+
+        masks = {}
+        for deformer, obj, target in targets:
+            weights = deformerWeights.DeformerWeights(deformer, obj, target).read()
+            mask = weights.weights >= 1.0 if mode == "full" else weights.weights > threshold
+            if weights.geometry in masks:
+                mask |= masks[weights.geometry]
+            masks[weights.geometry] = mask
+
+        componentCodec.select_components(masks, deselect=deselect)
+
+    def get_symmetry_map(self, geometry):
+        # Cached per topology hash, every deformer of a mesh shares the same map
+        if geometry in self.center_edges:
+            return symmetry.SymmetryMap.from_center_edge(geometry, self.center_edges[geometry], self.SYMMETRY_AXIS)
+        return symmetry.SymmetryMap.from_mesh(geometry, self.SYMMETRY_AXIS, self.SYMMETRY_TOLERANCE)
+
+    def set_center_edge(self):
+        """ Mirror the mesh of the selected edge from its topology instead of its rest positions. """
+        edges = componentCodec.get_selected_components("e")
+        if len(edges) != 1 or len(next(iter(edges.values()))) != 1:
+            cmds.warning("Select one edge lying on the symmetry plane")
+            return
+
+        shape, indices = edges.popitem()
+        self.center_edges[shape] = int(indices[0])
+
+    def clear_center_edges(self):
+        self.center_edges.clear()
+
+    def mirror_weights(self, source):
+        self.run_weight_operation(
+            lambda weights, indices: weights.mirror(self.get_symmetry_map(weights.geometry), source),
+            "meshDeformerMirror")
+
+    def flip_weights(self):
+        self.run_weight_operation(
+            lambda weights, indices: weights.flip(self.get_symmetry_map(weights.geometry)),
+            "meshDeformerFlip")
 
-        for obj, deformers in deformer_data.items():
-            # Determine node type from the first shape or the object itself (if joint)
-            shapes = cmds.listRelatives(obj, shapes=True, fullPath=True) or []
-            node_type = None
+    ##-----------------------------
+    ##---  SkinCluster
+    def get_selected_skin_clusters(self):
+        """ Return [(skinCluster, object)] for the selected skinCluster rows. """
+        model = self.deformer_model
+        skin_clusters = []
 
-            if shapes:
-                node_type = cmds.nodeType(shapes[0])
+        for view_index in self.left_Qtree_wdg.selectionModel().selectedRows(0):
+            index = self.deformer_proxy.mapToSource(view_index)
+            if (model.data(index, model.KindRole) == deformerTreeModel.TreeNode.DEFORMER and
+                    model.data(index, model.DeformerTypeRole) == meshDeformer.DeformerUtils.SKINCLUSTER):
+                skin_clusters.append((model.data(index), model.get_object_name(index)))
 
-            elif cmds.nodeType(obj) == "joint":
-                node_type = "joint"
+        return skin_clusters
 
+    def add_skin_clusters(self):
+        """
+            Bind every selected mesh to the selected joints, all in one batch. A selected skinned mesh
+            is the source of the initial weights: its influences are added to the bind and its weights
+            are transferred onto every new skinCluster.
+        """
+        selection = cmds.ls(selection=True, long=True) or []
+        influences = cmds.ls(selection, type="joint", long=True) or []
+        meshes = skinClusterUtils.get_meshes([node for node in selection if node not in influences])
+
+        sources = [mesh for mesh in meshes if skinTransfer.find_skin_cluster(mesh) is not None]
+        meshes = [mesh for mesh in meshes if mesh not in sources]
+        transfer = skinTransfer.SkinTransfer(sources[0]) if sources else None
+        if transfer is not None:
+            influences = cmds.ls(influences + list(transfer.weights.influences), long=True) or []
+
+        if not influences or not meshes:
+            cmds.warning("Select the influence joints (or a skinned source mesh) and the meshes to bind")
+            return
+
+        initial_weights = None
+        if transfer is not None:
+            initial_weights = lambda mesh, skin_cluster: transfer.get_weights(mesh)
+        timings = skinClusterUtils.SkinClusterUtils.bind_many(meshes, influences, initial_weights=initial_weights)
+        for mesh, (skin_cluster, seconds) in timings.items():
+            om.MGlobal.displayInfo("{} -> {}: {:.3f} s".format(mesh, skin_cluster, seconds))
+        self.refresh_scheduler.mark_dirty()
+
+    def add_skin_influences(self):
+        """ Add the selected joints to every selected skinCluster row, one DG update per skinCluster. """
+        skin_clusters = self.get_selected_skin_clusters()
+        influences = cmds.ls(selection=True, long=True, type="joint") or []
+        if not skin_clusters or not influences:
+            cmds.warning("Select skinCluster rows and the joints to add")
+            return
+
+        for skin_cluster, _ in skin_clusters:
+            skinClusterUtils.SkinClusterUtils.add_influences(skin_cluster, influences)
+        self.refresh_scheduler.mark_dirty()
+
+    def run_xfo_operation(self, name):
+        """ Call SkinXfo.<name>() on every selected skinCluster row. """
+        skin_clusters = self.get_selected_skin_clusters()
+        if not skin_clusters:
+            cmds.warning("Select skinCluster rows")
+            return
+
+        for skin_cluster, _ in skin_clusters:
+            getattr(skinXfo.SkinXfo(skin_cluster), name)()
+
+    def create_xfo(self):
+        self.run_xfo_operation("create")
+
+    def update_xfo(self):
+        self.run_xfo_operation("update")
+
+    def remove_xfo(self):
+        self.run_xfo_operation("remove")
+
+    def transfer_skin_cluster(self):
+        """ Transfer the skinning of the first selected mesh onto every other selected mesh. """
+        selection = cmds.ls(selection=True, long=True, objectsOnly=True) or []
+        if len(selection) < 2:
+            cmds.warning("Select the skinned source mesh, then the target meshes")
+            return
+
+        source, targets = selection[0], selection[1:]
+        if skinTransfer.find_skin_cluster(source) is None:
+            cmds.warning("{} has no skinCluster".format(source))
+            return
+
+        stats = skinTransfer.SkinTransfer(source).transfer(targets)
+        for target, target_stats in stats.items():
+            self.influence_stats.invalidate(skinTransfer.find_skin_cluster(target))
+            om.MGlobal.displayInfo("{}: mean {mean:.4f} | p99 {p99:.4f} | max {max:.4f}".format(
+                target, **target_stats))
+
+    def get_weight_file_path(self, directory, obj):
+        return os.path.join(directory, obj.split("|")[-1] + weightIO.EXTENSION)
+
+    def export_skin_weights(self):
+        """ Export every selected skinCluster to <directory>/<object>.mdw. """
+        skin_clusters = self.get_selected_skin_clusters()
+        if not skin_clusters:
+            cmds.warning("Select skinCluster rows to export")
+            return
+
+        directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Export Weights")
+        if not directory:
+            return
+
+        for skin_cluster, obj in skin_clusters:
+            weightIO.export_skin(skin_cluster, self.get_weight_file_path(directory, obj), obj)
+
+    def import_skin_weights(self):
+        """ Import <directory>/<object>.mdw on every selected skinCluster, only on the selected vertices if any. """
+        skin_clusters = self.get_selected_skin_clusters()
+        if not skin_clusters:
+            cmds.warning("Select skinCluster rows to import")
+            return
+
+        directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Import Weights")
+        if not directory:
+            return
+
+        selected = componentCodec.get_selected_components()
+        for skin_cluster, obj in skin_clusters:
+            path = self.get_weight_file_path(directory, obj)
+            if not os.path.exists(path):
+                cmds.warning("No weight file for {}: {}".format(obj, path))
+                continue
+            geometry = weightIO.get_skin_geometry(skin_cluster, obj)
+            _, stats = weightIO.import_skin(skin_cluster, path, geometry, vertices=selected.get(geometry))
+            self.influence_stats.invalidate(skin_cluster)
+            if stats is not None:
+                cmds.warning("{} topology changed, weights remapped by closest point: mean {mean:.4f} | "
+                             "p90 {p90:.4f} | p99 {p99:.4f} | max {max:.4f}".format(obj, **stats))
+
+    def set_model_icons(self):
+        """ Assigns Maya outliner icons (mesh, nurbsSurface, joint) to the deformer model. """
+        icon_paths = {
+            "mesh":             [":/out_mesh.png", ":/mesh.png"],
+            "nurbsSurface":     [":/out_nurbsSurface.png", ":/nurbsSurface.png"],
+            "joint":            [os.path.join(ICON_DIR, "out_joint.png")],
+        }
+
+        for node_type, paths in icon_paths.items():
             # Try a list of possible icon paths for each node type
-            icon = QtGui.QIcon()
-            icon_paths = []
+            for path in paths:
+                test_icon = QtGui.QIcon(path)
 
-            if node_type == "mesh":
-                icon_paths = [":/out_mesh.png", ":/mesh.png"]
+                if not test_icon.isNull():
+                    self.deformer_model.icons[node_type] = test_icon
+                    break
 
-            elif node_type == "nurbsSurface":
-                icon_paths = [":/out_nurbsSurface.png", ":/nurbsSurface.png"]
+        # Fallback if no icon was found
+        self.deformer_model.default_icon = self.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
+        for node_type in ("mesh", "nurbsSurface"):
+            self.deformer_model.icons.setdefault(node_type, self.deformer_model.default_icon)
+
+    def populate_tree_with_deformers(self, selection=None):
+        """ Rebuilds the deformer model from scratch with the deformers from the current selection. """
+        self.deformer_model.clear()
+        self.object_uuids = {}
+        self.update_tree_with_selection(selection)
+
+    def update_tree_with_selection(self, selection=None):
+        """ Diffs the selection against the objects already in the deformer model.
+            Dropped objects are removed, added objects and objects whose cached deformer stack
+            was invalidated are queried and (re)inserted, every other row is left untouched so
+            expansion and scroll state survive."""
+        if selection is None:
+            selection = cmds.ls(selection=True, long=True)
+
+        model = self.deformer_model
+        wanted = set(selection)
+        for obj in [obj for obj in self.object_uuids if obj not in wanted]:
+            self.object_uuids.pop(obj)
+            model.remove_object(obj)
+
+        stale = {obj for obj, uuid in self.object_uuids.items() if uuid not in self.deformer_cache}
+        to_query = [obj for obj in selection if obj not in self.object_uuids or obj in stale]
+        if not to_query:
+            return
+
+        # Cached stacks are reused, the missing objects are fetched in one batched query
+        scene_query = self.deformer_cache.query_selection(to_query)
+
+        for obj in stale:
+            expanded = self._get_expanded_paths(model.object_index(obj))
+            row = model.remove_object(obj)
+            self.object_uuids.pop(obj)
+
+            if obj not in scene_query.records:
+                continue
 
+            index = model.insert_object(row, obj, scene_query.records[obj])
+            self.object_uuids[obj] = scene_query.uuids.get(obj)
+            self._set_expanded_paths(index, expanded)
 
-            for path in icon_paths:
-                test_icon = QtGui.QIcon(path)
+        # Added objects go right after the row of the closest preceding selected object in the model
+        row = 0
+        for obj in selection:
+            if obj in model.objects:
+                row = model.objects[obj].row + 1
+                continue
+            if obj not in scene_query.records:
+                continue
 
-                if not test_icon.isNull():
-                    icon = test_icon
-                    break
+            index = model.insert_object(row, obj, scene_query.records[obj])
+            self.object_uuids[obj] = scene_query.uuids.get(obj)
+            self.left_Qtree_wdg.expand(self.deformer_proxy.mapFromSource(index))
+            row = index.row() + 1
 
-            if icon.isNull():
-                # Fallback if no icon was found
-                icon = self.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
-
-            # Create top-level item and assign the icon
-            short_name = obj.split('|')[-1]
-            obj_item = QtWidgets.QTreeWidgetItem([short_name])
-            obj_item.setData(0, QtCore.Qt.UserRole, obj)  # Store full path if needed
-            obj_item.setIcon(0, icon)
-            self.left_Qtree_wdg.addTopLevelItem(obj_item)
-
-            for deformer_type, deformer_list in deformers.items():
-                if not deformer_list:
-                    continue
-
-                deformer_type_item = QtWidgets.QTreeWidgetItem([deformer_type])
-                obj_item.addChild(deformer_type_item)
-
-                for deformer in deformer_list:
-                    # Handle deformer dicts (like blendShape or skinCluster) with details
-                    if isinstance(deformer, dict):
-                        name = deformer.get("name", "Unknown")
-                        deformer_item = QtWidgets.QTreeWidgetItem([name])
-                        deformer_type_item.addChild(deformer_item)
-
-                        if "targets" in deformer:
-                            for target in deformer["targets"]:
-                                target_item = QtWidgets.QTreeWidgetItem([target])
-                                deformer_item.addChild(target_item)
-
-                        if "joints" in deformer:
-                            for joint in deformer["joints"]:
-                                joint_item = QtWidgets.QTreeWidgetItem([joint])
-                                joint_item.setIcon(0, joint_icon)
-                                deformer_item.addChild(joint_item)
-                    else:
-                        deformer_item = QtWidgets.QTreeWidgetItem([str(deformer)])
-                        deformer_type_item.addChild(deformer_item)
-
-            obj_item.setExpanded(True)
+    def _get_expanded_paths(self, index, parent_path=()):
+        """
+            Return the set of text paths of the expanded rows under (and including) the source
+            model index, rows hidden by the filter are walked too and read as collapsed.
+        """
+        model = self.deformer_model
+        if not index.isValid():
+            return set()
+
+        path = parent_path + (model.data(index, deformerTreeModel.DeformerTreeModel.FullNameRole),)
+        if not self.left_Qtree_wdg.isExpanded(self.deformer_proxy.mapFromSource(index)):
+            return set()
+
+        expanded = {path}
+        for row in range(model.rowCount(index)):
+            expanded |= self._get_expanded_paths(model.index(row, 0, index), path)
+
+        return expanded
+
+    def _set_expanded_paths(self, index, expanded, parent_path=()):
+        """ Expand the rows under the source model index whose text path is in expanded. """
+        model = self.deformer_model
+        if not index.isValid():
+            return
+
+        path = parent_path + (model.data(index, deformerTreeModel.DeformerTreeModel.FullNameRole),)
+        if path not in expanded:
+            return
+
+        # Expanding a lazy deformer fetches its children before they are walked
+        view_index = self.deformer_proxy.mapFromSource(index)
+        if view_index.isValid():
+            self.left_Qtree_wdg.expand(view_index)
+        if model.canFetchMore(index):
+            model.fetchMore(index)
+
+        for row in range(model.rowCount(index)):
+            self._set_expanded_paths(model.index(row, 0, index), expanded, path)
+
+    def on_filter_changed(self, name):
+        """ Called when a header radio button is checked, filters the rows already fetched. """
+        self.deformer_proxy.set_type_mask(self.header_filters[name])
 
     def on_selection_changed(self):
         """ Called when the Maya selection changes.
-            Only updates the tree if a mesh or nurbsSurface is selected."""
-        self.populate_tree_with_deformers()
+            Only marks the tree dirty, bursts of events end up in a single refresh on idle."""
+        self.refresh_scheduler.mark_dirty()
+
 
+    def on_influence_stats_dirty(self, skin_cluster):
+        self.dirty_stats.add(skin_cluster)
+        self.stats_scheduler.mark_dirty()
+
+    def refresh_influence_stats(self):
+        """
+            Drop the joint stats of the skinClusters edited since the last call (visible rows request
+            them again) and load the stats requested by the painted rows.
+        """
+        skin_clusters, self.dirty_stats = self.dirty_stats, set()
+        self.deformer_model.invalidate_stats(skin_clusters)
+        self.deformer_model.load_stats()
 
     def killAllCallBacks(self):
-        return self.killScriptJobs()
+        """ Removes the scriptJobs and MMessage callbacks registered by this window only. """
+        self.influence_stats.clear()
+        self.callback_registry.remove_all()
+        self.selection_job = None
         
     #---------- Event Overrides ----------
     def closeEvent(self, event):
         """
-            Override the close event to ensure all script jobs are killed
+            Override the close event to ensure all script jobs and callbacks are removed
             **Cannot use super because Mayas dockable system wraps my dialog, which can break the super(). 
               The wrapped widget is no longer considered a true instance of my class. 
               return super(MeshDeformerWnd, self).closeEvent(*args, **kwargs)**
         """
-        if hasattr(self, "selection_job") and self.selection_job:
-            try:
-             cmds.scriptJob(kill=self.selection_job, force=True)
-            except Exception:
-                pass
-
-            self.selection_job = None
-        
+        self.refresh_scheduler.cancel()
+        self.stats_scheduler.cancel()
+        self.deformer_cache.uninstall()
         self.killAllCallBacks()
         QtWidgets.QDialog.closeEvent(self, event) 
         
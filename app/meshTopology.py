@@ -0,0 +1,262 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Mesh connectivity cache keyed by a topology hash (vertex count + face-vertex digest).
+    The vertex adjacency is built once per topology as NumPy CSR arrays and shared by every
+    deformer of every mesh with that topology, "Smooth" then runs as sparse mat-vec iterations.
+
+How to: (how to execute the core of this module)
+    topology = MeshTopology.from_mesh("|body")
+    weights = topology.smooth(weights, iterations=3, strength=0.5)
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import hashlib
+
+import numpy as np
+
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import deformerWeights
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_topology_hash(vertex_count, counts, connects):
+    """ Digest of the vertex count and the face-vertex connectivity, positions are ignored. """
+    digest = hashlib.sha1(np.int64(vertex_count).tobytes())
+    digest.update(np.ascontiguousarray(counts, dtype=np.int32).tobytes())
+    digest.update(np.ascontiguousarray(connects, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+def get_mesh_arrays(geometry):
+    """ Return (vertex_count, face vertex counts, face vertex indices) of a mesh transform or shape. """
+    dag_path = deformerWeights.get_geometry_path(geometry)
+    if not dag_path.hasFn(om.MFn.kMesh):
+        raise TypeError("{} is not a mesh".format(geometry))
+
+    mesh_fn = om.MFnMesh(dag_path)
+    counts, connects = mesh_fn.getVertices()
+    return (mesh_fn.numVertices,
+            np.fromiter(counts, dtype=np.int32, count=len(counts)),
+            np.fromiter(connects, dtype=np.int32, count=len(connects)))
+
+
+def get_edge_vertices(geometry, edge_index):
+    """ The two vertex indices of a mesh edge. """
+    mesh_fn = om.MFnMesh(deformerWeights.get_geometry_path(geometry))
+    return tuple(mesh_fn.getEdgeVertices(edge_index))
+
+
+def get_triangles(geometry):
+    """ (T, 3) vertex indices of the triangulation Maya uses for the mesh faces. """
+    mesh_fn = om.MFnMesh(deformerWeights.get_geometry_path(geometry))
+    _, vertices = mesh_fn.getTriangles()
+    return np.fromiter(vertices, dtype=np.int64, count=len(vertices)).reshape(-1, 3)
+
+
+def get_points(geometry, space=om.MSpace.kObject):
+    """ (N, 3) current points of a mesh in the given MSpace. """
+    points = om.MFnMesh(deformerWeights.get_geometry_path(geometry)).getPoints(space)
+    return np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+
+
+def get_rest_shape(geometry):
+    """
+        Intermediate mesh the deformers of geometry start from (its Orig shape), the shape itself
+        when it has no deformer history.
+        The upstream walk is pruned at every other DAG node, like the deformer discovery: wrap
+        drivers, live blendShape targets and their own Orig shapes are never taken for the rest mesh.
+    """
+    dag_path = deformerWeights.get_geometry_path(geometry)
+    shape = dag_path.node()
+    parent = om.MFnDagNode(shape).parent(0)
+
+    iterator = om.MItDependencyGraph(shape, om.MFn.kInvalid, om.MItDependencyGraph.kUpstream,
+                                     om.MItDependencyGraph.kDepthFirst, om.MItDependencyGraph.kNodeLevel)
+    while not iterator.isDone():
+        node = iterator.currentNode()
+        if node.hasFn(om.MFn.kDagNode) and node != shape:
+            iterator.prune()
+            if node.hasFn(om.MFn.kMesh):
+                node_fn = om.MFnDagNode(node)
+                if node_fn.isIntermediateObject and node_fn.parent(0) == parent:
+                    return node
+        iterator.next()
+
+    return shape
+
+
+def get_rest_points(geometry):
+    """ (N, 3) object space points of the rest shape of geometry (see get_rest_shape). """
+    points = om.MFnMesh(get_rest_shape(geometry)).getPoints(om.MSpace.kObject)
+    return np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class MeshTopology:
+    # topology hash -> MeshTopology, oldest entries are dropped past MAX_CACHED
+    _cache = {}
+    MAX_CACHED = 16
+
+    def __init__(self, vertex_count, counts, connects, topology_hash=None):
+        self.vertex_count = vertex_count
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.connects = np.asarray(connects, dtype=np.int32)
+        self.hash = topology_hash or get_topology_hash(vertex_count, self.counts, self.connects)
+
+        self._indptr = None
+        self._indices = None
+        self._row_ids = None
+
+        self._corner_next = None
+        self._corner_faces = None
+        self._twins = None
+
+    def __repr__(self):
+        return "MeshTopology({} vertices, {} faces, {})".format(self.vertex_count, self.counts.size, self.hash[:8])
+
+    @classmethod
+    def from_mesh(cls, geometry):
+        """ Cached topology of a mesh, one MFnMesh.getVertices call when the hash is already known. """
+        vertex_count, counts, connects = get_mesh_arrays(geometry)
+        topology_hash = get_topology_hash(vertex_count, counts, connects)
+
+        topology = cls._cache.pop(topology_hash, None)
+        if topology is None:
+            topology = cls(vertex_count, counts, connects, topology_hash)
+            while len(cls._cache) >= cls.MAX_CACHED:
+                del cls._cache[next(iter(cls._cache))]
+
+        # Re-inserted last, the dict order doubles as the LRU order
+        cls._cache[topology_hash] = topology
+        return topology
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    # ------------------------------------------------------------------ adjacency
+    def face_offsets(self):
+        """ Index in connects of the first vertex of every face. """
+        offsets = np.zeros(self.counts.size, dtype=np.int64)
+        np.cumsum(self.counts[:-1], out=offsets[1:])
+        return offsets
+
+    def _build_corners(self):
+        """ Half-edge arrays over the face-vertices (corners): next corner, face and opposite corner. """
+        # Every corner is linked to the next one of its face, the last wraps to the first
+        offsets = self.face_offsets()
+        following = np.arange(1, self.connects.size + 1, dtype=np.int64)
+        following[offsets + self.counts - 1] = offsets
+
+        # The half-edge of corner c goes from connects[c] to connects[next[c]], its twin goes back
+        connects = self.connects.astype(np.int64)
+        keys = connects * self.vertex_count + connects[following]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        twin_keys = connects[following] * self.vertex_count + connects
+        slots = np.minimum(np.searchsorted(sorted_keys, twin_keys), max(sorted_keys.size - 1, 0))
+        found = sorted_keys[slots] == twin_keys if sorted_keys.size else np.zeros(0, dtype=bool)
+
+        self._corner_next = following
+        self._corner_faces = np.repeat(np.arange(self.counts.size), self.counts)
+        self._twins = np.where(found, order[slots], -1)
+
+    @property
+    def corner_next(self):
+        if self._corner_next is None:
+            self._build_corners()
+        return self._corner_next
+
+    @property
+    def corner_faces(self):
+        if self._corner_faces is None:
+            self._build_corners()
+        return self._corner_faces
+
+    @property
+    def twins(self):
+        """ Opposite corner of every half-edge, -1 on borders. """
+        if self._twins is None:
+            self._build_corners()
+        return self._twins
+
+    def find_corner(self, start, end):
+        """ Corner whose half-edge goes from vertex start to vertex end, -1 when there is none. """
+        following = self.connects[self.corner_next]
+        corners = np.flatnonzero((self.connects == start) & (following == end))
+        return int(corners[0]) if corners.size else -1
+
+    def edges(self):
+        """ (E, 2) unique undirected edges, smaller vertex first. """
+        pairs = np.stack((self.connects, self.connects[self.corner_next]), axis=1)
+        pairs.sort(axis=1)
+        return np.unique(pairs, axis=0)
+
+    def _build_adjacency(self):
+        edges = self.edges()
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        columns = np.concatenate((edges[:, 1], edges[:, 0]))
+        order = np.lexsort((columns, rows))
+
+        self._indptr = np.zeros(self.vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.vertex_count), out=self._indptr[1:])
+        self._indices = columns[order].astype(np.int32)
+        self._row_ids = rows[order]
+
+    @property
+    def adjacency(self):
+        """ (indptr, indices) CSR vertex adjacency, built on first access. """
+        if self._indptr is None:
+            self._build_adjacency()
+        return self._indptr, self._indices
+
+    def neighbors(self, vertex):
+        indptr, indices = self.adjacency
+        return indices[indptr[vertex]:indptr[vertex + 1]]
+
+    def degrees(self):
+        return np.diff(self.adjacency[0])
+
+    # ------------------------------------------------------------------ operations
+    def neighbor_average(self, values):
+        """ Average of the neighbor values of every vertex (sparse mat-vec), isolated vertices keep theirs. """
+        indptr, indices = self.adjacency
+        degrees = np.diff(indptr)
+        sums = np.bincount(self._row_ids, weights=values[indices], minlength=self.vertex_count)
+        return np.divide(sums, degrees, out=np.array(values, dtype=np.float64), where=degrees > 0)
+
+    def smooth(self, weights, iterations=1, strength=1.0, pinned=None):
+        """
+            Laplacian smoothing of a per-vertex weight array.
+
+            :param weights: (vertex_count,) weights of any deformer
+            :param iterations: number of mat-vec passes
+            :param strength: 0-1 blend towards the neighbor average per pass
+            :param pinned: bool mask or vertex indices kept at their original value
+            :return: new float32 array
+        """
+        weights = np.asarray(weights)
+        if weights.shape != (self.vertex_count,):
+            raise ValueError("Expected {} weights, got {}".format(self.vertex_count, weights.shape))
+
+        result = weights.astype(np.float64)
+        # Pinned every pass, a drifting pinned vertex would pull its neighbours in the next one
+        original = result[pinned] if pinned is not None else None
+        for _ in range(iterations):
+            result += strength * (self.neighbor_average(result) - result)
+            if pinned is not None:
+                result[pinned] = original
+
+        return result.astype(np.float32)
@@ -0,0 +1,188 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    SkinCluster creation and editing for the SkinCluster panel of MeshDeformerWnd.
+    Batch operations run with the viewport refresh and the evaluation manager suspended, so the
+    evaluation graph is rebuilt once at the end instead of after every new node.
+    Influences are added by wiring all their matrix/bindPreMatrix/lockWeights plugs and adding them
+    to the bind pose in a single MDGModifier, one DG update whatever their count, run as one
+    undoable command (weightUndo).
+
+How to: (how to execute the core of this module)
+    timings = SkinClusterUtils.bind_many(["|prop1", "|prop2"], ["root", "spine1"], max_influences=4)
+    indices = SkinClusterUtils.add_influences("skinCluster1", ["jaw", "tongue1"])
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import contextlib
+import time
+
+from maya import cmds
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import weightUndo
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+@contextlib.contextmanager
+def suspended_evaluation(evaluation=True):
+    """
+        Suspend the viewport refresh and, with evaluation, switch the evaluation manager to DG
+        so new nodes do not rebuild the parallel graph one by one, the previous mode is restored after.
+    """
+    mode = cmds.evaluationManager(query=True, mode=True)[0] if evaluation else None
+    cmds.refresh(suspend=True)
+    if mode and mode != "off":
+        cmds.evaluationManager(mode="off")
+    try:
+        yield
+    finally:
+        if mode and mode != "off":
+            cmds.evaluationManager(mode=mode)
+        cmds.refresh(suspend=False)
+
+
+@contextlib.contextmanager
+def undo_chunk(name):
+    """ Every command run in the block is one undo step. """
+    cmds.undoInfo(openChunk=True, chunkName=name)
+    try:
+        yield
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+def get_dag_path(node):
+    selection_list = om.MSelectionList()
+    selection_list.add(node)
+    return selection_list.getDagPath(0)
+
+
+def get_depend_node(node):
+    selection_list = om.MSelectionList()
+    selection_list.add(node)
+    return selection_list.getDependNode(0)
+
+
+def get_meshes(nodes):
+    """ Long names of the nodes that are mesh transforms or mesh shapes. """
+    meshes = []
+    for node in cmds.ls(nodes, long=True) or []:
+        if cmds.nodeType(node) == "mesh" or cmds.listRelatives(node, shapes=True, type="mesh",
+                                                               noIntermediate=True):
+            meshes.append(node)
+    return meshes
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class SkinClusterUtils:
+    NAME_FORMAT = "{}_skinCluster"
+
+    @classmethod
+    def bind(cls, mesh, influences, max_influences=4, name=None):
+        """ Bind mesh to influences with Maya's closest distance weights. """
+        name = name or cls.NAME_FORMAT.format(mesh.split("|")[-1])
+        return cmds.skinCluster(influences, mesh, toSelectedBones=True, name=name,
+                                maximumInfluences=max_influences, obeyMaxInfluences=True)[0]
+
+    @classmethod
+    def bind_many(cls, meshes, influences, max_influences=4, initial_weights=None):
+        """
+            Bind every mesh to the same influences in one undo chunk, with refresh and the
+            evaluation manager suspended.
+
+            :param initial_weights: {mesh: skinWeights.SkinWeights} or callable(mesh, skin_cluster)
+                                    returning one (or None), written as an undoable
+                                    weightUndo.SkinWeightDelta step inside the chunk
+            :return: {mesh: (skinCluster, seconds)}
+        """
+        timings = {}
+        with undo_chunk("meshDeformerBindMany"), suspended_evaluation():
+            for mesh in meshes:
+                start = time.perf_counter()
+                skin_cluster = cls.bind(mesh, influences, max_influences)
+
+                if callable(initial_weights):
+                    weights = initial_weights(mesh, skin_cluster)
+                else:
+                    weights = (initial_weights or {}).get(mesh)
+                if weights is not None:
+                    weightUndo.execute([weightUndo.SkinWeightDelta(skin_cluster, weights, mesh)],
+                                       "meshDeformerBindMany")
+
+                timings[mesh] = (skin_cluster, time.perf_counter() - start)
+
+        return timings
+
+    @staticmethod
+    def get_influences(skin_cluster):
+        """ Long names of the influences of a skinCluster. """
+        return cmds.ls(cmds.skinCluster(skin_cluster, query=True, influence=True) or [], long=True) or []
+
+    @staticmethod
+    def get_bind_pose(skin_cluster):
+        """ dagPose connected to skinCluster.bindPose, None when the bind pose was deleted. """
+        poses = cmds.listConnections(skin_cluster + ".bindPose", source=True, destination=False, type="dagPose")
+        return poses[0] if poses else None
+
+    @classmethod
+    def add_influences(cls, skin_cluster, influences):
+        """
+            Add influences with one MDGModifier: worldMatrix -> matrix[i], the current world inverse
+            as bindPreMatrix[i] and lockInfluenceWeights -> lockWeights[i], on new logical indices.
+            Influences without a lockInfluenceWeights (liw) attribute get one, as skinCluster does, and
+            the influences join the bind pose dagPose at their current pose. Influences already in the
+            skinCluster are skipped. The modifier runs as one undoable step (weightUndo.execute_modifier).
+
+            :return: new logical indices
+        """
+        current = set(cls.get_influences(skin_cluster))
+        influences = [name for name in cmds.ls(influences, long=True) or [] if name not in current]
+        if not influences:
+            return []
+
+        used = cmds.getAttr(skin_cluster + ".matrix", multiIndices=True) or []
+        start = max(used) + 1 if used else 0
+        indices = list(range(start, start + len(influences)))
+
+        skin_fn = om.MFnDependencyNode(get_depend_node(skin_cluster))
+        matrix_plug = skin_fn.findPlug("matrix", False)
+        bind_plug = skin_fn.findPlug("bindPreMatrix", False)
+        lock_plug = skin_fn.findPlug("lockWeights", False)
+
+        modifier = om.MDGModifier()
+        for index, influence in zip(indices, influences):
+            path = get_dag_path(influence)
+            node = path.node()
+            node_fn = om.MFnDependencyNode(node)
+
+            world_plug = node_fn.findPlug("worldMatrix", False).elementByLogicalIndex(path.instanceNumber())
+            modifier.connect(world_plug, matrix_plug.elementByLogicalIndex(index))
+            modifier.newPlugValue(bind_plug.elementByLogicalIndex(index),
+                                  om.MFnMatrixData().create(path.inclusiveMatrixInverse()))
+
+            if node_fn.hasAttribute("lockInfluenceWeights"):
+                lock_attribute = node_fn.attribute("lockInfluenceWeights")
+            else:
+                lock_attribute = om.MFnNumericAttribute().create("lockInfluenceWeights", "liw",
+                                                                 om.MFnNumericData.kBoolean, False)
+                modifier.addAttribute(node, lock_attribute)
+            modifier.connect(om.MPlug(node, lock_attribute), lock_plug.elementByLogicalIndex(index))
+
+        # Runs in order after the connections, undone with the modifier
+        bind_pose = cls.get_bind_pose(skin_cluster)
+        if bind_pose is not None:
+            modifier.commandToExecute("dagPose -addToPose -name {} {}".format(
+                bind_pose, " ".join('"{}"'.format(name) for name in influences)))
+
+        weightUndo.execute_modifier(modifier)
+        return indices
@@ -0,0 +1,189 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Skin weight transfer from one skinned mesh onto many target meshes (outfits, props).
+    The source rest surface (Orig shape) is indexed once (spatialIndex.TriangleProjector), the closest
+    point projection of the target rest vertices is fanned out over a process pool in chunks, and each
+    target is interpolated and written on the main thread as soon as all its chunks are back,
+    with the viewport refresh suspended for the whole batch. The bindings and every target write
+    (weightUndo.SkinWeightDelta) are one undo chunk.
+
+How to: (how to execute the core of this module)
+    transfer = SkinTransfer("|body")
+    stats = transfer.transfer(["|shirt", "|pants", "|boots"])
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from maya import cmds
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app import skinClusterUtils
+from MeshDeformer.app import skinWeights
+from MeshDeformer.app import spatialIndex
+from MeshDeformer.app import weightIO
+from MeshDeformer.app import weightUndo
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def find_skin_cluster(geometry):
+    """ First skinCluster in the history of geometry, None when it is not skinned. """
+    history = cmds.listHistory(geometry, pruneDagObjects=True) or []
+    skin_clusters = cmds.ls(history, type="skinCluster")
+    return skin_clusters[0] if skin_clusters else None
+
+
+def get_rest_points(geometry, space=om.MSpace.kWorld):
+    """
+        (N, 3) rest points of geometry (its Orig shape, see meshTopology.get_rest_shape), placed by
+        the geometry world matrix in kWorld so meshes posed by their deformers match in bind pose.
+    """
+    points = meshTopology.get_rest_points(geometry)
+    if space != om.MSpace.kWorld:
+        return points
+    matrix = np.array(list(deformerWeights.get_geometry_path(geometry).inclusiveMatrix()), dtype=np.float64)
+    matrix = matrix.reshape(4, 4)
+    return points.dot(matrix[:3, :3]) + matrix[3, :3]
+
+
+def get_process_context():
+    """
+        Spawn context of the pool, Maya's own executable cannot host the workers so they run
+        on the mayapy next to it when there is one.
+    """
+    context = multiprocessing.get_context("spawn")
+    python = os.path.join(os.path.dirname(sys.executable), "mayapy" + (".exe" if os.name == "nt" else ""))
+    if os.path.exists(python):
+        context.set_executable(python)
+    return context
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class SkinTransfer:
+    # Target vertices per pool task, small enough to balance a few large targets across workers
+    CHUNK_SIZE = 65536
+    # Below this many target vertices the pool start up costs more than it saves
+    PARALLEL_THRESHOLD = 200000
+
+    def __init__(self, source, skin_cluster=None, space=om.MSpace.kWorld):
+        """
+            :param source: skinned source mesh
+            :param skin_cluster: skinCluster of source, found in its history when None
+            :param space: MSpace the rest points of the source and targets are matched in
+        """
+        self.skin_cluster = skin_cluster or find_skin_cluster(source)
+        if self.skin_cluster is None:
+            raise ValueError("{} has no skinCluster".format(source))
+
+        self.source = weightIO.get_skin_geometry(self.skin_cluster, source)
+        self.space = space
+        self.weights = skinWeights.SkinWeights.read(self.skin_cluster, self.source)
+        self.max_influences = int(np.diff(self.weights.indptr).max()) if self.weights.vertex_count else 0
+
+        self.projector = spatialIndex.TriangleProjector(get_rest_points(self.source, space),
+                                                        meshTopology.get_triangles(self.source))
+
+    def __repr__(self):
+        return "SkinTransfer({!r}, {!r})".format(self.source, self.skin_cluster)
+
+    def iter_projections(self, points_by_target, workers=None):
+        """
+            Yield (target, vertices, barycentrics, distances) as the targets complete.
+
+            :param points_by_target: {target: (M, 3) points}
+            :param workers: pool size, os.cpu_count() - 1 when None, 1 projects in this process
+        """
+        workers = workers or max((os.cpu_count() or 2) - 1, 1)
+        total = sum(len(points) for points in points_by_target.values())
+
+        if workers == 1 or total < self.PARALLEL_THRESHOLD:
+            for target, points in points_by_target.items():
+                yield (target,) + tuple(self.projector.project(points))
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(workers, mp_context=get_process_context(),
+                                                    initializer=spatialIndex.init_projector_worker,
+                                                    initargs=(self.projector,)) as executor:
+            chunks = {}
+            pending = {}
+            results = {}
+            for target, points in points_by_target.items():
+                starts = range(0, max(len(points), 1), self.CHUNK_SIZE)
+                pending[target] = len(starts)
+                results[target] = {}
+                for start in starts:
+                    future = executor.submit(spatialIndex.project_in_worker, points[start:start + self.CHUNK_SIZE])
+                    chunks[future] = (target, start)
+
+            for future in concurrent.futures.as_completed(chunks):
+                target, start = chunks[future]
+                results[target][start] = future.result()
+                pending[target] -= 1
+                if pending[target]:
+                    continue
+
+                parts = [part for _, part in sorted(results.pop(target).items())]
+                yield (target,) + tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def get_target_skin_cluster(self, target):
+        """ skinCluster of target holding every source influence, bound to them when target has none. """
+        skin_cluster = find_skin_cluster(target)
+        if skin_cluster is None:
+            return skinClusterUtils.SkinClusterUtils.bind(target, self.weights.influences, self.max_influences)
+
+        # Influences already bound are skipped, the new ones get the current world inverse bind
+        skinClusterUtils.SkinClusterUtils.add_influences(skin_cluster, self.weights.influences)
+        return skin_cluster
+
+    def interpolate(self, vertices, barycentrics, max_influences=None):
+        """ Source weights at the projected points, limited to max_influences (source maximum when None) and normalized. """
+        weights = self.weights.interpolate(vertices, barycentrics)
+        return weights.limit_influences(max_influences or self.max_influences).normalize()
+
+    def get_weights(self, target, max_influences=None):
+        """ Transferred weights of one target, projected in this process and not written. """
+        vertices, barycentrics, _ = self.projector.project(get_rest_points(target, self.space))
+        return self.interpolate(vertices, barycentrics, max_influences)
+
+    def transfer(self, targets, workers=None, max_influences=None):
+        """
+            Transfer the source weights onto every target mesh.
+
+            :param max_influences: influences kept per vertex, the source maximum when None
+            :return: {target: transfer distance stats}
+        """
+        targets = [weightIO.get_skin_geometry(None, target) for target in targets]
+        # Maya reads stay on the main thread, workers only receive point arrays
+        points_by_target = {target: get_rest_points(target, self.space) for target in targets}
+
+        stats = {}
+        cmds.undoInfo(openChunk=True, chunkName="meshDeformerTransferSkin")
+        try:
+            skin_clusters = {target: self.get_target_skin_cluster(target) for target in targets}
+            with skinClusterUtils.suspended_evaluation(evaluation=False):
+                for target, vertices, barycentrics, distances in self.iter_projections(points_by_target, workers):
+                    weights = self.interpolate(vertices, barycentrics, max_influences)
+                    weightUndo.execute([weightUndo.SkinWeightDelta(skin_clusters[target], weights, target)],
+                                       "meshDeformerTransferSkin")
+                    stats[target] = spatialIndex.get_distance_stats(distances)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+        return stats
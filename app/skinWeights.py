@@ -0,0 +1,402 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Sparse (CSR) vertex x influence weight matrix of a skinCluster.
+    Read and written with one MFnSkinCluster getWeights/setWeights call per vertex chunk, each
+    chunk is compressed before the next one and setWeights only gets the influence columns that
+    hold weights, normalize, prune, max influence limiting and lock-aware renormalization all run
+    vectorized on the nonzero arrays, so memory follows the nonzero weights only.
+    setWeights is not undoable, weightUndo.SkinWeightDelta runs a write as an undoable step.
+
+How to: (how to execute the core of this module)
+    weights = SkinWeights.read("skinCluster1")
+    weights.prune(0.001).limit_influences(4).normalize()
+    weights.write("skinCluster1")
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+
+from maya import cmds
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+
+from MeshDeformer.app import componentCodec
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import spatialIndex
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_skin_fn(skin_cluster):
+    selection_list = om.MSelectionList()
+    selection_list.add(skin_cluster)
+    return oma.MFnSkinCluster(selection_list.getDependNode(0))
+
+
+def get_vertex_components(vertex_count, vertices=None):
+    """ Mesh vertex component of every vertex, or of the given vertex indices. """
+    component_fn = om.MFnSingleIndexedComponent()
+    components = component_fn.create(om.MFn.kMeshVertComponent)
+    if vertices is None:
+        component_fn.setCompleteData(vertex_count)
+    else:
+        component_fn.addElements(om.MIntArray(np.asarray(vertices, dtype=np.int64).tolist()))
+    return components
+
+
+def get_influences(skin_fn):
+    """ (names, matrix logical indices) of the influences, in influenceObjects order. """
+    paths = skin_fn.influenceObjects()
+    return [path.partialPathName() for path in paths], [skin_fn.indexForInfluenceObject(path) for path in paths]
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class SkinWeights:
+    """
+        :param indptr: (vertex_count + 1,) row pointers
+        :param indices: (nnz,) influence column of each weight, sorted within a row
+        :param data: (nnz,) float32 weights
+        :param influences: influence names, one per column
+        :param influence_indices: skinCluster matrix logical index of each column
+    """
+    DTYPE = np.float32
+    # Dense values per getWeights/setWeights call, bounds the transient dense chunks (32 MB as float64)
+    CHUNK_VALUES = 1 << 22
+
+    def __init__(self, indptr, indices, data, influences, influence_indices=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=self.DTYPE)
+        self.influences = list(influences)
+        self.influence_indices = np.asarray(range(len(self.influences)) if influence_indices is None
+                                            else influence_indices, dtype=np.int32)
+
+    def __repr__(self):
+        return "SkinWeights({} vertices x {} influences, {} nonzero)".format(
+            self.vertex_count, self.influence_count, self.nnz)
+
+    @property
+    def vertex_count(self):
+        return self.indptr.size - 1
+
+    @property
+    def influence_count(self):
+        return len(self.influences)
+
+    @property
+    def shape(self):
+        return self.vertex_count, self.influence_count
+
+    @property
+    def nnz(self):
+        return self.data.size
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    # ------------------------------------------------------------------ construction
+    @classmethod
+    def from_dense(cls, dense, influences, influence_indices=None, threshold=0.0):
+        """ Build from a (vertices, influences) array, weights <= threshold are dropped. """
+        dense = np.asarray(dense)
+        rows, columns = np.nonzero(dense > threshold)
+        indptr = np.zeros(dense.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=dense.shape[0]), out=indptr[1:])
+        return cls(indptr, columns, dense[rows, columns], influences, influence_indices)
+
+    @classmethod
+    def from_coo(cls, rows, columns, values, vertex_count, influences, influence_indices=None):
+        """ Build from coordinate triplets, duplicated (row, column) pairs are summed. """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        values = np.asarray(values, dtype=cls.DTYPE)
+
+        # One int64 key per (row, column), sorted row major like the CSR layout
+        width = max(len(influences), 1)
+        keys, inverse = np.unique(rows * width + columns, return_inverse=True)
+        summed = np.bincount(inverse, weights=values, minlength=keys.size).astype(cls.DTYPE)
+
+        indptr = np.zeros(vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // width, minlength=vertex_count), out=indptr[1:])
+        return cls(indptr, keys % width, summed, influences, influence_indices)
+
+    def add_influences(self, influences, influence_indices=None):
+        """ Append empty columns, nothing is stored for them until they get weights. """
+        start = self.influence_indices.max() + 1 if self.influence_count else 0
+        if influence_indices is None:
+            influence_indices = range(start, start + len(influences))
+        self.influences.extend(influences)
+        self.influence_indices = np.concatenate((self.influence_indices,
+                                                 np.asarray(influence_indices, dtype=np.int32)))
+        return self
+
+    def copy(self):
+        return SkinWeights(self.indptr.copy(), self.indices.copy(), self.data.copy(),
+                           self.influences, self.influence_indices.copy())
+
+    def to_dense(self, vertices=None):
+        """ (vertices, influences) float64 array, the layout MFnSkinCluster.setWeights expects. """
+        dense = np.zeros(self.shape, dtype=np.float64)
+        dense[self.row_ids(), self.indices] = self.data
+        return dense if vertices is None else dense[np.asarray(vertices, dtype=np.int64)]
+
+    def row_ids(self):
+        """ Vertex index of every nonzero weight. """
+        return np.repeat(np.arange(self.vertex_count), np.diff(self.indptr))
+
+    def _rebuild(self, keep):
+        """ Keep the nonzero weights where keep is True, row order is preserved. """
+        rows = self.row_ids()[keep]
+        self.indptr = np.zeros(self.vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.vertex_count), out=self.indptr[1:])
+        self.indices = self.indices[keep]
+        self.data = self.data[keep]
+        return self
+
+    # ------------------------------------------------------------------ maya io
+    @classmethod
+    def _split_rows(cls, rows, influence_count):
+        """ Vertex chunks of at most CHUNK_VALUES dense values. """
+        size = max(cls.CHUNK_VALUES // max(influence_count, 1), 1)
+        return [rows[start:start + size] for start in range(0, rows.size, size)]
+
+    @classmethod
+    def _get_dense(cls, skin_fn, shape_path, vertex_count, rows):
+        """ (rows, influences) weights of the given vertex rows, one getWeights call. """
+        weights, influence_count = skin_fn.getWeights(shape_path, get_vertex_components(vertex_count, rows))
+        return np.fromiter(weights, dtype=cls.DTYPE, count=len(weights)).reshape(rows.size, influence_count)
+
+    @staticmethod
+    def _compress(rows, dense):
+        """ (rows, nonzero count per row, columns, values) of a dense chunk, kept instead of the chunk. """
+        chunk_rows, columns = np.nonzero(dense > 0)
+        return rows, np.bincount(chunk_rows, minlength=rows.size), columns, dense[chunk_rows, columns]
+
+    @classmethod
+    def _from_chunks(cls, vertex_count, chunks, influences, influence_indices):
+        """ Build from _compress results in row order, rows not given stay empty. """
+        counts = np.zeros(vertex_count, dtype=np.int64)
+        indices, data = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=cls.DTYPE)]
+        for rows, row_counts, columns, values in chunks:
+            counts[rows] = row_counts
+            indices.append(columns)
+            data.append(values)
+
+        indptr = np.zeros(vertex_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(indptr, np.concatenate(indices), np.concatenate(data), influences, influence_indices)
+
+    @classmethod
+    def read(cls, skin_cluster, geometry=None, vertices=None):
+        """
+            Fill from one MFnSkinCluster.getWeights call per vertex chunk.
+
+            :param vertices: only read these vertex rows (the other rows stay empty), every vertex when None
+        """
+        skin_fn = get_skin_fn(skin_cluster)
+        shape_path = deformerWeights.get_geometry_path(geometry) if geometry else skin_fn.getPathAtIndex(0)
+        vertex_count = om.MItGeometry(shape_path).count()
+        influences, influence_indices = get_influences(skin_fn)
+
+        rows = np.arange(vertex_count) if vertices is None else componentCodec.to_indices(vertices)
+        chunks = (cls._compress(chunk, cls._get_dense(skin_fn, shape_path, vertex_count, chunk))
+                  for chunk in cls._split_rows(rows, len(influences)))
+        return cls._from_chunks(vertex_count, chunks, influences, influence_indices)
+
+    def write(self, skin_cluster, geometry=None, vertices=None, previous=None):
+        """
+            Write back with one MFnSkinCluster.setWeights call per vertex chunk, over the influence
+            columns holding a weight in the chunk before or after the write, the other columns are
+            already 0. setWeights is not undoable, see weightUndo.SkinWeightDelta.
+
+            :param vertices: only write these vertex rows, every vertex when None
+            :param previous: SkinWeights currently on the skinCluster for those rows (e.g. from an
+                             earlier write), read chunk by chunk when None
+            :return: previous, the weights the written rows had over the skinCluster influences
+        """
+        skin_fn = get_skin_fn(skin_cluster)
+        shape_path = deformerWeights.get_geometry_path(geometry) if geometry else skin_fn.getPathAtIndex(0)
+
+        # Columns follow the influenceObjects order of the skinCluster the weights are written to
+        current, current_indices = get_influences(skin_fn)
+        missing = [name for name in self.influences if name not in current]
+        if missing:
+            raise RuntimeError("{} is missing influences: {}".format(skin_cluster, ", ".join(missing)))
+        to_skin = np.array([current.index(name) for name in self.influences], dtype=np.int64)
+
+        rows = np.arange(self.vertex_count) if vertices is None else componentCodec.to_indices(vertices)
+        read_chunks = []
+        if previous is not None:
+            previous_to_skin = np.array([current.index(name) if name in current else -1
+                                         for name in previous.influences], dtype=np.int64)
+
+        for chunk in self._split_rows(rows, len(current)):
+            owner, positions = spatialIndex.expand_ranges(self.indptr[chunk], self.indptr[chunk + 1])
+            columns = to_skin[self.indices[positions]]
+
+            if previous is None:
+                dense = self._get_dense(skin_fn, shape_path, self.vertex_count, chunk)
+                read_chunks.append(self._compress(chunk, dense))
+                previous_columns = np.unique(read_chunks[-1][2])
+            else:
+                _, previous_positions = spatialIndex.expand_ranges(previous.indptr[chunk], previous.indptr[chunk + 1])
+                previous_columns = previous_to_skin[previous.indices[previous_positions]]
+
+            written = np.union1d(columns, previous_columns[previous_columns >= 0])
+            if not written.size:
+                continue
+            values = np.zeros((chunk.size, written.size), dtype=np.float64)
+            values[owner, np.searchsorted(written, columns)] = self.data[positions]
+            skin_fn.setWeights(shape_path,
+                               get_vertex_components(self.vertex_count, chunk),
+                               om.MIntArray(written.tolist()),
+                               om.MDoubleArray(values.ravel()),
+                               False)
+
+        if previous is None:
+            previous = SkinWeights._from_chunks(self.vertex_count, read_chunks, current, current_indices)
+        return previous
+
+    @staticmethod
+    def get_locked_influences(skin_cluster):
+        """ Logical matrix indices of the influences whose lockWeights is on. """
+        indices = cmds.getAttr(skin_cluster + ".lockWeights", multiIndices=True) or []
+        if not indices:
+            return []
+        values = np.atleast_1d(cmds.getAttr(skin_cluster + ".lockWeights")).ravel()
+        return [index for index, locked in zip(indices, values) if locked]
+
+    # ------------------------------------------------------------------ operations
+    def row_sums(self):
+        return np.bincount(self.row_ids(), weights=self.data, minlength=self.vertex_count)
+
+    def influence_stats(self):
+        """
+            Per influence vertex count, total weight and max weight, one pass over the nonzero
+            weights sorted by column (np.add/np.maximum.reduceat over the column runs).
+
+            :return: (counts, totals, maxima) arrays of influence_count, 0 for influences without weights
+        """
+        counts = np.bincount(self.indices, minlength=self.influence_count)
+        totals = np.zeros(self.influence_count, dtype=np.float64)
+        maxima = np.zeros(self.influence_count, dtype=np.float64)
+
+        used = np.flatnonzero(counts)
+        if used.size:
+            # Influence columns fit in uint16 in practice, NumPy radix sorts 16 bit keys
+            keys = self.indices.astype(np.uint16) if self.influence_count <= np.iinfo(np.uint16).max else self.indices
+            data = self.data[np.argsort(keys, kind="stable")].astype(np.float64)
+            starts = (np.cumsum(counts) - counts)[used]
+            totals[used] = np.add.reduceat(data, starts)
+            maxima[used] = np.maximum.reduceat(data, starts)
+
+        return counts, totals, maxima
+
+    def normalize(self):
+        """ Scale every vertex so its weights sum to 1, empty vertices are left empty. """
+        sums = self.row_sums()
+        scale = np.divide(1.0, sums, out=np.zeros_like(sums), where=sums > 0)
+        self.data *= scale[self.row_ids()].astype(self.DTYPE)
+        return self
+
+    def prune(self, threshold=0.001):
+        """ Drop the weights smaller than or equal to threshold. """
+        return self._rebuild(self.data > threshold)
+
+    def limit_influences(self, max_influences):
+        """ Keep the max_influences largest weights of every vertex. """
+        rows = self.row_ids()
+        # Sort by vertex, then by decreasing weight, and rank inside each vertex
+        order = np.lexsort((-self.data, rows))
+        rank = np.arange(self.nnz) - self.indptr[rows[order]]
+
+        keep = np.zeros(self.nnz, dtype=bool)
+        keep[order[rank < max_influences]] = True
+        return self._rebuild(keep)
+
+    def column_mask(self, influences):
+        """ Boolean mask over the columns, influences given by name or logical matrix index. """
+        mask = np.zeros(self.influence_count, dtype=bool)
+        for influence in influences:
+            if isinstance(influence, str):
+                if influence in self.influences:
+                    mask[self.influences.index(influence)] = True
+            else:
+                mask |= self.influence_indices == influence
+        return mask
+
+    def interpolate(self, vertices, barycentrics):
+        """
+            New weights whose row i blends the rows vertices[i] with barycentrics[i], the sparse
+            counterpart of spatialIndex.interpolate. Call normalize() to clean up rounding.
+
+            :param vertices: (M, K) source vertex indices, e.g. TriangleProjector.project results
+            :param barycentrics: (M, K) blend weights
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        barycentrics = np.asarray(barycentrics, dtype=self.DTYPE)
+        flat = vertices.ravel()
+
+        # Every nonzero weight of every source row, tagged with the (target, corner) pair it comes from
+        pairs, positions = spatialIndex.expand_ranges(self.indptr[flat], self.indptr[flat + 1])
+        return SkinWeights.from_coo(pairs // vertices.shape[1],
+                                    self.indices[positions],
+                                    self.data[positions] * barycentrics.ravel()[pairs],
+                                    vertices.shape[0], self.influences, self.influence_indices)
+
+    def replace_influences(self, other, influences):
+        """
+            Replace the weights of the given influence names by the ones of other, matched by name.
+
+            :param other: SkinWeights over the same vertices
+        """
+        if other.vertex_count != self.vertex_count:
+            raise ValueError("Expected {} vertices, got {}".format(self.vertex_count, other.vertex_count))
+        missing = [name for name in influences if name not in self.influences]
+        if missing:
+            raise RuntimeError("Missing influences: {}".format(", ".join(missing)))
+
+        keep = ~self.column_mask(influences)[self.indices]
+        incoming = other.column_mask(influences)[other.indices]
+        columns = np.array([self.influences.index(name) if name in self.influences else -1
+                            for name in other.influences], dtype=np.int64)
+
+        merged = SkinWeights.from_coo(np.concatenate((self.row_ids()[keep], other.row_ids()[incoming])),
+                                      np.concatenate((self.indices[keep], columns[other.indices[incoming]])),
+                                      np.concatenate((self.data[keep], other.data[incoming])),
+                                      self.vertex_count, self.influences, self.influence_indices)
+        self.indptr, self.indices, self.data = merged.indptr, merged.indices, merged.data
+        return self
+
+    def renormalize(self, locked=()):
+        """
+            Normalize while keeping the locked influences untouched, the unlocked weights of each
+            vertex are scaled to fill what the locked ones leave (1 - locked sum, clamped at 0).
+
+            :param locked: influence names or logical matrix indices, see get_locked_influences
+        """
+        locked_columns = self.column_mask(locked)
+        if not locked_columns.any():
+            return self.normalize()
+
+        rows = self.row_ids()
+        is_locked = locked_columns[self.indices]
+
+        locked_sums = np.bincount(rows[is_locked], weights=self.data[is_locked], minlength=self.vertex_count)
+        free_sums = np.bincount(rows[~is_locked], weights=self.data[~is_locked], minlength=self.vertex_count)
+
+        available = np.clip(1.0 - locked_sums, 0.0, None)
+        scale = np.divide(available, free_sums, out=np.ones_like(free_sums), where=free_sums > 0)
+
+        self.data[~is_locked] *= scale[rows[~is_locked]].astype(self.DTYPE)
+        return self
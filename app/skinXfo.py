@@ -0,0 +1,169 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    XFO (bind offset) transforms of a skinCluster: one "<skinCluster>_XFO" group holding one
+    "<influence>_xfo" child per influence, placed at the influence bind matrix relative to the group.
+    Moving the group or a child moves the bind pose, Update XFO recomputes every bindPreMatrix
+    as the inverse of the child world matrix (child local x group world), one batched
+    matmul/inverse over (N, 4, 4) arrays written back with a single MDGModifier, run as an
+    undoable command (weightUndo.execute_modifier). Create, Update and Remove are one undo chunk each,
+    Remove only deletes the XFO nodes and keeps the bindPreMatrix they set.
+
+How to: (how to execute the core of this module)
+    xfo = SkinXfo("skinCluster1")
+    xfo.create()
+    xfo.update()
+    xfo.remove()
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+
+from maya import cmds
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import skinClusterUtils
+from MeshDeformer.app import skinWeights
+from MeshDeformer.app import weightUndo
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+# Attribute of the XFO children holding the skinCluster matrix logical index they drive
+INDEX_ATTRIBUTE = "xfoIndex"
+# Message attribute of the XFO group connected from skinCluster.message
+SKIN_ATTRIBUTE = "xfoSkinCluster"
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def to_array(matrices):
+    """ (N, 4, 4) array from MMatrix objects, Maya row-vector layout. """
+    matrices = list(matrices)
+    flat = np.fromiter((value for matrix in matrices for value in matrix), dtype=np.float64, count=16 * len(matrices))
+    return flat.reshape(-1, 4, 4)
+
+
+def get_influence_matrices(skin_cluster):
+    """
+        World and world inverse matrices of every influence, read in one pass over influenceObjects.
+
+        :return: (logical indices (N,), names, world (N, 4, 4), world inverse (N, 4, 4))
+    """
+    skin_fn = skinWeights.get_skin_fn(skin_cluster)
+    paths = skin_fn.influenceObjects()
+    indices = np.array([skin_fn.indexForInfluenceObject(path) for path in paths], dtype=np.int64)
+    names = [path.fullPathName() for path in paths]
+    world = to_array(path.inclusiveMatrix() for path in paths)
+    return indices, names, world, np.linalg.inv(world)
+
+
+def get_bind_pre_plug(skin_cluster):
+    skin_fn = om.MFnDependencyNode(skinClusterUtils.get_depend_node(skin_cluster))
+    return skin_fn.findPlug("bindPreMatrix", False)
+
+
+def get_bind_matrices(skin_cluster, indices):
+    """ (N, 4, 4) bind matrices of the influences at the logical indices, the inverse of their bindPreMatrix. """
+    bind_plug = get_bind_pre_plug(skin_cluster)
+    return np.linalg.inv(to_array(om.MFnMatrixData(bind_plug.elementByLogicalIndex(index).asMObject()).matrix()
+                                  for index in np.asarray(indices).tolist()))
+
+
+def set_bind_pre_matrices(skin_cluster, indices, matrices):
+    """ Write bindPreMatrix[indices] with one MDGModifier, run as one undoable command. """
+    bind_plug = get_bind_pre_plug(skin_cluster)
+
+    modifier = om.MDGModifier()
+    for index, matrix in zip(np.asarray(indices).tolist(), np.asarray(matrices).reshape(-1, 16).tolist()):
+        modifier.newPlugValue(bind_plug.elementByLogicalIndex(index), om.MFnMatrixData().create(om.MMatrix(matrix)))
+    weightUndo.execute_modifier(modifier)
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class SkinXfo:
+    def __init__(self, skin_cluster):
+        self.skin_cluster = skin_cluster
+
+    def __repr__(self):
+        return "SkinXfo({!r})".format(self.skin_cluster)
+
+    @property
+    def group(self):
+        """ XFO group of the skinCluster, None when it has none. """
+        groups = cmds.listConnections(self.skin_cluster + ".message", destination=True, source=False,
+                                      plugs=True) or []
+        for plug in groups:
+            node, _, attribute = plug.partition(".")
+            if attribute == SKIN_ATTRIBUTE:
+                return cmds.ls(node, long=True)[0]
+        return None
+
+    def get_children(self):
+        """ (logical indices (N,), XFO children MDagPaths), read through the API in one pass. """
+        group = self.group
+        if group is None:
+            return np.zeros(0, dtype=np.int64), []
+
+        group_fn = om.MFnDagNode(skinClusterUtils.get_dag_path(group))
+        indices, paths = [], []
+        for child in range(group_fn.childCount()):
+            node_fn = om.MFnDagNode(group_fn.child(child))
+            if node_fn.hasAttribute(INDEX_ATTRIBUTE):
+                indices.append(node_fn.findPlug(INDEX_ATTRIBUTE, False).asInt())
+                paths.append(node_fn.getPath())
+        return np.array(indices, dtype=np.int64), paths
+
+    def create(self, parent=None):
+        """
+            Create the XFO group at the origin (under parent) and one child per influence at its
+            bind matrix (inverse of its bindPreMatrix), then update the bindPreMatrix from them.
+            A posed rig keeps its bind pose.
+        """
+        if self.group:
+            raise RuntimeError("{} already has XFOs".format(self.skin_cluster))
+
+        indices, names, _, _ = get_influence_matrices(self.skin_cluster)
+        bind = get_bind_matrices(self.skin_cluster, indices)
+
+        with skinClusterUtils.undo_chunk("meshDeformerCreateXfo"):
+            group = cmds.createNode("transform", name="{}_XFO".format(self.skin_cluster), parent=parent)
+            cmds.addAttr(group, longName=SKIN_ATTRIBUTE, attributeType="message")
+            cmds.connectAttr(self.skin_cluster + ".message", "{}.{}".format(group, SKIN_ATTRIBUTE))
+
+            # Child local = bind matrix x group world inverse, so the child sits on the bind pose
+            group_inverse = to_array([skinClusterUtils.get_dag_path(group).inclusiveMatrixInverse()])[0]
+            locals_ = np.matmul(bind, group_inverse)
+            for index, name, matrix in zip(indices.tolist(), names, locals_.reshape(-1, 16).tolist()):
+                child = cmds.createNode("transform", name="{}_xfo".format(name.split("|")[-1]), parent=group)
+                cmds.addAttr(child, longName=INDEX_ATTRIBUTE, attributeType="long")
+                cmds.setAttr("{}.{}".format(child, INDEX_ATTRIBUTE), index)
+                cmds.xform(child, matrix=matrix, objectSpace=True)
+
+            self.update()
+        return group
+
+    def update(self):
+        """ bindPreMatrix[i] = inverse(child local x group world) for every XFO child, in one batched pass. """
+        indices, paths = self.get_children()
+        if not paths:
+            return
+
+        group_world = to_array([skinClusterUtils.get_dag_path(self.group).inclusiveMatrix()])[0]
+        locals_ = to_array(om.MFnTransform(path).transformation().asMatrix() for path in paths)
+        with skinClusterUtils.undo_chunk("meshDeformerUpdateXfo"):
+            set_bind_pre_matrices(self.skin_cluster, indices, np.linalg.inv(np.matmul(locals_, group_world)))
+
+    def remove(self):
+        """ Delete the XFOs, the bindPreMatrix they last wrote (Update XFO) stays on the skinCluster. """
+        group = self.group
+        if group:
+            with skinClusterUtils.undo_chunk("meshDeformerRemoveXfo"):
+                cmds.delete(group)
@@ -0,0 +1,624 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Pure NumPy spatial index (grid hash pyramid) answering batched nearest point queries.
+    Points are sorted by grid cell once, each query batch then gathers the candidates of the
+    cells around every query in flat arrays, only the queries that are not resolved yet
+    move on to the next pass, so no Python loop runs per vertex.
+    TriangleProjector adds exact closest point on surface queries over a second grid holding the
+    triangle boxes (and coarser clusters of them for queries far from the surface), returning
+    barycentric weights of source vertices that any per-vertex values are interpolated with.
+
+How to: (how to execute the core of this module)
+    grid = PointGrid(source_points)
+    distances, indices = grid.query(target_points)
+
+    vertices, barycentrics, _ = TriangleProjector(source_points, source_triangles).project(target_points)
+    target_weights = interpolate(source_weights, vertices, barycentrics)
+
+Dependencies:  numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import itertools
+
+import numpy as np
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def expand_ranges(starts, ends):
+    """
+        Concatenate arange(start, end) for every range.
+
+        :return: (owner, values) owner is the range index of every value
+    """
+    lengths = np.maximum(np.asarray(ends) - np.asarray(starts), 0)
+    owner = np.repeat(np.arange(lengths.size), lengths)
+    if not owner.size:
+        return owner, owner
+
+    offsets = np.zeros(lengths.size, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    values = np.arange(owner.size) - offsets[owner] + np.asarray(starts)[owner]
+    return owner, values
+
+
+def expand_boxes(low, high):
+    """
+        Every cell of every box of grid cells between low and high (inclusive).
+
+        :param low: (B, 3) int first cells
+        :param high: (B, 3) int last cells, >= low
+        :return: (owner, cells) owner is the box index of every (K, 3) cell
+    """
+    extents = np.asarray(high, dtype=np.int64) - low + 1
+    owner, local = expand_ranges(np.zeros(len(extents), dtype=np.int64), np.prod(extents, axis=1))
+
+    extents = extents[owner]
+    cells = np.array(low, dtype=np.int64)[owner]
+    cells[:, 2] += local % extents[:, 2]
+    local = local // extents[:, 2]
+    cells[:, 1] += local % extents[:, 1]
+    cells[:, 0] += local // extents[:, 1]
+    return owner, cells
+
+
+def box_squared_gap(points, box_min, box_max):
+    """ Squared distance from every point to its axis aligned box, 0 inside. """
+    gap = np.maximum(np.maximum(box_min - points, points - box_max), 0.0)
+    return np.einsum("ij,ij->i", gap, gap)
+
+
+def group_argmin(groups, values, group_count):
+    """
+        Position of the smallest value of every group, groups must be sorted.
+
+        :return: (group_count,) int array, -1 for empty groups
+    """
+    result = np.full(group_count, -1, dtype=np.int64)
+    if not groups.size:
+        return result
+
+    starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+    minimums = np.minimum.reduceat(values, starts)
+    lengths = np.diff(np.append(starts, groups.size))
+
+    # First position of every group holding its minimum
+    positions = np.flatnonzero(values == np.repeat(minimums, lengths))
+    first = np.concatenate(([True], groups[positions[1:]] != groups[positions[:-1]]))
+    result[groups[positions[first]]] = positions[first]
+    return result
+
+
+def closest_point_coordinates(d1, d2, ab_ab, ab_ac, ac_ac):
+    """
+        (v, w) of the closest point a + v * ab + w * ac of triangles to points p, from the dot
+        products d1 = ab.ap, d2 = ac.ap and the edge products of every triangle.
+        Vectorized region tests of Ericson's Real-Time Collision Detection 5.1.5, every other
+        dot product of the tests is derived from these five, degenerate triangles snap to a.
+    """
+    d3, d4 = d1 - ab_ab, d2 - ab_ac
+    d5, d6 = d1 - ab_ac, d2 - ac_ac
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = va + vb + vc
+        v, w = vb / denominator, vc / denominator
+
+        # Lowest priority first, the vertex regions tested first by Ericson overwrite last
+        region = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        t = (d4 - d3)[region] / ((d4 - d3) + (d5 - d6))[region]
+        v[region], w[region] = 1.0 - t, t
+
+        region = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        v[region], w[region] = 0.0, d2[region] / (d2 - d6)[region]
+
+        region = (d6 >= 0) & (d5 <= d6)
+        v[region], w[region] = 0.0, 1.0
+
+        region = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        v[region], w[region] = d1[region] / (d1 - d3)[region], 0.0
+
+        region = (d3 >= 0) & (d4 <= d3)
+        v[region], w[region] = 1.0, 0.0
+
+        region = (d1 <= 0) & (d2 <= 0)
+        v[region], w[region] = 0.0, 0.0
+
+    invalid = ~(np.isfinite(v) & np.isfinite(w))
+    v[invalid], w[invalid] = 0.0, 0.0
+    return v, w
+
+
+def closest_point_barycentrics(points, a, b, c):
+    """
+        Barycentric coordinates of the closest point of every triangle (a, b, c) to every point.
+
+        :return: (M, 3) barycentrics, degenerate triangles snap to their first vertex
+    """
+    def dot(u, v):
+        return np.einsum("ij,ij->i", u, v)
+
+    ab, ac, ap = b - a, c - a, points - a
+    v, w = closest_point_coordinates(dot(ab, ap), dot(ac, ap), dot(ab, ab), dot(ab, ac), dot(ac, ac))
+    return np.stack((1.0 - v - w, v, w), axis=1)
+
+
+def interpolate(values, vertices, barycentrics):
+    """
+        Blend per-vertex values at projected points.
+
+        :param values: (N,) or (N, K) source values
+        :param vertices: (M, 3) source vertices of every projected point
+        :param barycentrics: (M, 3) weights of those vertices
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return np.einsum("ij,ij->i", values[vertices], barycentrics)
+    return np.einsum("ijk,ij->ik", values[vertices], barycentrics)
+
+
+def get_distance_stats(distances, percentiles=(50, 90, 99)):
+    """ Summary of per-vertex projection distances: count, mean, max and percentiles ("p50", ...). """
+    distances = np.asarray(distances, dtype=np.float64)
+    if not distances.size:
+        return dict(count=0, mean=0.0, max=0.0, **{"p{}".format(p): 0.0 for p in percentiles})
+
+    stats = {"count": int(distances.size), "mean": float(distances.mean()), "max": float(distances.max())}
+    for percentile, value in zip(percentiles, np.percentile(distances, percentiles)):
+        stats["p{}".format(percentile)] = float(value)
+    return stats
+
+
+# Projector of a worker process, set once by init_projector_worker so tasks only carry queries
+_worker_projector = None
+
+
+def init_projector_worker(projector):
+    """ ProcessPoolExecutor initializer, receives the TriangleProjector built in the parent once. """
+    global _worker_projector
+    _worker_projector = projector
+
+
+def project_in_worker(queries):
+    """ Task of a process pool initialized with init_projector_worker. """
+    return _worker_projector.project(queries)
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class PointGrid:
+    """
+        Grid hash over a point cloud with a lazily built pyramid of coarser grids (cell edge x2 per level).
+        A query first takes a distance bound from the finest level with points in its 2x2x2 cell block,
+        then runs one exact search on the level whose cells are about half that bound wide, gathering
+        only the cells within the bound, so the candidates per query follow the local density.
+    """
+    # Queries processed per pass, bounds the size of the flat candidate arrays
+    CHUNK_SIZE = 16384
+
+    def __init__(self, points, cell_size=None, points_per_cell=2.0):
+        """
+            :param points: (N, 3) points to index
+            :param cell_size: grid cell edge, derived from the bounding box and points_per_cell when None
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 3)
+        self.minimum = self.points.min(axis=0) if len(self.points) else np.zeros(3)
+        self.extent = (self.points.max(axis=0) - self.minimum) if len(self.points) else np.zeros(3)
+
+        if cell_size is None:
+            cell_size = self._estimate_cell_size(points_per_cell)
+        self._set_cell_size(cell_size)
+
+        keys = self._keys(self._cells(self.points))
+        self.order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_starts, counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.cell_ends = self.cell_starts + counts
+
+        self._levels = [self]
+
+    def __len__(self):
+        return len(self.points)
+
+    def _set_cell_size(self, cell_size):
+        self.cell_size = max(float(cell_size), 1e-9)
+        self.dims = np.floor(self.extent / self.cell_size).astype(np.int64) + 1
+
+    def _estimate_cell_size(self, points_per_cell, passes=3):
+        """ Cell edge giving about points_per_cell points per occupied cell. """
+        # Flat axes do not count in the volume, a planar mesh still gets square cells
+        used = self.extent[self.extent > 0]
+        volume = np.prod(used) if used.size else 1.0
+        target = max(len(self.points) / points_per_cell, 1.0)
+        cell_size = (volume / target) ** (1.0 / max(used.size, 1))
+
+        # Mesh vertices lie on surfaces and fill few of the volume cells, shrink like a 2D sampling
+        for _ in range(passes):
+            self._set_cell_size(cell_size)
+            occupied = np.unique(self._keys(self._cells(self.points))).size
+            if occupied >= target * 0.5:
+                break
+            cell_size *= np.sqrt(occupied / target)
+
+        return cell_size
+
+    # ------------------------------------------------------------------ grid
+    def _cells(self, points):
+        # Clamped, a query outside the bounding box starts from the nearest border cell
+        cells = np.floor((points - self.minimum) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.dims - 1)
+
+    def _keys(self, cells):
+        return (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+
+    def level(self, index):
+        """ Grid over the same points with cells 2 ** index times wider. """
+        while len(self._levels) <= index:
+            self._levels.append(PointGrid(self.points, cell_size=self._levels[-1].cell_size * 2.0))
+        return self._levels[index]
+
+    def _block_candidates(self, queries, low, high, span, radius=None):
+        """
+            Flat (query, point) candidate pairs of the cells between low and high (inclusive).
+
+            :param low: (Q, 3) first cell of every block, inside the grid
+            :param high: (Q, 3) last cell of every block, inside the grid, at most span - 1 after low
+            :param radius: per query distance, cells whose box is farther are skipped
+        """
+        # Flat grids (planar meshes) only get the offsets their axes can hold
+        offsets = np.array(list(itertools.product(*(range(min(span, size)) for size in self.dims.tolist()))),
+                           dtype=np.int64)
+        strides = np.array([self.dims[1] * self.dims[2], self.dims[2], 1], dtype=np.int64)
+
+        keys = self._keys(low)[:, None] + (offsets @ strides)[None, :]
+        valid = np.ones(keys.shape, dtype=bool)
+        squared_gap = np.zeros(keys.shape) if radius is not None else None
+        for axis in range(3):
+            cell = low[:, axis, None] + offsets[None, :, axis]
+            valid &= cell <= high[:, axis, None]
+            if radius is not None:
+                # Distance from the query to the cell box along this axis
+                cell_min = self.minimum[axis] + cell * self.cell_size
+                position = queries[:, axis, None]
+                gap = np.maximum(np.maximum(cell_min - position, position - cell_min - self.cell_size), 0.0)
+                squared_gap += gap * gap
+
+        if radius is not None:
+            valid &= squared_gap <= (radius * radius)[:, None]
+
+        owner, column = np.nonzero(valid)
+        if not self.cell_keys.size or not owner.size:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        keys = keys[owner, column]
+        slots = np.minimum(np.searchsorted(self.cell_keys, keys), self.cell_keys.size - 1)
+        found = self.cell_keys[slots] == keys
+
+        range_owner, positions = expand_ranges(self.cell_starts[slots[found]], self.cell_ends[slots[found]])
+        return owner[found][range_owner], self.order[positions]
+
+    def _nearest_in_blocks(self, queries, low, high, span, radius=None):
+        """ (squared distances, indices) of the nearest candidate per query, inf/-1 without candidates. """
+        squared = np.full(len(queries), np.inf)
+        indices = np.full(len(queries), -1, dtype=np.int64)
+
+        owner, candidates = self._block_candidates(queries, low, high, span, radius)
+        if owner.size:
+            offsets = queries[owner] - self.points[candidates]
+            distances = np.einsum("ij,ij->i", offsets, offsets)
+            best = group_argmin(owner, distances, len(queries))
+            hit = best >= 0
+            squared[hit] = distances[best[hit]]
+            indices[hit] = candidates[best[hit]]
+
+        return squared, indices
+
+    def _searched_distance(self, queries, low, high):
+        """
+            Distance under which every point was a candidate of the blocks between low and high:
+            the distance to the nearest block face that still has grid cells behind it.
+        """
+        below = np.where(low > 0, queries - (self.minimum + low * self.cell_size), np.inf)
+        above = np.where(high < self.dims - 1, self.minimum + (high + 1) * self.cell_size - queries, np.inf)
+        return np.minimum(below, above).min(axis=1)
+
+    # ------------------------------------------------------------------ query
+    def query(self, queries, max_distance=np.inf):
+        """
+            Nearest indexed point of every query.
+
+            :param queries: (M, 3) points
+            :param max_distance: queries farther than this from every point get index -1
+            :return: (distances, indices) arrays of length M
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float64).reshape(-1, 3)
+        distances = np.full(len(queries), np.inf)
+        indices = np.full(len(queries), -1, dtype=np.int64)
+        if not len(self.points):
+            return distances, indices
+
+        for start in range(0, len(queries), self.CHUNK_SIZE):
+            chunk = slice(start, start + self.CHUNK_SIZE)
+            distances[chunk], indices[chunk] = self._query_chunk(queries[chunk])
+
+        beyond = distances > max_distance
+        distances[beyond] = np.inf
+        indices[beyond] = -1
+        return distances, indices
+
+    def _query_chunk(self, queries):
+        squared = np.full(len(queries), np.inf)
+        indices = np.full(len(queries), -1, dtype=np.int64)
+        exact = np.zeros(len(queries), dtype=bool)
+
+        # Upper bound from the finest level with points in the 2x2x2 cells around each query
+        pending = np.arange(len(queries))
+        level_index = 0
+        while pending.size:
+            grid = self.level(level_index)
+            low = grid._cells(queries[pending] - grid.cell_size * 0.5)
+            high = np.minimum(low + 1, grid.dims - 1)
+            found_squared, found = grid._nearest_in_blocks(queries[pending], low, high, span=2)
+
+            hit = found >= 0
+            squared[pending[hit]] = found_squared[hit]
+            indices[pending[hit]] = found[hit]
+            exact[pending[hit]] = (np.sqrt(found_squared[hit]) <=
+                                   grid._searched_distance(queries[pending[hit]], low[hit], high[hit]))
+
+            pending = pending[~hit]
+            level_index += 1
+
+        # Exact pass on the level whose cells are about half the bound wide (at most 5 cells per axis),
+        # only the cells whose box is within the bound are gathered
+        refine = np.flatnonzero(~exact)
+        if refine.size:
+            bounds = np.sqrt(squared[refine])
+            levels = np.ceil(np.log2(np.maximum(bounds / (2.0 * self.cell_size), 1.0))).astype(np.int64)
+
+            for level_index in np.unique(levels).tolist():
+                grid = self.level(level_index)
+                subset = refine[levels == level_index]
+                radius = np.sqrt(squared[subset])
+                low = grid._cells(queries[subset] - radius[:, None])
+                high = grid._cells(queries[subset] + radius[:, None])
+
+                found_squared, found = grid._nearest_in_blocks(queries[subset], low, high, span=5, radius=radius)
+                closer = found_squared < squared[subset]
+                squared[subset[closer]] = found_squared[closer]
+                indices[subset[closer]] = found[closer]
+
+        return np.sqrt(squared), indices
+
+
+class TriangleProjector:
+    """
+        Exact closest point projection onto a triangulated surface. Every triangle is registered in
+        the grid cells its bounding box overlaps (cells about as wide as the triangles): the triangles
+        of the cell holding a query give a distance bound, only the queries whose bound leaves
+        that cell then gather the cells and triangle boxes within it. Queries without triangles in
+        the cells around them, or whose bound spans more cells than there are clusters (blocks of
+        cells), test the cluster boxes instead: the triangles of the nearest cluster give the bound
+        the other clusters are pruned with.
+    """
+    # Grid cells (or query-cluster pairs) gathered per exact pass batch, bounds the flat candidate arrays
+    CELL_BUDGET = 1 << 18
+    # Cells per axis of a cluster, the triangles are grouped by the cluster of their first cell
+    CLUSTER_CELLS = 8
+    # Slack on the bounds, a triangle exactly at the bound must stay a candidate
+    TOLERANCE = 1e-9
+
+    def __init__(self, points, triangles):
+        """
+            :param points: (N, 3) source points
+            :param triangles: (T, 3) source vertex indices
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+
+        corners = self.points[self.triangles]
+        self.box_min = corners.min(axis=1) if len(self.triangles) else np.zeros((0, 3))
+        self.box_max = corners.max(axis=1) if len(self.triangles) else np.zeros((0, 3))
+
+        # First corner, edges and edge dot products, a candidate then only needs ab.ap and ac.ap
+        self._a = np.ascontiguousarray(corners[:, 0])
+        self._ab = np.ascontiguousarray(corners[:, 1] - corners[:, 0])
+        self._ac = np.ascontiguousarray(corners[:, 2] - corners[:, 0])
+        self._ab_ab = np.einsum("ij,ij->i", self._ab, self._ab)
+        self._ab_ac = np.einsum("ij,ij->i", self._ab, self._ac)
+        self._ac_ac = np.einsum("ij,ij->i", self._ac, self._ac)
+
+        self.minimum = self.box_min.min(axis=0) if len(self.triangles) else np.zeros(3)
+        extent = (self.box_max.max(axis=0) - self.minimum) if len(self.triangles) else np.zeros(3)
+        sizes = (self.box_max - self.box_min).max(axis=1)
+        self.cell_size = max(float(sizes.mean()) if sizes.size else 1.0, 1e-9)
+        self.dims = np.floor(extent / self.cell_size).astype(np.int64) + 1
+
+        # Cell -> triangles CSR, over the occupied cells only. Every entry flags the axes on which its
+        # cell is the first one of the triangle box (bit 0: x, 1: y, 2: z)
+        low_cells = self._cells(self.box_min)
+        owner, cells = expand_boxes(low_cells, self._cells(self.box_max))
+        keys = self._keys(cells)
+        order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.cell_ends = self.cell_starts + counts
+        self.cell_triangles = owner[order]
+        self.cell_flags = self._axis_flags(cells[order], low_cells[owner[order]])
+
+        # (triangles, starts, ends, box_min, box_max) of the clusters, for the far queries
+        self._clusters = None
+
+    def _cells(self, points):
+        # Clamped, the cells outside the grid hold no triangle
+        cells = np.floor((points - self.minimum) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.dims - 1)
+
+    def _keys(self, cells):
+        return (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+
+    @staticmethod
+    def _axis_flags(cells, first_cells):
+        """ uint8 with one bit per axis where cells equal first_cells. """
+        equal = (cells == first_cells).astype(np.uint8)
+        return equal[:, 0] | (equal[:, 1] << 1) | (equal[:, 2] << 2)
+
+    @property
+    def clusters(self):
+        if self._clusters is None:
+            cells = self._cells(self.box_min) // self.CLUSTER_CELLS
+            dims = self.dims // self.CLUSTER_CELLS + 1
+            keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+            order = np.argsort(keys, kind="stable")
+            _, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+            self._clusters = (order, starts, starts + counts,
+                              np.minimum.reduceat(self.box_min[order], starts),
+                              np.maximum.reduceat(self.box_max[order], starts))
+        return self._clusters
+
+    def _cluster_triangles(self, owner, clusters):
+        order, starts, ends = self.clusters[:3]
+        range_owner, positions = expand_ranges(starts[clusters], ends[clusters])
+        return owner[range_owner], order[positions]
+
+    def _project_clusters(self, queries, squared, vertices, barycentrics):
+        """ Exact closest point of every query over the cluster boxes, squared may hold inf. """
+        cluster_min, cluster_max = self.clusters[3:]
+        gaps = np.zeros((len(queries), len(cluster_min)))
+        for axis in range(3):
+            position = queries[:, axis, None]
+            gap = np.maximum(np.maximum(cluster_min[None, :, axis] - position, position - cluster_max[None, :, axis]), 0.0)
+            gaps += gap * gap
+
+        # The triangles of the nearest cluster bound the query, then every cluster within the bound
+        self._closest(queries, *self._cluster_triangles(np.arange(len(queries)), gaps.argmin(axis=1)),
+                      squared, vertices, barycentrics)
+        radius = np.sqrt(squared) * (1.0 + self.TOLERANCE) + self.TOLERANCE
+        owner, clusters = np.nonzero(gaps <= (radius ** 2)[:, None])
+
+        owner, triangles = self._cluster_triangles(owner, clusters)
+        near = box_squared_gap(queries[owner], self.box_min[triangles], self.box_max[triangles]) <= radius[owner] ** 2
+        self._closest(queries, owner[near], triangles[near], squared, vertices, barycentrics)
+
+    def _candidates(self, queries, low, high, radius=None):
+        """
+            Flat (query, triangle) pairs of the cells between low and high (inclusive).
+
+            :param radius: per query distance, every triangle is then listed once per query and
+                           the ones whose box is farther are skipped
+        """
+        cell_owner, cells = expand_boxes(low, high)
+        empty = np.zeros(0, dtype=np.int64)
+        if not cell_owner.size or not self.cell_keys.size:
+            return empty, empty
+
+        keys = self._keys(cells)
+        slots = np.minimum(np.searchsorted(self.cell_keys, keys), self.cell_keys.size - 1)
+        found = self.cell_keys[slots] == keys
+        cell_owner, cells, slots = cell_owner[found], cells[found], slots[found]
+
+        range_owner, positions = expand_ranges(self.cell_starts[slots], self.cell_ends[slots])
+        owner, triangles = cell_owner[range_owner], self.cell_triangles[positions]
+        if radius is None or not owner.size:
+            return owner, triangles
+
+        # A triangle overlapping several cells of the block is kept in the first one only: on every
+        # axis the cell is either the first of the triangle box or on the low face of the block
+        block_flags = self._axis_flags(cells, low[cell_owner])
+        first = (block_flags[range_owner] | self.cell_flags[positions]) == 7
+        owner, triangles = owner[first], triangles[first]
+
+        near = box_squared_gap(queries[owner], self.box_min[triangles], self.box_max[triangles]) <= radius[owner] ** 2
+        return owner[near], triangles[near]
+
+    def _closest(self, queries, owner, triangles, squared, vertices, barycentrics):
+        """ Keep, per query, the closest point of its candidate triangles when closer than squared. """
+        if not owner.size:
+            return
+
+        ap = queries[owner] - self._a[triangles]
+        ab, ac = self._ab[triangles], self._ac[triangles]
+        v, w = closest_point_coordinates(np.einsum("ij,ij->i", ab, ap), np.einsum("ij,ij->i", ac, ap),
+                                         self._ab_ab[triangles], self._ab_ac[triangles], self._ac_ac[triangles])
+        offsets = ap - v[:, None] * ab - w[:, None] * ac
+        distances = np.einsum("ij,ij->i", offsets, offsets)
+
+        best = group_argmin(owner, distances, len(queries))
+        hit = best >= 0
+        hit[hit] = distances[best[hit]] < squared[hit]
+        best = best[hit]
+        squared[hit] = distances[best]
+        vertices[hit] = self.triangles[triangles[best]]
+        barycentrics[hit] = np.stack((1.0 - v[best] - w[best], v[best], w[best]), axis=1)
+
+    def project(self, queries):
+        """
+            :return: (vertices, barycentrics, distances) (M, 3) source vertices, (M, 3) weights and (M,)
+                     distance of the closest point of every query. Without any triangle, queries map
+                     to their nearest vertex with weights (1, 0, 0)
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float64).reshape(-1, 3)
+        vertices = np.zeros((len(queries), 3), dtype=np.int64)
+        barycentrics = np.zeros((len(queries), 3))
+        barycentrics[:, 0] = 1.0
+
+        if not len(self.triangles):
+            distances, nearest = PointGrid(self.points).query(queries)
+            vertices[:] = nearest[:, None]
+            return vertices, barycentrics, distances
+
+        squared = np.full(len(queries), np.inf)
+        for start in range(0, len(queries), PointGrid.CHUNK_SIZE):
+            chunk = slice(start, start + PointGrid.CHUNK_SIZE)
+            self._project_chunk(queries[chunk], squared[chunk], vertices[chunk], barycentrics[chunk])
+
+        return vertices, barycentrics, np.sqrt(squared)
+
+    def _project_chunk(self, queries, squared, vertices, barycentrics):
+        """ Fill the views squared, vertices and barycentrics of a query chunk. """
+        # Bound from the triangles of the cell holding every query
+        cells = self._cells(queries)
+        self._closest(queries, *self._candidates(queries, cells, cells), squared, vertices, barycentrics)
+
+        # Then from the cells around the queries whose cell is empty
+        unbounded = np.flatnonzero(np.isinf(squared))
+        if unbounded.size:
+            around = np.maximum(cells[unbounded] - 1, 0), np.minimum(cells[unbounded] + 1, self.dims - 1)
+            found = squared[unbounded], vertices[unbounded], barycentrics[unbounded]
+            self._closest(queries[unbounded], *self._candidates(queries[unbounded], *around), *found)
+            squared[unbounded], vertices[unbounded], barycentrics[unbounded] = found
+
+        # Exact pass for the queries whose bound reaches past their cell, or that still have none. The cell
+        # blocks are gathered in batches of CELL_BUDGET cells, the cluster pass counts every cluster
+        radius = np.sqrt(squared) * (1.0 + self.TOLERANCE) + self.TOLERANCE
+        unbounded = np.isinf(radius)
+        reach = np.where(unbounded, 0.0, radius)[:, None]
+        low, high = self._cells(queries - reach), self._cells(queries + reach)
+        pending = np.flatnonzero(unbounded | np.any(low != cells, axis=1) | np.any(high != cells, axis=1))
+        if not pending.size:
+            return
+
+        cluster_count = len(self.clusters[1])
+        cell_counts = np.prod(high[pending] - low[pending] + 1, axis=1)
+        far = unbounded[pending] | (cell_counts > cluster_count)
+        batches = np.cumsum(np.where(far, cluster_count, cell_counts)) // self.CELL_BUDGET
+        for batch in np.unique(batches).tolist():
+            in_batch = batches == batch
+            for subset, in_clusters in ((pending[in_batch & ~far], False), (pending[in_batch & far], True)):
+                if not subset.size:
+                    continue
+
+                # Fancy indexing copies, the results are written back to the chunk views
+                found = squared[subset], vertices[subset], barycentrics[subset]
+                if in_clusters:
+                    self._project_clusters(queries[subset], *found)
+                else:
+                    owner, triangles = self._candidates(queries[subset], low[subset], high[subset], radius[subset])
+                    self._closest(queries[subset], owner, triangles, *found)
+                squared[subset], vertices[subset], barycentrics[subset] = found
@@ -0,0 +1,224 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Vertex to mirror vertex map of a mesh, solved once and cached per topology hash, either on
+    the rest positions with a spatialIndex.PointGrid, or on the connectivity alone from a center
+    edge for scanned/asymmetric meshes.
+    Mirror Left to Right, Mirror Right to Left and Flip are then one fancy-indexing
+    operation on any weight array of that mesh, whatever the deformer.
+
+How to: (how to execute the core of this module)
+    symmetry_map = SymmetryMap.from_mesh("|body", axis="x")
+    symmetry_map = SymmetryMap.from_center_edge("|body", edge_index=1024)
+    weights = symmetry_map.mirror(weights, SymmetryMap.POSITIVE)
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app import spatialIndex
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+AXES = {"x": 0, "y": 1, "z": 2}
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class SymmetryMap:
+    # Side of a vertex along the symmetry axis, POSITIVE is the character left for x
+    POSITIVE = 1
+    CENTER = 0
+    NEGATIVE = -1
+
+    # (topology hash, axis, tolerance or ("edge", center edge)) -> SymmetryMap, oldest entries are dropped past MAX_CACHED
+    _cache = {}
+    MAX_CACHED = 16
+
+    def __init__(self, indices, sides, axis="x", tolerance=0.001):
+        """
+            :param indices: (N,) mirror vertex of every vertex, -1 when none was found within tolerance
+            :param sides: (N,) int8 POSITIVE, CENTER or NEGATIVE
+        """
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.sides = np.asarray(sides, dtype=np.int8)
+        self.axis = axis
+        self.tolerance = tolerance
+
+    def __repr__(self):
+        return "SymmetryMap({} vertices, axis={}, {} unmatched)".format(
+            self.indices.size, self.axis, self.unmatched.size)
+
+    def __len__(self):
+        return self.indices.size
+
+    @property
+    def unmatched(self):
+        """ Vertices without a mirror vertex, mirror and flip leave them untouched. """
+        return np.flatnonzero(self.indices < 0)
+
+    @classmethod
+    def from_points(cls, points, axis="x", tolerance=0.001):
+        """ Match every point with the nearest point of its reflection across the axis plane. """
+        points = np.asarray(points, dtype=np.float64)
+        axis_index = AXES[axis]
+
+        reflected = points.copy()
+        reflected[:, axis_index] *= -1.0
+        _, indices = spatialIndex.PointGrid(points).query(reflected, max_distance=tolerance)
+
+        coordinates = points[:, axis_index]
+        sides = np.where(coordinates > tolerance, cls.POSITIVE, np.where(coordinates < -tolerance,
+                                                                         cls.NEGATIVE, cls.CENTER))
+        return cls(indices, sides, axis, tolerance)
+
+    @classmethod
+    def from_mesh(cls, geometry, axis="x", tolerance=0.001):
+        """ Cached map of a mesh, solved on its rest (Orig) positions. """
+        topology = meshTopology.MeshTopology.from_mesh(geometry)
+        key = (topology.hash, axis, tolerance)
+
+        symmetry_map = cls._cache.pop(key, None)
+        if symmetry_map is None:
+            symmetry_map = cls.from_points(meshTopology.get_rest_points(geometry), axis, tolerance)
+            while len(cls._cache) >= cls.MAX_CACHED:
+                del cls._cache[next(iter(cls._cache))]
+
+        cls._cache[key] = symmetry_map
+        return symmetry_map
+
+    @classmethod
+    def from_topology(cls, topology, center_edge, points=None, axis="x"):
+        """
+            Solve the map on the connectivity only, for scanned or posed meshes whose rest positions
+            are not symmetric. Faces are matched in mirrored pairs from the two faces of a center edge,
+            walking one face forward and its mirror backward, then crossing every matched edge,
+            one vectorized step per breadth-first frontier.
+
+            :param topology: meshTopology.MeshTopology
+            :param center_edge: (vertex, vertex) of an edge lying on the symmetry plane
+            :param points: optional (N, 3) rest points, only used to tell which side is POSITIVE
+        """
+        start, end = center_edge
+        edge_corner = topology.find_corner(start, end)
+        twin_corner = topology.find_corner(end, start)
+        if edge_corner < 0 or twin_corner < 0:
+            raise ValueError("{} is not an edge between two faces".format(center_edge))
+
+        connects = topology.connects
+        counts = topology.counts
+        offsets = topology.face_offsets()
+        corner_next = topology.corner_next
+        corner_faces = topology.corner_faces
+        twins = topology.twins
+
+        indices = np.full(topology.vertex_count, -1, dtype=np.int64)
+        indices[[start, end]] = [start, end]
+        face_sides = np.zeros(counts.size, dtype=np.int8)
+
+        # Matched corners: frontier_a walks its face forward, frontier_b walks its mirror face backward
+        frontier_a = np.array([edge_corner], dtype=np.int64)
+        frontier_b = np.array([corner_next[twin_corner]], dtype=np.int64)
+
+        while frontier_a.size:
+            face_a = corner_faces[frontier_a]
+            face_b = corner_faces[frontier_b]
+            keep = ((face_sides[face_a] == 0) & (face_sides[face_b] == 0) &
+                    (face_a != face_b) & (counts[face_a] == counts[face_b]))
+            frontier_a, frontier_b = frontier_a[keep], frontier_b[keep]
+
+            # One pair per face
+            _, first = np.unique(corner_faces[frontier_a], return_index=True)
+            frontier_a, frontier_b = frontier_a[first], frontier_b[first]
+            _, first = np.unique(corner_faces[frontier_b], return_index=True)
+            frontier_a, frontier_b = frontier_a[first], frontier_b[first]
+            if not frontier_a.size:
+                break
+
+            face_a = corner_faces[frontier_a]
+            face_b = corner_faces[frontier_b]
+            face_sides[face_a] = 1
+            face_sides[face_b] = -1
+
+            # Every corner of both faces, in walking order
+            sizes = counts[face_a].astype(np.int64)
+            owner, step = spatialIndex.expand_ranges(np.zeros(sizes.size, dtype=np.int64), sizes)
+            size = sizes[owner]
+            start_a, start_b = offsets[face_a][owner], offsets[face_b][owner]
+            position_a, position_b = frontier_a[owner] - start_a, frontier_b[owner] - start_b
+
+            corners_a = start_a + (position_a + step) % size
+            corners_b = start_b + (position_b - step) % size
+
+            vertices_a, vertices_b = connects[corners_a], connects[corners_b]
+            unset = (indices[vertices_a] < 0) & (indices[vertices_b] < 0)
+            indices[vertices_a[unset]] = vertices_b[unset]
+            indices[vertices_b[unset]] = vertices_a[unset]
+
+            # Across every matched edge: the A half-edge corners_a -> next mirrors the B half-edge
+            # from the following B corner, their twins start the next pair of faces
+            following_b = start_b + (position_b - step - 1) % size
+            twins_a, twins_b = twins[corners_a], twins[following_b]
+            valid = (twins_a >= 0) & (twins_b >= 0)
+            frontier_a, frontier_b = twins_a[valid], corner_next[twins_b[valid]]
+
+        # Sides from the faces each vertex belongs to, self mirrored vertices are the center
+        sides = np.zeros(topology.vertex_count, dtype=np.int8)
+        corner_sides = face_sides[corner_faces]
+        sides[connects[corner_sides == 1]] = cls.POSITIVE
+        sides[connects[corner_sides == -1]] = cls.NEGATIVE
+        sides[indices == np.arange(topology.vertex_count)] = cls.CENTER
+
+        if points is not None:
+            coordinates = np.asarray(points)[:, AXES[axis]]
+            positive, negative = sides == cls.POSITIVE, sides == cls.NEGATIVE
+            if positive.any() and negative.any() and coordinates[positive].mean() < coordinates[negative].mean():
+                sides = -sides
+
+        return cls(indices, sides, axis, tolerance=None)
+
+    @classmethod
+    def from_center_edge(cls, geometry, edge_index, axis="x"):
+        """ Cached topological map of a mesh from one of its center edges. """
+        topology = meshTopology.MeshTopology.from_mesh(geometry)
+        key = (topology.hash, axis, ("edge", edge_index))
+
+        symmetry_map = cls._cache.pop(key, None)
+        if symmetry_map is None:
+            center_edge = meshTopology.get_edge_vertices(geometry, edge_index)
+            symmetry_map = cls.from_topology(topology, center_edge, meshTopology.get_rest_points(geometry), axis)
+            while len(cls._cache) >= cls.MAX_CACHED:
+                del cls._cache[next(iter(cls._cache))]
+
+        cls._cache[key] = symmetry_map
+        return symmetry_map
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    # ------------------------------------------------------------------ operations
+    def mirror(self, weights, source=POSITIVE):
+        """ Copy the weights of the source side onto the matched vertices of the other side. """
+        weights = np.asarray(weights)
+        result = weights.copy()
+        destination = np.flatnonzero((self.sides == -source) & (self.indices >= 0))
+        result[destination] = weights[self.indices[destination]]
+        return result
+
+    def flip(self, weights):
+        """ Swap the weights of every matched vertex with its mirror vertex. """
+        weights = np.asarray(weights)
+        result = weights.copy()
+        matched = np.flatnonzero(self.indices >= 0)
+        result[matched] = weights[self.indices[matched]]
+        return result
@@ -0,0 +1,443 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+        Timing helpers and an in-memory stand-in for the parts of maya.cmds and
+        maya.api.OpenMaya used by meshDeformer.DeformerUtils, so the deformer
+        discovery engines can be compared on synthetic graphs of any size.
+        benchmark_weight_io compares the binary weightIO files with the XML
+        deformerWeights export/import on skinned planes built in the live scene.
+
+How to: (how to execute the core of this module)
+        from MeshDeformer.app.util import benchmarkUtils
+        scene = benchmarkUtils.InMemoryScene.build_character(deformers=40, history_padding=300)
+        benchmarkUtils.benchmark_engines("body", iterations=200, scene=scene)
+        benchmarkUtils.benchmark_weight_io((100000, 500000, 2000000))
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import contextlib
+import math
+import os
+import tempfile
+import time
+
+from maya import cmds
+
+from MeshDeformer.app import meshDeformer
+from MeshDeformer.app import weightIO
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def time_call(func, *args, iterations=1, **kwargs):
+    """
+        Call func iterations times and return (best, average) in seconds.
+    """
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), sum(timings) / len(timings)
+
+
+@contextlib.contextmanager
+def in_memory_maya(scene):
+    """
+        Temporarily route DeformerUtils' cmds and OpenMaya calls to an InMemoryScene.
+    """
+    utils = meshDeformer.DeformerUtils
+    previous = meshDeformer.cmds, utils.api, utils.api_anim
+
+    meshDeformer.cmds = InMemoryCmds(scene)
+    utils.api = utils.api_anim = InMemoryOpenMaya(scene)
+    try:
+        yield scene
+    finally:
+        meshDeformer.cmds, utils.api, utils.api_anim = previous
+
+
+def benchmark_engines(obj, iterations=100, scene=None):
+    """
+        Time every DeformerUtils discovery engine on obj and print the results.
+
+        :param obj: object to query
+        :param iterations: number of calls per engine
+        :param scene: optional InMemoryScene, the live Maya scene is used when None
+
+        :return: {engine: (best, average)}
+    """
+    utils = meshDeformer.DeformerUtils
+    context = in_memory_maya(scene) if scene is not None else contextlib.nullcontext()
+
+    results = {}
+    with context:
+        for engine in (utils.ENGINE_CMDS, utils.ENGINE_API):
+            results[engine] = time_call(utils.get_deformers_from_object, obj, engine, iterations=iterations)
+
+    for engine, (best, average) in results.items():
+        print("{:<6} best {:.3f} ms | average {:.3f} ms".format(engine, best * 1000.0, average * 1000.0))
+
+    return results
+
+def build_skinned_plane(vertex_count, joints=60, max_influences=4):
+    """
+        Build a polyPlane of about vertex_count vertices bound to a row of joints.
+
+        :return: (transform, skinCluster, joints)
+    """
+    subdivisions = max(int(math.sqrt(vertex_count)) - 1, 1)
+    transform = cmds.polyPlane(width=100, height=100, subdivisionsX=subdivisions,
+                               subdivisionsY=subdivisions, constructionHistory=False)[0]
+
+    cmds.select(clear=True)
+    joint_names = [cmds.joint(position=(-50.0 + 100.0 * i / max(joints - 1, 1), 0, 0)) for i in range(joints)]
+    skin_cluster = cmds.skinCluster(joint_names, transform, toSelectedBones=True,
+                                    maximumInfluences=max_influences, obeyMaxInfluences=True)[0]
+    return transform, skin_cluster, joint_names
+
+
+def benchmark_weight_io(vertex_counts=(100000, 500000, 2000000), joints=60, directory=None):
+    """
+        Time the export and import of the skin weights of planes of each vertex count, with the XML
+        deformerWeights command and with weightIO, and print the timings and file sizes.
+
+        :return: {vertex_count: {"xml"|"binary": (export seconds, import seconds, bytes)}}
+    """
+    directory = directory or tempfile.mkdtemp(prefix="weightIO_")
+
+    results = {}
+    for vertex_count in vertex_counts:
+        transform, skin_cluster, joint_names = build_skinned_plane(vertex_count, joints)
+        xml_name = "{}.xml".format(transform)
+        binary_path = os.path.join(directory, transform + weightIO.EXTENSION)
+        try:
+            xml_export = time_call(cmds.deformerWeights, xml_name, export=True,
+                                   deformer=skin_cluster, path=directory)[0]
+            xml_import = time_call(cmds.deformerWeights, xml_name, im=True, method="index",
+                                   deformer=skin_cluster, path=directory)[0]
+            binary_export = time_call(weightIO.export_skin, skin_cluster, binary_path)[0]
+            binary_import = time_call(weightIO.import_skin, skin_cluster, binary_path)[0]
+
+            results[vertex_count] = {
+                "xml": (xml_export, xml_import, os.path.getsize(os.path.join(directory, xml_name))),
+                "binary": (binary_export, binary_import, os.path.getsize(binary_path)),
+            }
+        finally:
+            cmds.delete(transform, joint_names[0])
+
+    for vertex_count, formats in results.items():
+        for name, (export_time, import_time, size) in formats.items():
+            print("{:>8} vertices {:<6} export {:8.3f} s | import {:8.3f} s | {:9.1f} MB".format(
+                vertex_count, name, export_time, import_time, size / 1e6))
+
+    return results
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class InMemoryNode:
+    """ A dependency node of the in-memory scene. """
+    __slots__ = ("name", "type", "inputs", "shapes", "intermediate", "aliases", "influences")
+
+    DAG_TYPES = frozenset(("transform", "joint", "mesh", "nurbsSurface", "nurbsCurve"))
+
+    def __init__(self, name, node_type, inputs=(), intermediate=False, aliases=(), influences=()):
+        self.name = name
+        self.type = node_type
+        self.inputs = list(inputs)
+        self.shapes = []
+        self.intermediate = intermediate
+        self.aliases = list(aliases)
+        self.influences = list(influences)
+
+    def hasFn(self, fn_type):
+        if fn_type == "dagNode":
+            return self.type in self.DAG_TYPES
+        if fn_type == "geometryFilter":
+            return self.type in InMemoryScene.GEOMETRY_FILTER_TYPES
+        return self.type == fn_type
+
+
+class InMemoryScene:
+    """ Minimal dependency graph: nodes by name, each one listing its upstream nodes. """
+
+    GEOMETRY_FILTER_TYPES = set(meshDeformer.DeformerUtils.VALID_DEFORMERS_TYPES) | {"tweak"}
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, node_type, **kwargs):
+        self.nodes[name] = InMemoryNode(name, node_type, **kwargs)
+        return self.nodes[name]
+
+    def history(self, name, prune_dag=False):
+        """
+            Upstream nodes of name in depth first order, the way listHistory returns them.
+
+            :param prune_dag: do not walk past DAG nodes, like listHistory(pruneDagObjects=True)
+        """
+        ordered = []
+        visited = {name}
+        stack = list(reversed(self.nodes[name].inputs))
+        while stack:
+            current = stack.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            ordered.append(current)
+            if not (prune_dag and self.nodes[current].hasFn("dagNode")):
+                stack.extend(reversed(self.nodes[current].inputs))
+
+        return ordered
+
+    @classmethod
+    def build_character(cls, name="body", deformers=20, targets=50, joints=60, history_padding=200):
+        """
+            Build a transform/shape pair deformed by a stack of deformers cycling through
+            VALID_DEFORMERS_TYPES, with history_padding extra non deformer nodes upstream.
+        """
+        scene = cls()
+        types = meshDeformer.DeformerUtils.VALID_DEFORMERS_TYPES
+
+        upstream = "{}ShapeOrig".format(name)
+        scene.add(upstream, "mesh", intermediate=True)
+
+        for i in range(history_padding):
+            node = scene.add("groupParts{}".format(i), "groupParts", inputs=[upstream])
+            upstream = node.name
+
+        joint_names = ["joint{}".format(i) for i in range(joints)]
+        for joint in joint_names:
+            scene.add(joint, "joint")
+
+        for i in range(deformers):
+            node_type = types[i % len(types)]
+            kwargs = {}
+            if node_type == "blendShape":
+                kwargs["aliases"] = [("target{}".format(t), "weight[{}]".format(t)) for t in range(targets)]
+            elif node_type == "skinCluster":
+                kwargs["influences"] = joint_names
+            node = scene.add("{}{}".format(node_type, i), node_type, inputs=[upstream], **kwargs)
+            upstream = node.name
+
+        shape = scene.add("{}Shape".format(name), "mesh", inputs=[upstream])
+        transform = scene.add(name, "transform")
+        transform.shapes = [shape.name, "{}ShapeOrig".format(name)]
+
+        return scene
+
+    @classmethod
+    def build_wrap_setup(cls, joints=10):
+        """
+            Build a skinned "body", a "shirt" wrapped on it and a "face" whose blendShape has a
+            live "smile" target mesh deformed by its own cluster. The shirt and face histories
+            reach foreign deformers through DAG shapes, pruned walks must not report them.
+        """
+        scene = cls()
+        joint_names = ["joint{}".format(i) for i in range(joints)]
+        for joint in joint_names:
+            scene.add(joint, "joint", inputs=["rigCluster"] if joint == joint_names[0] else ())
+        scene.add("rigCluster", "cluster")
+
+        scene.add("bodyShapeOrig", "mesh", intermediate=True)
+        scene.add("bodySkin", "skinCluster", inputs=["bodyShapeOrig"] + joint_names, influences=joint_names)
+        scene.add("bodyShape", "mesh", inputs=["bodySkin"])
+        scene.add("body", "transform").shapes = ["bodyShape", "bodyShapeOrig"]
+
+        scene.add("shirtShapeOrig", "mesh", intermediate=True)
+        scene.add("shirtWrap", "wrap", inputs=["shirtShapeOrig", "bodyShape"])
+        scene.add("shirtDeltaMush", "deltaMush", inputs=["shirtWrap"])
+        scene.add("shirtShape", "mesh", inputs=["shirtDeltaMush"])
+        scene.add("shirt", "transform").shapes = ["shirtShape", "shirtShapeOrig"]
+
+        scene.add("smileShapeOrig", "mesh", intermediate=True)
+        scene.add("smileCluster", "cluster", inputs=["smileShapeOrig"])
+        scene.add("smileShape", "mesh", inputs=["smileCluster"])
+        scene.add("smile", "transform").shapes = ["smileShape", "smileShapeOrig"]
+
+        scene.add("faceShapeOrig", "mesh", intermediate=True)
+        scene.add("faceBlendShape", "blendShape", inputs=["faceShapeOrig", "smileShape"],
+                  aliases=[("smile", "weight[0]")])
+        scene.add("faceShape", "mesh", inputs=["faceBlendShape"])
+        scene.add("face", "transform").shapes = ["faceShape", "faceShapeOrig"]
+
+        return scene
+
+
+class InMemoryCmds:
+    """ Stand-in for the maya.cmds commands used by the cmds engine. """
+
+    def __init__(self, scene):
+        self.scene = scene
+
+    def objExists(self, name):
+        return name in self.scene.nodes
+
+    def nodeType(self, name):
+        return self.scene.nodes[name].type
+
+    def listHistory(self, name, pruneDagObjects=False):
+        node = self.scene.nodes[name]
+        roots = [shape for shape in node.shapes if not self.scene.nodes[shape].intermediate] or [name]
+        history = []
+        for root in roots:
+            history.extend(self.scene.history(root, prune_dag=pruneDagObjects))
+        if pruneDagObjects:
+            history = [n for n in history if self.scene.nodes[n].type not in ("mesh", "transform", "joint")]
+        return history
+
+    def listRelatives(self, name, shapes=False, noIntermediate=False, fullPath=False):
+        return [shape for shape in self.scene.nodes[name].shapes
+                if not (noIntermediate and self.scene.nodes[shape].intermediate)]
+
+    def listConnections(self, plug, source=True, destination=True, connections=False):
+        name = plug.partition(".")[0]
+        result = []
+        for index, influence in enumerate(self.scene.nodes[name].influences):
+            result.extend(("{}.matrix[{}]".format(name, index), influence))
+        return result
+
+    def aliasAttr(self, name, query=False):
+        flat = []
+        for alias, attribute in self.scene.nodes[name].aliases:
+            flat.extend((alias, attribute))
+        return flat
+
+
+class InMemoryOpenMaya:
+    """ Stand-in for the maya.api.OpenMaya/OpenMayaAnim classes used by the api engine. """
+
+    def __init__(self, scene):
+        api = self
+
+        class MFn:
+            kInvalid = None
+            kDagNode = "dagNode"
+            kGeometryFilt = "geometryFilter"
+            kTransform = "transform"
+            kMesh = "mesh"
+
+        class MItDependencyGraph:
+            """ Depth first upstream walk from root (included), prune() skips the inputs of the current node. """
+            kUpstream = kDepthFirst = kNodeLevel = None
+
+            def __init__(self, root, filter_type=None, *args):
+                self._filter = filter_type
+                self._stack = [root]
+                self._visited = set()
+                self._pruned = False
+                self._settle()
+
+            def _settle(self):
+                """ Bring the next unvisited node matching the filter on top of the stack. """
+                while self._stack:
+                    node = self._stack[-1]
+                    if node.name in self._visited:
+                        self._stack.pop()
+                    elif self._filter is not None and not node.hasFn(self._filter):
+                        self._advance()
+                    else:
+                        return
+
+            def _advance(self):
+                current = self._stack.pop()
+                self._visited.add(current.name)
+                if not self._pruned:
+                    self._stack.extend(scene.nodes[name] for name in reversed(current.inputs))
+                self._pruned = False
+
+            def isDone(self):
+                return not self._stack
+
+            def currentNode(self):
+                return self._stack[-1]
+
+            def prune(self):
+                self._pruned = True
+
+            def next(self):
+                self._advance()
+                self._settle()
+
+        class MDagPath:
+            def __init__(self, other=None):
+                self._node = other._node if other is not None else None
+
+            def hasFn(self, fn_type):
+                return self._node.hasFn(fn_type)
+
+            def node(self):
+                return self._node
+
+            def numberOfShapesDirectlyBelow(self):
+                return len(self._node.shapes)
+
+            def extendToShape(self, index=0):
+                self._node = scene.nodes[self._node.shapes[index]]
+
+            def partialPathName(self):
+                return self._node.name
+
+        class MSelectionList:
+            def __init__(self):
+                self._nodes = []
+
+            def add(self, name):
+                if name not in scene.nodes:
+                    raise RuntimeError("No object matches name: {}".format(name))
+                self._nodes.append(scene.nodes[name])
+
+            def getDependNode(self, index):
+                return self._nodes[index]
+
+            def getDagPath(self, index):
+                path = MDagPath()
+                path._node = self._nodes[index]
+                return path
+
+        class MFnDependencyNode:
+            def __init__(self, node):
+                self._node = node
+                self.typeName = node.type
+
+            def name(self):
+                return self._node.name
+
+            def getAliasList(self):
+                return list(self._node.aliases)
+
+        class MFnDagNode:
+            def __init__(self, path):
+                self._node = path.node() if isinstance(path, MDagPath) else path
+                self.isIntermediateObject = self._node.intermediate
+
+            def parent(self, index):
+                return next(node for node in scene.nodes.values() if self._node.name in node.shapes)
+
+        class MFnSkinCluster:
+            def __init__(self, node):
+                self._node = node
+
+            def indexForInfluenceObject(self, path):
+                return self._node.influences.index(path.partialPathName())
+
+            def influenceObjects(self):
+                paths = []
+                for influence in self._node.influences:
+                    path = MDagPath()
+                    path._node = scene.nodes[influence]
+                    paths.append(path)
+                return paths
+
+        for cls in (MFn, MItDependencyGraph, MDagPath, MSelectionList,
+                    MFnDependencyNode, MFnDagNode, MFnSkinCluster):
+            setattr(api, cls.__name__, cls)
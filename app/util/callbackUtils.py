@@ -0,0 +1,88 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+        Registry of the scriptJobs and OpenMaya MMessage callbacks owned by a tool.
+        IDs are stored when the callbacks are registered, grouped by owner (a node UUID,
+        a feature name, ...) so they can be removed per owner or all at once without
+        listing or parsing the scriptJobs of the whole session.
+
+How to: (how to execute the core of this module)
+        registry = CallbackRegistry()
+        registry.add_script_job(event=["SelectionChanged", func], protected=True)
+        registry.add_message(om.MNodeMessage.addNameChangedCallback(node, func), owner=uuid)
+        registry.remove_owner(uuid)
+        registry.remove_all()
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+from maya import cmds
+import maya.api.OpenMaya as om
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class CallbackRegistry:
+    # Owner of the callbacks registered without one
+    GLOBAL = None
+
+    def __init__(self):
+        self._script_jobs = {}  # owner -> [scriptJob ids]
+        self._messages = {}     # owner -> [MMessage callback ids]
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._script_jobs.values()) + \
+               sum(len(ids) for ids in self._messages.values())
+
+    def __contains__(self, owner):
+        return owner in self._script_jobs or owner in self._messages
+
+    def add_script_job(self, owner=GLOBAL, **kwargs):
+        """
+            Create a scriptJob and keep its id.
+
+            :param owner: key the job is grouped under
+            :param kwargs: cmds.scriptJob flags
+
+            :return: scriptJob id
+        """
+        job_id = cmds.scriptJob(**kwargs)
+        self._script_jobs.setdefault(owner, []).append(job_id)
+        return job_id
+
+    def add_message(self, callback_id, owner=GLOBAL):
+        """ Keep an MMessage callback id returned by one of the om.M*Message.add*Callback functions. """
+        self._messages.setdefault(owner, []).append(callback_id)
+        return callback_id
+
+    def add_messages(self, callback_ids, owner=GLOBAL):
+        self._messages.setdefault(owner, []).extend(callback_ids)
+        return callback_ids
+
+    def remove_owner(self, owner):
+        """ Remove every callback registered under owner, in O(number of its callbacks). """
+        job_ids = self._script_jobs.pop(owner, ())
+        for job_id in job_ids:
+            try:
+                cmds.scriptJob(kill=job_id, force=True)
+            except RuntimeError:
+                # Already gone, e.g. killed by a new scene
+                pass
+
+        for callback_id in self._messages.pop(owner, ()):
+            try:
+                om.MMessage.removeCallback(callback_id)
+            except RuntimeError:
+                # Stale id, e.g. its node was deleted or File > New cleared it
+                pass
+
+    def remove_all(self):
+        for owner in set(self._script_jobs) | set(self._messages):
+            self.remove_owner(owner)
@@ -0,0 +1,103 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+        Debounced refresh scheduler for Maya event callbacks.
+        Callbacks only mark the scheduler dirty, a single coalesced refresh runs once
+        Maya is idle and no new event came in for the debounce window.
+
+How to: (how to execute the core of this module)
+        scheduler = RefreshScheduler(self.refresh, debounce_ms=30, parent=self)
+        cmds.scriptJob(event=["SelectionChanged", scheduler.mark_dirty])
+
+Dependencies:  maya
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import time
+
+try:    # older DCC versions
+    from PySide2 import QtCore
+except: # newer DCC versions
+    from PySide6 import QtCore
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class RefreshScheduler(QtCore.QObject):
+    """
+        Coalesces bursts of events into one call of refresh_func.
+
+        :param refresh_func: callable run when the scheduler flushes
+        :param debounce_ms: quiet time required after the last event, 0 runs on the next idle
+        :param max_wait_ms: upper bound between the first event of a burst and the refresh,
+                            so a continuous stream of events cannot starve it, None to disable
+    """
+
+    def __init__(self, refresh_func, debounce_ms=0, max_wait_ms=250, parent=None):
+        super(RefreshScheduler, self).__init__(parent)
+        self.refresh_func = refresh_func
+        self.debounce_ms = debounce_ms
+        self.max_wait_ms = max_wait_ms
+
+        self.events_received = 0
+        self.refreshes_executed = 0
+
+        self._dirty_since = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def is_dirty(self):
+        return self._dirty_since is not None
+
+    def mark_dirty(self, *args):
+        """ Event callback entry point, extra arguments from the caller are ignored. """
+        self.events_received += 1
+        now = time.perf_counter()
+
+        if self._dirty_since is None:
+            self._dirty_since = now
+
+        elif self.max_wait_ms is not None and (now - self._dirty_since) * 1000.0 >= self.max_wait_ms:
+            # The pending refresh is overdue, let the running timer fire
+            if self._timer.isActive():
+                return
+
+        self._timer.start(self.debounce_ms)
+
+    def flush(self):
+        """ Run the pending refresh now, if any. """
+        self._timer.stop()
+        if self._dirty_since is None:
+            return
+
+        self._dirty_since = None
+        self.refreshes_executed += 1
+        self.refresh_func()
+
+    def cancel(self):
+        """ Drop the pending refresh without running it. """
+        self._timer.stop()
+        self._dirty_since = None
+
+    def set_debounce(self, debounce_ms):
+        self.debounce_ms = debounce_ms
+
+    def stats(self):
+        """ Counters of events received versus refreshes executed. """
+        return {
+            "events_received": self.events_received,
+            "refreshes_executed": self.refreshes_executed,
+            "coalesced": self.events_received - self.refreshes_executed,
+        }
+
+    def reset_stats(self):
+        self.events_received = 0
+        self.refreshes_executed = 0
@@ -0,0 +1,119 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Session clipboard of the deformer weight "Copy" and "Paste".
+    A copied array is kept quantized to uint16 along with the rest positions and triangles
+    of its mesh. Pasting on the same topology is a plain decode, pasting on another topology goes
+    through a closest point projection (spatialIndex.TriangleProjector) whose barycentric
+    mapping is kept per target topology hash, so repeated pastes reuse it.
+
+How to: (how to execute the core of this module)
+    clipboard.copy(DeformerWeights("deltaMush1", "|body").read())
+    weights = DeformerWeights("deltaMush2", "|shirt").read()
+    weights.paste(clipboard.paste(weights.geometry))
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app import spatialIndex
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class ClipboardEntry:
+    """ One copied weight array and the source surface needed to remap it. """
+    __slots__ = ("name", "topology_hash", "quantized", "points", "triangles", "_projector", "_mappings")
+
+    # 0-1 weights are stored as uint16 steps, 1 / 65535 is well under the weight display precision
+    LEVELS = np.iinfo(np.uint16).max
+
+    def __init__(self, name, topology_hash, weights, points, triangles):
+        self.name = name
+        self.topology_hash = topology_hash
+        self.quantized = np.round(np.clip(weights, 0.0, 1.0) * self.LEVELS).astype(np.uint16)
+        self.points = np.asarray(points, dtype=np.float32)
+        self.triangles = np.asarray(triangles, dtype=np.int32)
+
+        self._projector = None
+        self._mappings = {}     # target topology hash -> (vertices, barycentrics)
+
+    def __repr__(self):
+        return "ClipboardEntry({!r}, {} vertices)".format(self.name, self.quantized.size)
+
+    @property
+    def nbytes(self):
+        return self.quantized.nbytes + self.points.nbytes + self.triangles.nbytes
+
+    @property
+    def weights(self):
+        return self.quantized.astype(np.float32) / self.LEVELS
+
+    def get_mapping(self, topology_hash, points):
+        """ Cached (vertices, barycentrics) of the closest source point of every target point. """
+        if topology_hash not in self._mappings:
+            if self._projector is None:
+                self._projector = spatialIndex.TriangleProjector(self.points, self.triangles)
+            vertices, barycentrics, _ = self._projector.project(points)
+            self._mappings[topology_hash] = (vertices.astype(np.int32), barycentrics.astype(np.float32))
+
+        return self._mappings[topology_hash]
+
+    def remap(self, topology_hash, points=None):
+        """
+            Weights for a mesh with the given topology hash.
+
+            :param points: (N, 3) rest points of the target, only read when the topology differs
+                           and no mapping is cached yet, may be a callable returning them
+        """
+        if topology_hash == self.topology_hash:
+            return self.weights
+
+        if topology_hash not in self._mappings and callable(points):
+            points = points()
+        vertices, barycentrics = self.get_mapping(topology_hash, points)
+        return spatialIndex.interpolate(self.weights, vertices, barycentrics).astype(np.float32)
+
+
+class WeightClipboard:
+    def __init__(self):
+        self.entry = None
+
+    def __bool__(self):
+        return self.entry is not None
+
+    def copy(self, weights):
+        """ :param weights: deformerWeights.DeformerWeights, read if it was not yet """
+        values = weights.copy()
+        geometry = weights.geometry
+        self.entry = ClipboardEntry("{}.{}".format(weights.deformer, geometry.split("|")[-1]),
+                                    meshTopology.MeshTopology.from_mesh(geometry).hash,
+                                    values,
+                                    meshTopology.get_rest_points(geometry),
+                                    meshTopology.get_triangles(geometry))
+        return self.entry
+
+    def paste(self, geometry):
+        """ Copied weights remapped onto geometry, see ClipboardEntry.remap. """
+        if self.entry is None:
+            raise RuntimeError("The weight clipboard is empty")
+
+        topology_hash = meshTopology.MeshTopology.from_mesh(geometry).hash
+        return self.entry.remap(topology_hash, lambda: meshTopology.get_rest_points(geometry))
+
+    def clear(self):
+        self.entry = None
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+# Session clipboard, shared by every MeshDeformerWnd instance
+clipboard = WeightClipboard()
@@ -0,0 +1,330 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Versioned binary skin weight files (.mdw), the fast alternative to the XML deformerWeights.
+
+    Layout:
+        preamble    magic (8 bytes), version (uint32), JSON header size (uint32)
+        header      JSON: topology hash, vertex count, influence names and logical indices,
+                    {section name: offset, dtype, shape}
+        sections    raw little-endian arrays, 64 bytes aligned: CSR indptr/indices/data, the
+                    optional column_indptr/column_rows/column_data index (CSC copy) and the
+                    source rest points/triangles used to remap onto a changed topology
+
+    Sections are streamed to disk in chunks and read back through numpy.memmap, importing one
+    influence or a vertex subset only touches the pages it needs.
+
+How to: (how to execute the core of this module)
+    export_skin("skinCluster1", "/tmp/body.mdw")
+    import_skin("skinCluster1", "/tmp/body.mdw", influences=["jaw"])
+    weights = WeightFile("/tmp/body.mdw").read_vertices(range(1000))
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import json
+import struct
+
+import numpy as np
+
+import maya.api.OpenMaya as om
+
+from MeshDeformer.app import componentCodec
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app import skinWeights
+from MeshDeformer.app import spatialIndex
+from MeshDeformer.app import weightUndo
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+EXTENSION = ".mdw"
+MAGIC = b"MDWEIGHT"
+VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+
+ALIGNMENT = 64
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_file(path, header, sections):
+    """
+        Stream arrays to a weight file.
+
+        :param header: JSON serializable dict, "sections" is filled here
+        :param sections: {name: array}, written in order
+    """
+    arrays = {}
+    layout = {}
+    offset = 0
+    for name, array in sections.items():
+        array = np.ascontiguousarray(array)
+        array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        arrays[name] = array
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = align(offset + array.nbytes)
+
+    header = dict(header, sections=layout)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_offset = align(PREAMBLE.size + len(header_bytes))
+
+    with open(path, "wb") as stream:
+        stream.write(PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        stream.write(header_bytes)
+        for name, array in arrays.items():
+            stream.seek(data_offset + layout[name]["offset"])
+            flat = array.reshape(-1)
+            step = max(CHUNK_BYTES // max(flat.itemsize, 1), 1)
+            for start in range(0, flat.size, step):
+                stream.write(memoryview(flat[start:start + step]))
+        # Pad the last section so every aligned offset lies inside the file
+        stream.truncate(data_offset + offset)
+
+    return path
+
+
+def write_weights(path, weights, topology_hash="", column_index=True, sections=None, **metadata):
+    """
+        Write a SkinWeights to path.
+
+        :param weights: skinWeights.SkinWeights
+        :param column_index: also store the CSC copy, so one influence reads without scanning every weight
+        :param sections: extra {name: array} sections
+        :param metadata: extra JSON header entries (skin cluster, geometry, ...)
+    """
+    arrays = {"indptr": weights.indptr.astype(np.int64),
+              "indices": weights.indices.astype(np.int32),
+              "data": weights.data.astype(np.float32)}
+
+    if column_index:
+        order = np.argsort(weights.indices, kind="stable")
+        column_indptr = np.zeros(weights.influence_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(weights.indices, minlength=weights.influence_count), out=column_indptr[1:])
+        arrays.update(column_indptr=column_indptr,
+                      column_rows=weights.row_ids()[order].astype(np.int32),
+                      column_data=weights.data[order].astype(np.float32))
+
+    arrays.update(sections or {})
+
+    header = dict(metadata,
+                  topology_hash=topology_hash,
+                  vertex_count=weights.vertex_count,
+                  influences=weights.influences,
+                  influence_indices=weights.influence_indices.tolist())
+    return write_file(path, header, arrays)
+
+
+def get_skin_geometry(skin_cluster, geometry=None):
+    """ Full path of the shape a skinCluster weights are read from (its first geometry by default). """
+    if geometry:
+        return deformerWeights.get_geometry_path(geometry).fullPathName()
+    return skinWeights.get_skin_fn(skin_cluster).getPathAtIndex(0).fullPathName()
+
+
+def export_skin(skin_cluster, path, geometry=None, column_index=True):
+    """ Export the weights of a skinCluster, read in vertex chunks (SkinWeights.read). """
+    geometry = get_skin_geometry(skin_cluster, geometry)
+    weights = skinWeights.SkinWeights.read(skin_cluster, geometry)
+    # The rest surface lets the file be remapped onto a mesh whose topology changed since
+    return write_weights(path, weights,
+                         topology_hash=meshTopology.MeshTopology.from_mesh(geometry).hash,
+                         column_index=column_index,
+                         sections={"points": meshTopology.get_rest_points(geometry).astype(np.float32),
+                                   "triangles": meshTopology.get_triangles(geometry).astype(np.int32)},
+                         skin_cluster=skin_cluster,
+                         geometry=geometry)
+
+
+def remap_weights(weights, points, triangles, target_points):
+    """
+        Weights of another surface from the closest point of every target point on the source
+        triangles, barycentric blending of the source rows. The rows are not normalized, a subset
+        of influences keeps its share of every vertex.
+
+        :param weights: source skinWeights.SkinWeights
+        :param points: (N, 3) source rest points
+        :param triangles: (T, 3) source triangles
+        :param target_points: (M, 3) target rest points
+        :return: (target SkinWeights, (M,) transfer distance of every target vertex)
+    """
+    vertices, barycentrics, distances = spatialIndex.TriangleProjector(points, triangles).project(target_points)
+    return weights.interpolate(vertices, barycentrics), distances
+
+
+def import_skin(skin_cluster, path, geometry=None, vertices=None, influences=None, remap=True):
+    """
+        Import weights as one undoable step (weightUndo.SkinWeightDelta). When the mesh topology
+        changed since the export, the weights are remapped from the stored rest surface (see remap_weights).
+
+        :param vertices: only import these vertex indices (or boolean mask), every vertex when None
+        :param influences: only import these influence names, the other influences of the skinCluster
+                           are renormalized around them. When None the file rows are normalized and
+                           the skinCluster influences the file does not list are cleared
+        :param remap: remap on a topology mismatch, raise ValueError when False
+        :return: (written skinWeights.SkinWeights, transfer distance stats or None when the topology matched)
+    """
+    weight_file = WeightFile(path)
+    geometry = get_skin_geometry(skin_cluster, geometry)
+
+    topology = meshTopology.MeshTopology.from_mesh(geometry)
+    remapping = weight_file.topology_hash != topology.hash
+    if remapping and not (remap and "points" in weight_file):
+        raise ValueError("{} was exported from another topology than {}".format(path, geometry))
+
+    if vertices is not None:
+        vertices = componentCodec.to_indices(vertices)
+
+    if influences:
+        incoming = weight_file.read_influences(influences)
+    elif vertices is not None and not remapping:
+        incoming = weight_file.read_vertices(vertices)
+    else:
+        incoming = weight_file.read()
+
+    stats = None
+    if remapping:
+        incoming, distances = remap_weights(incoming,
+                                            weight_file.section("points"),
+                                            weight_file.section("triangles"),
+                                            meshTopology.get_rest_points(geometry))
+        stats = spatialIndex.get_distance_stats(distances)
+
+    if influences:
+        weights = skinWeights.SkinWeights.read(skin_cluster, geometry)
+        weights.replace_influences(incoming, influences)
+        weights.renormalize(locked=influences)
+    else:
+        # Influences of the skinCluster the file does not list get explicit empty columns, the write
+        # zeroes them on the imported vertices and the file rows are normalized on their own
+        current = skinWeights.get_influences(skinWeights.get_skin_fn(skin_cluster))[0]
+        extra = [name for name in current if name not in incoming.influences]
+        if extra:
+            om.MGlobal.displayWarning("Influences of {} missing from {} are cleared: {}".format(
+                skin_cluster, path, ", ".join(extra)))
+            incoming.add_influences(extra)
+        weights = incoming.normalize()
+
+    # One undoable step, the replaced rows are captured by the write itself
+    weightUndo.execute([weightUndo.SkinWeightDelta(skin_cluster, weights, geometry, vertices)],
+                       "meshDeformerImportWeights")
+    return weights, stats
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class WeightFile:
+    """ Read side of a weight file, the header is parsed on open and the sections are memory mapped on access. """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as stream:
+            magic, self.version, header_size = PREAMBLE.unpack(stream.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError("{} is not a weight file".format(path))
+            if self.version > VERSION:
+                raise ValueError("{} has version {}, this reader supports up to {}".format(path, self.version, VERSION))
+            self.header = json.loads(stream.read(header_size).decode("utf-8"))
+
+        self.data_offset = align(PREAMBLE.size + header_size)
+        self._sections = {}
+
+    def __repr__(self):
+        return "WeightFile({!r}, {} vertices x {} influences)".format(
+            self.path, self.vertex_count, len(self.influences))
+
+    def __contains__(self, name):
+        return name in self.header["sections"]
+
+    @property
+    def topology_hash(self):
+        return self.header["topology_hash"]
+
+    @property
+    def vertex_count(self):
+        return self.header["vertex_count"]
+
+    @property
+    def influences(self):
+        return self.header["influences"]
+
+    @property
+    def influence_indices(self):
+        return self.header["influence_indices"]
+
+    def section(self, name):
+        """ Read-only memmap of a section. """
+        if name not in self._sections:
+            layout = self.header["sections"][name]
+            shape = tuple(layout["shape"])
+            if not np.prod(shape, dtype=np.int64):
+                # mmap refuses empty ranges
+                self._sections[name] = np.empty(shape, dtype=layout["dtype"])
+            else:
+                self._sections[name] = np.memmap(self.path, dtype=layout["dtype"], mode="r",
+                                                 offset=self.data_offset + layout["offset"], shape=shape)
+        return self._sections[name]
+
+    def read(self):
+        """ Every weight as a skinWeights.SkinWeights. """
+        return skinWeights.SkinWeights(np.array(self.section("indptr")),
+                                       np.array(self.section("indices")),
+                                       np.array(self.section("data")),
+                                       self.influences, self.influence_indices)
+
+    def read_vertices(self, vertices):
+        """ SkinWeights of full shape where only the rows of vertices are filled. """
+        vertices = componentCodec.to_indices(vertices)
+        indptr = self.section("indptr")
+        starts, ends = np.asarray(indptr[vertices]), np.asarray(indptr[vertices + 1])
+
+        # Positions of the nonzero weights of every requested row, in row order
+        owner, positions = spatialIndex.expand_ranges(starts, ends)
+        rows = vertices[owner]
+
+        result_indptr = np.zeros(self.vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.vertex_count), out=result_indptr[1:])
+        return skinWeights.SkinWeights(result_indptr,
+                                       self.section("indices")[positions],
+                                       self.section("data")[positions],
+                                       self.influences, self.influence_indices)
+
+    def read_influence(self, influence):
+        """
+            (vertices, weights) of one influence, from the column index when it was written,
+            a scan over the influence column of every weight otherwise.
+        """
+        column = self.influences.index(influence)
+        if "column_indptr" in self:
+            start, end = self.section("column_indptr")[column:column + 2]
+            return (np.array(self.section("column_rows")[start:end], dtype=np.int64),
+                    np.array(self.section("column_data")[start:end]))
+
+        positions = np.flatnonzero(self.section("indices") == column)
+        indptr = np.asarray(self.section("indptr"))
+        return np.searchsorted(indptr, positions, side="right") - 1, np.array(self.section("data")[positions])
+
+    def read_influences(self, influences):
+        """ SkinWeights of full shape holding only the weights of the given influence names. """
+        rows, columns, values = [], [], []
+        for influence in influences:
+            vertices, weights = self.read_influence(influence)
+            rows.append(vertices)
+            columns.append(np.full(vertices.size, self.influences.index(influence), dtype=np.int64))
+            values.append(weights)
+
+        return skinWeights.SkinWeights.from_coo(np.concatenate(rows or [np.zeros(0, np.int64)]),
+                                                np.concatenate(columns or [np.zeros(0, np.int64)]),
+                                                np.concatenate(values or [np.zeros(0, np.float32)]),
+                                                self.vertex_count, self.influences, self.influence_indices)
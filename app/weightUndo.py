@@ -0,0 +1,325 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Undo/redo of the deformer weight operations through sparse deltas: only the changed vertex
+    indices with their old and new values are kept (12 bytes per changed vertex), under a
+    memory cap that evicts the least recently used steps. SkinCluster writes (MFnSkinCluster.setWeights,
+    not undoable by itself) keep the sparse rows they replaced, captured by their first write.
+    The file is also a Maya plugin registering the meshDeformerWeightEdit MPxCommand, every
+    edit runs as one of those commands so it sits in Maya's undo queue like any other edit.
+    meshDeformerModifier does the same for the MDGModifier edits (influence connections,
+    bindPreMatrix values), the command keeps the modifier for its undoIt.
+
+How to: (how to execute the core of this module)
+    load_plugin()
+    delta = WeightDelta.from_weights(weights, before)
+    execute([delta], "meshDeformerInvert")
+    execute([SkinWeightDelta("skinCluster1", skin_weights)], "meshDeformerImportWeights")
+    execute_modifier(modifier)
+
+Dependencies:  maya, numpy
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import collections
+import itertools
+import os
+
+import numpy as np
+
+from maya import cmds
+import maya.api.OpenMaya as om
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+COMMAND_NAME = "meshDeformerWeightEdit"
+MODIFIER_COMMAND_NAME = "meshDeformerModifier"
+PLUGIN_NAME = os.path.splitext(os.path.basename(__file__))[0]
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def maya_useNewAPI():
+    """ The plugin uses the maya.api.OpenMaya (API 2.0) classes. """
+    pass
+
+
+def load_plugin():
+    """ Load this file as the plugin registering meshDeformerWeightEdit. """
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        cmds.loadPlugin(os.path.splitext(__file__)[0] + ".py", quiet=True)
+
+
+def get_stack():
+    # Maya imports the plugin file as its own module, the stack always lives in the package one
+    from MeshDeformer.app import weightUndo
+    return weightUndo.stack
+
+
+def get_pending_modifiers():
+    from MeshDeformer.app import weightUndo
+    return weightUndo.pending_modifiers
+
+
+def execute(deltas, name="meshDeformerWeights"):
+    """
+        Apply deltas as one undoable step, through meshDeformerWeightEdit when the plugin is loaded,
+        with plain setAttr (and Maya's own undo) otherwise, SkinWeightDelta writes are then not undoable.
+    """
+    deltas = [delta for delta in deltas if delta]
+    if not deltas:
+        return None
+
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        cmds.undoInfo(openChunk=True, chunkName=name)
+        try:
+            for delta in deltas:
+                delta.apply(redo=True)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        return None
+
+    step = get_stack().push(deltas, name)
+    cmds.meshDeformerWeightEdit(step=step)
+    return step
+
+
+def execute_modifier(modifier):
+    """
+        Run an om.MDGModifier as one undoable meshDeformerModifier command when the plugin is loaded,
+        with a plain modifier.doIt() otherwise, the edit is then not undoable.
+    """
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        modifier.doIt()
+        return
+
+    get_pending_modifiers().append(modifier)
+    cmds.meshDeformerModifier()
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- CLASSES -- #
+
+class WeightDelta:
+    """ Changed weights of one deformer weight array. """
+    __slots__ = ("deformer", "geometry", "target", "indices", "old", "new", "_plug")
+
+    def __init__(self, deformer, geometry, target, indices, old, new):
+        self.deformer = deformer
+        self.geometry = geometry
+        self.target = target
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.old = np.asarray(old, dtype=np.float32)
+        self.new = np.asarray(new, dtype=np.float32)
+        self._plug = None
+
+    def __repr__(self):
+        return "WeightDelta({!r}, {} vertices, {} bytes)".format(self.deformer, self.indices.size, self.nbytes)
+
+    def __bool__(self):
+        return bool(self.indices.size)
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.old.nbytes + self.new.nbytes
+
+    @classmethod
+    def from_weights(cls, weights, before):
+        """
+            :param weights: edited deformerWeights.DeformerWeights
+            :param before: weight array read before the edit
+        """
+        changed = np.flatnonzero(before != weights.weights)
+        return cls(weights.deformer, weights.geometry, weights.target,
+                   changed, before[changed], weights.weights[changed])
+
+    def apply(self, redo=True):
+        """ Write the new (redo) or old (undo) values on the changed runs only, nothing is read back. """
+        from MeshDeformer.app import deformerWeights
+
+        if self._plug is None:
+            self._plug = deformerWeights.DeformerWeights(self.deformer, self.geometry, self.target).plug
+        deformerWeights.set_weight_runs(self._plug, self.indices, self.new if redo else self.old)
+
+
+class SkinWeightDelta:
+    """ Rows of a skinCluster written from a skinWeights.SkinWeights, the rows they replace are kept by the first apply. """
+    __slots__ = ("skin_cluster", "geometry", "vertices", "old", "new")
+
+    def __init__(self, skin_cluster, weights, geometry=None, vertices=None):
+        """
+            :param weights: skinWeights.SkinWeights to write
+            :param vertices: only write these vertex rows, every vertex when None
+        """
+        self.skin_cluster = skin_cluster
+        self.geometry = geometry
+        self.vertices = vertices
+        self.old = None
+        self.new = weights
+
+    def __repr__(self):
+        return "SkinWeightDelta({!r}, {} bytes)".format(self.skin_cluster, self.nbytes)
+
+    def __bool__(self):
+        return bool(self.new.vertex_count)
+
+    @property
+    def nbytes(self):
+        return self.new.nbytes + (self.old.nbytes if self.old is not None else 0)
+
+    def apply(self, redo=True):
+        """ Write the new (redo) or old (undo) rows, each write passes the other side as the rows it replaces. """
+        if self.old is None:
+            self.old = self.new.write(self.skin_cluster, self.geometry, self.vertices)
+        elif redo:
+            self.new.write(self.skin_cluster, self.geometry, self.vertices, previous=self.old)
+        else:
+            self.old.write(self.skin_cluster, self.geometry, self.vertices, previous=self.new)
+
+
+class WeightUndoStack:
+    """ Steps of deltas by id, the least recently used are dropped past max_bytes. """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._steps = collections.OrderedDict()     # step id -> (name, [WeightDelta])
+        self._ids = itertools.count(1)
+        self.nbytes = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._steps)
+
+    def __contains__(self, step):
+        return step in self._steps
+
+    def push(self, deltas, name=""):
+        step = next(self._ids)
+        self._steps[step] = (name, list(deltas))
+        self.nbytes += sum(delta.nbytes for delta in deltas)
+        self._evict(keep=step)
+        return step
+
+    def _evict(self, keep=None):
+        while self.nbytes > self.max_bytes and len(self._steps) > 1:
+            step = next(iter(self._steps))
+            if step == keep:
+                self._steps.move_to_end(step)
+                continue
+            self.discard(step)
+            self.evicted += 1
+
+    def discard(self, step):
+        _, deltas = self._steps.pop(step, (None, ()))
+        self.nbytes -= sum(delta.nbytes for delta in deltas)
+
+    def clear(self):
+        self._steps.clear()
+        self.nbytes = 0
+
+    def apply(self, step, redo=True):
+        """ Redo or undo a step, False when it was evicted. """
+        if step not in self._steps:
+            om.MGlobal.displayWarning("Weight edit {} was dropped from the undo memory".format(step))
+            return False
+
+        self._steps.move_to_end(step)
+        _, deltas = self._steps[step]
+        nbytes = sum(delta.nbytes for delta in deltas)
+        # The deltas are the undo record, the setAttr they run must not reach the undo queue again
+        cmds.undoInfo(stateWithoutFlush=False)
+        try:
+            for delta in (deltas if redo else reversed(deltas)):
+                delta.apply(redo)
+        finally:
+            cmds.undoInfo(stateWithoutFlush=True)
+
+        # SkinWeightDelta grows when its first apply captures the replaced rows
+        self.nbytes += sum(delta.nbytes for delta in deltas) - nbytes
+        self._evict(keep=step)
+        return True
+
+
+class WeightEditCommand(om.MPxCommand):
+    """ meshDeformerWeightEdit -step id: applies a pushed step, undoIt/redoIt replay its deltas. """
+    STEP_FLAG = ("-s", "-step")
+
+    def __init__(self):
+        super(WeightEditCommand, self).__init__()
+        self.step = None
+
+    @staticmethod
+    def creator():
+        return WeightEditCommand()
+
+    @classmethod
+    def syntax(cls):
+        syntax = om.MSyntax()
+        syntax.addFlag(cls.STEP_FLAG[0], cls.STEP_FLAG[1], om.MSyntax.kLong)
+        return syntax
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        parser = om.MArgParser(self.syntax(), args)
+        self.step = parser.flagArgumentInt(self.STEP_FLAG[0], 0)
+        self.redoIt()
+
+    def redoIt(self):
+        get_stack().apply(self.step, redo=True)
+
+    def undoIt(self):
+        get_stack().apply(self.step, redo=False)
+
+
+class ModifierCommand(om.MPxCommand):
+    """ meshDeformerModifier: runs the modifier handed over by execute_modifier, undoIt reverts it. """
+
+    def __init__(self):
+        super(ModifierCommand, self).__init__()
+        self.modifier = None
+
+    @staticmethod
+    def creator():
+        return ModifierCommand()
+
+    def isUndoable(self):
+        return self.modifier is not None
+
+    def doIt(self, args):
+        pending = get_pending_modifiers()
+        self.modifier = pending.pop() if pending else None
+        self.redoIt()
+
+    def redoIt(self):
+        if self.modifier is not None:
+            self.modifier.doIt()
+
+    def undoIt(self):
+        if self.modifier is not None:
+            self.modifier.undoIt()
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+# Session undo memory of the weight edits
+stack = WeightUndoStack()
+# MDGModifier handed from execute_modifier to the meshDeformerModifier command it runs
+pending_modifiers = []
+
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ PLUGIN -- #
+def initializePlugin(plugin):
+    plugin_fn = om.MFnPlugin(plugin, "Maxime Lecompte", "1.0")
+    plugin_fn.registerCommand(COMMAND_NAME, WeightEditCommand.creator, WeightEditCommand.syntax)
+    plugin_fn.registerCommand(MODIFIER_COMMAND_NAME, ModifierCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    plugin_fn = om.MFnPlugin(plugin)
+    plugin_fn.deregisterCommand(COMMAND_NAME)
+    plugin_fn.deregisterCommand(MODIFIER_COMMAND_NAME)
@@ -0,0 +1,34 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Shared pytest setup. The modules import maya at module level, so the tests run with mayapy
+    (mayapy -m pytest tests) and skip themselves when maya is not importable. The checkout is
+    imported as the MeshDeformer package whatever its folder is named.
+
+How to: (how to execute the core of this module)
+    mayapy -m pytest tests
+
+Dependencies:  pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import importlib.util
+import os
+import sys
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- GLOBALS -- #
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "MeshDeformer" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("MeshDeformer", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["MeshDeformer"] = package
+    spec.loader.exec_module(package)
@@ -0,0 +1,52 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Component string parsing and range formatting.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import componentCodec
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def test_parse_components():
+    parsed = componentCodec.parse_components(["body.vtx[0:3]", "body.vtx[10]", "body.vtx[2:4]",
+                                              "cube.vtx[7]", "cube.e[1:5]", "cube.vtx[*]", "body"])
+
+    assert sorted(parsed) == ["body", "cube"]
+    assert parsed["body"].tolist() == [0, 1, 2, 3, 4, 10]
+    assert parsed["cube"].tolist() == [7]
+    assert componentCodec.parse_components(["cube.e[1:5]"], component="e")["cube"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_format_components():
+    assert componentCodec.format_components("body", [5, 0, 1, 2, 9, 8, 2]) == [
+        "body.vtx[0:2]", "body.vtx[5]", "body.vtx[8:9]"]
+    assert componentCodec.format_components("body", np.array([True, False, True, True])) == [
+        "body.vtx[0]", "body.vtx[2:3]"]
+    assert componentCodec.format_components("body", []) == []
+
+
+def test_round_trip():
+    rng = np.random.default_rng(0)
+    indices = np.unique(rng.integers(0, 5000, size=1500))
+
+    parsed = componentCodec.parse_components(componentCodec.format_components("body", indices))
+    np.testing.assert_array_equal(parsed["body"], indices)
+
+    starts, ends = componentCodec.get_index_runs(indices)
+    assert starts.size == len(componentCodec.format_components("body", indices))
+    assert np.all(ends >= starts)
@@ -0,0 +1,131 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    DeformerWeights read/write and weight operations over a stubbed cmds holding one sparse
+    weight multi, the unset elements read as the 1.0 default.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import re
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import deformerWeights
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+class StubCmds:
+    """ One cluster deforming |body (10 vertices), its weight multi is a sparse {index: value}. """
+    PLUG = "cluster1.weightList[0].weights"
+
+    def __init__(self, stored=None):
+        self.stored = dict(stored or {})
+        self.set_calls = []
+
+    def nodeType(self, node):
+        return "cluster"
+
+    def deformer(self, node, query=True, geometry=False, geometryIndices=False):
+        return ["|body|bodyShape"] if geometry else [0]
+
+    def ls(self, nodes, long=True):
+        return list(nodes) if isinstance(nodes, (list, tuple)) else [nodes]
+
+    def listRelatives(self, node, shapes=True, fullPath=True):
+        return ["|body|bodyShape"] if node == "|body" else []
+
+    def getAttr(self, plug, multiIndices=False):
+        assert plug == self.PLUG
+        indices = sorted(self.stored)
+        if multiIndices:
+            return indices
+        values = [self.stored[index] for index in indices]
+        return values[0] if len(values) == 1 else values
+
+    def setAttr(self, plug, *values, **kwargs):
+        start, end = map(int, re.match(r".*\[(\d+):(\d+)\]$", plug).groups())
+        assert kwargs["size"] == len(values) == end - start + 1
+        self.set_calls.append((start, end))
+        self.stored.update(zip(range(start, end + 1), values))
+
+
+@pytest.fixture
+def scene(monkeypatch):
+    def make(stored=None):
+        cmds = StubCmds(stored)
+        monkeypatch.setattr(deformerWeights, "cmds", cmds)
+        monkeypatch.setattr(deformerWeights, "get_geometry_path", lambda geometry: geometry)
+        monkeypatch.setattr(deformerWeights, "om", types.SimpleNamespace(
+            MItGeometry=lambda path: types.SimpleNamespace(count=lambda: 10)))
+        return cmds
+    return make
+
+
+def test_read_defaults_unset_elements(scene):
+    scene({2: 0.5, 7: 0.0, 12: 0.3})
+    weights = deformerWeights.DeformerWeights("cluster1", "|body").read()
+
+    assert weights.geometry == "|body|bodyShape"
+    expected = np.ones(10, dtype=np.float32)
+    expected[[2, 7]] = (0.5, 0.0)
+    np.testing.assert_array_equal(weights.weights, expected)
+
+
+def test_read_single_element(scene):
+    scene({4: 0.25})
+    weights = deformerWeights.DeformerWeights("cluster1").read()
+    assert weights.weights[4] == 0.25
+    assert np.count_nonzero(weights.weights == 1.0) == 9
+
+
+def test_write_runs(scene):
+    cmds = scene()
+    weights = deformerWeights.DeformerWeights("cluster1", "|body").read()
+    weights.clear([1, 2, 3, 8])
+    weights.write([1, 2, 3, 8])
+
+    assert cmds.set_calls == [(1, 3), (8, 8)]
+    assert cmds.stored == {1: 0.0, 2: 0.0, 3: 0.0, 8: 0.0}
+
+    weights.write()
+    assert cmds.set_calls[-1] == (0, 9)
+    assert [cmds.stored[index] for index in range(10)] == weights.weights.tolist()
+
+
+def test_operations(scene):
+    scene({0: 0.2, 1: 0.6})
+    weights = deformerWeights.DeformerWeights("cluster1").read()
+
+    weights.invert([0, 1])
+    np.testing.assert_allclose(weights.weights[:3], (0.8, 0.4, 1.0), rtol=1e-6)
+
+    weights.scale(2.0, [0, 1])
+    np.testing.assert_allclose(weights.weights[:2], (1.0, 0.8), rtol=1e-6)
+
+    weights.set_value(0.3, [5])
+    weights.clear([9])
+    assert weights.weights[5] == pytest.approx(0.3) and weights.weights[9] == 0.0
+
+    weights.set_value(-1.0)
+    assert not weights.weights.any()
+    weights.reset()
+    assert weights.is_default
+    np.testing.assert_array_equal(weights.indices_above(0.5), np.arange(10))
+
+
+def test_rejects_undeformed_geometry(scene):
+    scene()
+    with pytest.raises(RuntimeError):
+        deformerWeights.DeformerWeights("cluster1", "|shirt")
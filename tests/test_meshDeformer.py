@@ -0,0 +1,56 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Deformer discovery engines compared on in-memory scenes (util.benchmarkUtils stand-ins).
+
+Dependencies:  maya, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import meshDeformer
+from MeshDeformer.app.util import benchmarkUtils
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def get_records(scene, obj):
+    utils = meshDeformer.DeformerUtils
+    with benchmarkUtils.in_memory_maya(scene):
+        return [utils.get_deformers_from_object(obj, engine) for engine in (utils.ENGINE_CMDS, utils.ENGINE_API)]
+
+
+def get_names(record):
+    """ Deformer names in GeometryRecord order (sorted by deformer type). """
+    return [deformer.name for deformer in record.deformers]
+
+
+@pytest.mark.parametrize("obj, expected", [
+    ("body", ["bodySkin"]),
+    ("shirt", ["shirtWrap", "shirtDeltaMush"]),
+    ("face", ["faceBlendShape"]),
+    ("smile", ["smileCluster"]),
+])
+def test_engines_prune_at_dag_nodes(obj, expected):
+    cmds_record, api_record = get_records(benchmarkUtils.InMemoryScene.build_wrap_setup(), obj)
+    assert get_names(cmds_record) == expected
+    assert get_names(api_record) == expected
+
+
+def test_engines_match_on_character():
+    scene = benchmarkUtils.InMemoryScene.build_character(deformers=12, targets=5, joints=8, history_padding=20)
+    cmds_record, api_record = get_records(scene, "body")
+
+    assert get_names(cmds_record) == get_names(api_record)
+    assert len(api_record.deformers) == 12
+    for cmds_deformer, api_deformer in zip(cmds_record.deformers, api_record.deformers):
+        assert cmds_deformer.child_names == api_deformer.child_names
+        assert list(cmds_deformer.child_indices or ()) == list(api_deformer.child_indices or ())
@@ -0,0 +1,77 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    MeshTopology adjacency and Smooth on a quad grid.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import meshTopology
+from MeshDeformer.app.util import benchmarkUtils
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def quad_grid(size=6):
+    """ MeshTopology of a size x size vertex grid of quads. """
+    quads = (np.arange(size - 1)[:, None] * size + np.arange(size - 1)[None, :]).ravel()
+    connects = np.stack((quads, quads + 1, quads + size + 1, quads + size), axis=1).ravel()
+    return meshTopology.MeshTopology(size * size, np.full(quads.size, 4), connects)
+
+
+def test_adjacency():
+    topology = quad_grid(4)
+    assert sorted(topology.neighbors(0).tolist()) == [1, 4]
+    assert sorted(topology.neighbors(5).tolist()) == [1, 4, 6, 9]
+    assert topology.degrees().sum() == 2 * len(topology.edges())
+
+
+def test_smooth_pins_every_iteration():
+    topology = quad_grid()
+    weights = np.random.default_rng(0).random(topology.vertex_count).astype(np.float32)
+    pinned = np.array([0, 7, 14, 21])
+
+    # Reference: pinned values restored after every pass
+    expected = weights.astype(np.float64)
+    for _ in range(5):
+        expected += 0.5 * (topology.neighbor_average(expected) - expected)
+        expected[pinned] = weights[pinned]
+
+    result = topology.smooth(weights, iterations=5, strength=0.5, pinned=pinned)
+    np.testing.assert_array_equal(result[pinned], weights[pinned])
+    np.testing.assert_allclose(result, expected, atol=1e-6)
+
+    mask = np.zeros(topology.vertex_count, dtype=bool)
+    mask[pinned] = True
+    np.testing.assert_array_equal(topology.smooth(weights, iterations=5, strength=0.5, pinned=mask), result)
+
+
+@pytest.mark.parametrize("geometry, expected", [
+    ("body", "bodyShapeOrig"),
+    ("shirt", "shirtShapeOrig"),
+    ("face", "faceShapeOrig"),
+    ("smile", "smileShapeOrig"),
+])
+def test_rest_shape_ignores_foreign_meshes(monkeypatch, geometry, expected):
+    scene = benchmarkUtils.InMemoryScene.build_wrap_setup()
+    scene.add("plainShape", "mesh")
+    scene.add("plain", "transform").shapes = ["plainShape"]
+
+    api = benchmarkUtils.InMemoryOpenMaya(scene)
+    monkeypatch.setattr(meshTopology, "om", api)
+    monkeypatch.setattr(deformerWeights, "om", api)
+
+    assert meshTopology.get_rest_shape(geometry).name == expected
+    assert meshTopology.get_rest_shape("plain").name == "plainShape"
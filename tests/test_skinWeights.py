@@ -0,0 +1,130 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    SkinWeights CSR operations checked against the same operations on dense arrays.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import skinWeights
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def random_dense(vertex_count=200, influence_count=12, per_vertex=4, seed=0):
+    """ (vertices, influences) float32 weights with per_vertex nonzero weights per row summing to 1. """
+    rng = np.random.default_rng(seed)
+    dense = np.zeros((vertex_count, influence_count), dtype=np.float32)
+    for row in range(vertex_count):
+        columns = rng.choice(influence_count, per_vertex, replace=False)
+        dense[row, columns] = rng.random(per_vertex) + 0.01
+    return dense / dense.sum(axis=1, keepdims=True)
+
+
+def build(dense):
+    influences = ["joint{}".format(i) for i in range(dense.shape[1])]
+    return skinWeights.SkinWeights.from_dense(dense, influences, np.arange(dense.shape[1]) * 2)
+
+
+def test_dense_round_trip():
+    dense = random_dense()
+    weights = build(dense)
+
+    assert weights.shape == dense.shape
+    assert weights.nnz == np.count_nonzero(dense)
+    np.testing.assert_allclose(weights.to_dense(), dense, atol=1e-7)
+    np.testing.assert_allclose(weights.to_dense([3, 7]), dense[[3, 7]], atol=1e-7)
+
+
+def test_from_coo_sums_duplicates():
+    weights = skinWeights.SkinWeights.from_coo([0, 0, 2, 0], [1, 1, 0, 3], [0.25, 0.5, 1.0, 0.25], 3, list("abcd"))
+
+    expected = np.zeros((3, 4))
+    expected[0, 1], expected[0, 3], expected[2, 0] = 0.75, 0.25, 1.0
+    np.testing.assert_allclose(weights.to_dense(), expected)
+    assert weights.indptr.tolist() == [0, 2, 2, 3]
+
+
+def test_normalize_prune_limit():
+    dense = random_dense(per_vertex=6) * 3.0
+    dense[5] = 0.0
+    weights = build(dense)
+
+    normalized = weights.copy().normalize().to_dense()
+    np.testing.assert_allclose(normalized[np.arange(len(dense)) != 5].sum(axis=1), 1.0, rtol=1e-6)
+    assert not normalized[5].any()
+
+    pruned = weights.copy().prune(0.3).to_dense()
+    np.testing.assert_allclose(pruned, np.where(dense > 0.3, dense, 0.0), atol=1e-6)
+
+    limited = weights.copy().limit_influences(2)
+    assert np.diff(limited.indptr).max() <= 2
+    expected = np.zeros_like(dense)
+    largest = np.argsort(-dense, axis=1, kind="stable")[:, :2]
+    rows = np.arange(len(dense))[:, None]
+    expected[rows, largest] = dense[rows, largest]
+    np.testing.assert_allclose(limited.to_dense(), expected, atol=1e-6)
+
+
+def test_renormalize_keeps_locked_columns():
+    dense = random_dense(per_vertex=5)
+    weights = build(dense)
+
+    result = weights.copy().renormalize(locked=["joint0", 6]).to_dense()
+    locked = np.zeros(dense.shape[1], dtype=bool)
+    locked[[0, 3]] = True   # joint0 by name, logical index 6 is column 3
+
+    np.testing.assert_allclose(result[:, locked], dense[:, locked], atol=1e-7)
+    np.testing.assert_allclose(result.sum(axis=1), np.maximum(dense[:, locked].sum(axis=1), 1.0), rtol=1e-5)
+
+
+def test_interpolate_matches_dense():
+    dense = random_dense()
+    weights = build(dense)
+    rng = np.random.default_rng(1)
+    vertices = rng.integers(0, len(dense), size=(50, 3))
+    barycentrics = rng.dirichlet(np.ones(3), size=50).astype(np.float32)
+
+    expected = np.einsum("ijk,ij->ik", dense[vertices], barycentrics)
+    np.testing.assert_allclose(weights.interpolate(vertices, barycentrics).to_dense(), expected, atol=1e-6)
+
+
+def test_replace_influences_by_name():
+    dense = random_dense()
+    weights = build(dense)
+    other_dense = random_dense(influence_count=3, per_vertex=2, seed=4)
+    other = skinWeights.SkinWeights.from_dense(other_dense, ["joint5", "joint1", "extra"])
+
+    result = weights.copy().replace_influences(other, ["joint1", "joint5"]).to_dense()
+    expected = dense.copy()
+    expected[:, 5], expected[:, 1] = other_dense[:, 0], other_dense[:, 1]
+    np.testing.assert_allclose(result, expected, atol=1e-7)
+
+    with pytest.raises(RuntimeError):
+        weights.copy().replace_influences(other, ["extra"])
+
+
+def test_add_influences_and_stats():
+    dense = random_dense()
+    dense[:, 4] = 0.0
+    weights = build(dense).add_influences(["new"])
+
+    assert weights.influence_count == dense.shape[1] + 1
+    assert weights.influence_indices[-1] == weights.influence_indices[-2] + 1
+
+    counts, totals, maxima = weights.influence_stats()
+    padded = np.pad(dense, ((0, 0), (0, 1)))
+    np.testing.assert_array_equal(counts, np.count_nonzero(padded, axis=0))
+    np.testing.assert_allclose(totals, padded.sum(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(maxima, padded.max(axis=0), rtol=1e-6)
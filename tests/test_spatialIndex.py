@@ -0,0 +1,127 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    PointGrid nearest point queries and TriangleProjector projections against brute force.
+
+Dependencies:  numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+from MeshDeformer.app import spatialIndex
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def brute_nearest(points, queries):
+    squared = ((queries[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+    return np.sqrt(squared.min(axis=1))
+
+
+def grid_mesh(size=12, scale=1.0):
+    """ (points, triangles) of a size x size vertex grid in the XZ plane, with a bump in Y. """
+    u, v = np.meshgrid(np.linspace(-scale, scale, size), np.linspace(-scale, scale, size), indexing="ij")
+    points = np.stack((u.ravel(), 0.3 * np.sin(u.ravel() * 2.0) * np.cos(v.ravel()), v.ravel()), axis=1)
+
+    quads = (np.arange(size - 1)[:, None] * size + np.arange(size - 1)[None, :]).ravel()
+    triangles = np.concatenate((np.stack((quads, quads + 1, quads + size + 1), axis=1),
+                                np.stack((quads, quads + size + 1, quads + size), axis=1)))
+    return points, triangles
+
+
+def brute_project(points, triangles, queries):
+    """ Distance to the closest triangle of every query, every triangle tested. """
+    a, b, c = (np.repeat(points[triangles[:, i]][None], len(queries), axis=0).reshape(-1, 3) for i in range(3))
+    repeated = np.repeat(queries, len(triangles), axis=0)
+    weights = spatialIndex.closest_point_barycentrics(repeated, a, b, c)
+    closest = weights[:, 0, None] * a + weights[:, 1, None] * b + weights[:, 2, None] * c
+    return np.linalg.norm(repeated - closest, axis=1).reshape(len(queries), len(triangles)).min(axis=1)
+
+
+def test_expand_ranges():
+    owner, values = spatialIndex.expand_ranges(np.array([3, 10, 7]), np.array([5, 10, 9]))
+    assert owner.tolist() == [0, 0, 2, 2]
+    assert values.tolist() == [3, 4, 7, 8]
+
+
+@pytest.mark.parametrize("shape", ["cloud", "plane", "clusters"])
+def test_point_grid_matches_brute_force(shape):
+    rng = np.random.default_rng(0)
+    if shape == "cloud":
+        points = rng.random((3000, 3))
+    elif shape == "plane":
+        points = np.column_stack((rng.random(3000), np.zeros(3000), rng.random(3000)))
+    else:
+        points = np.concatenate((rng.normal(0.0, 0.01, (1500, 3)), rng.normal(5.0, 1.0, (1500, 3))))
+    queries = rng.normal(points.mean(axis=0), points.std(axis=0) * 2.0, (500, 3))
+
+    distances, indices = spatialIndex.PointGrid(points).query(queries)
+    expected = brute_nearest(points, queries)
+    np.testing.assert_allclose(distances, expected, rtol=1e-9)
+    np.testing.assert_allclose(np.linalg.norm(points[indices] - queries, axis=1), expected, rtol=1e-9)
+
+
+def test_point_grid_max_distance():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+    distances, indices = spatialIndex.PointGrid(points).query([[0.1, 0.0, 0.0], [0.5, 3.0, 0.0]], max_distance=1.0)
+
+    assert indices.tolist() == [0, -1]
+    assert distances[0] == pytest.approx(0.1)
+    assert np.isinf(distances[1])
+
+
+def test_triangle_projector_matches_brute_force():
+    points, triangles = grid_mesh()
+    rng = np.random.default_rng(2)
+    queries = rng.uniform(-1.2, 1.2, (400, 3))
+
+    vertices, barycentrics, distances = spatialIndex.TriangleProjector(points, triangles).project(queries)
+    projected = np.einsum("ijk,ij->ik", points[vertices], barycentrics)
+
+    np.testing.assert_allclose(distances, brute_project(points, triangles, queries), atol=1e-9)
+    np.testing.assert_allclose(np.linalg.norm(queries - projected, axis=1), distances, atol=1e-9)
+    np.testing.assert_allclose(barycentrics.sum(axis=1), 1.0)
+
+
+def bumpy_sphere(rings=12, segments=16, bumps=0.3):
+    """ (points, triangles) of a UV sphere with radial bumps, its triangles vary a lot in size. """
+    theta, phi = np.meshgrid(np.linspace(0.1, np.pi - 0.1, rings), np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False),
+                             indexing="ij")
+    radius = 1.0 + bumps * np.sin(5.0 * theta) * np.cos(3.0 * phi)
+    points = np.stack((radius * np.sin(theta) * np.cos(phi),
+                       radius * np.sin(theta) * np.sin(phi),
+                       radius * np.cos(theta)), axis=-1).reshape(-1, 3)
+
+    grid = np.arange(rings * segments).reshape(rings, segments)
+    following = np.roll(grid, -1, axis=1)
+    quads = np.stack((grid[:-1], following[:-1], following[1:], grid[1:]), axis=-1).reshape(-1, 4)
+    return points, np.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]))
+
+
+def test_triangle_projector_is_exact_off_surface():
+    # Queries inside and around a bumpy closed surface, the closest triangle is often not one
+    # around the nearest vertex, and far outside it where the clusters are searched
+    points, triangles = bumpy_sphere()
+    queries = np.random.default_rng(3).normal(size=(300, 3)) * np.repeat([0.9, 4.0], 150)[:, None]
+
+    vertices, barycentrics, distances = spatialIndex.TriangleProjector(points, triangles).project(queries)
+    projected = np.einsum("ijk,ij->ik", points[vertices], barycentrics)
+
+    np.testing.assert_allclose(distances, brute_project(points, triangles, queries), atol=1e-9)
+    np.testing.assert_allclose(np.linalg.norm(queries - projected, axis=1), distances, atol=1e-9)
+
+
+def test_triangle_projector_without_triangles():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+    vertices, barycentrics, distances = spatialIndex.TriangleProjector(points, np.zeros((0, 3))).project([[0.9, 0.1, 0.0]])
+
+    assert vertices.tolist() == [[1, 1, 1]]
+    assert barycentrics.tolist() == [[1.0, 0.0, 0.0]]
+    assert distances[0] == pytest.approx(np.hypot(0.1, 0.1))
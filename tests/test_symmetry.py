@@ -0,0 +1,64 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    SymmetryMap matching, mirror and flip on a symmetric point grid.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import symmetry
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def symmetric_grid(size=9):
+    """ Shuffled size^3 grid centered on the origin, so the mirror order is not the identity. """
+    axis = np.linspace(-1.0, 1.0, size)
+    points = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+    return points[np.random.default_rng(0).permutation(len(points))]
+
+
+@pytest.mark.parametrize("axis", ["x", "y", "z"])
+def test_from_points(axis):
+    points = symmetric_grid()
+    symmetry_map = symmetry.SymmetryMap.from_points(points, axis)
+    axis_index = symmetry.AXES[axis]
+
+    assert not symmetry_map.unmatched.size
+    reflected = points.copy()
+    reflected[:, axis_index] *= -1.0
+    np.testing.assert_allclose(points[symmetry_map.indices], reflected, atol=1e-12)
+    np.testing.assert_array_equal(symmetry_map.sides, np.sign(np.round(points[:, axis_index], 9)))
+
+
+def test_unmatched_vertices():
+    points = np.concatenate((symmetric_grid(5), [[0.37, 0.1, 0.2]]))
+    symmetry_map = symmetry.SymmetryMap.from_points(points)
+    assert symmetry_map.unmatched.tolist() == [len(points) - 1]
+
+
+def test_mirror_and_flip():
+    points = symmetric_grid()
+    symmetry_map = symmetry.SymmetryMap.from_points(points)
+    weights = np.random.default_rng(1).random(len(points))
+    positive, negative = points[:, 0] > 1e-9, points[:, 0] < -1e-9
+
+    mirrored = symmetry_map.mirror(weights, source=symmetry.SymmetryMap.POSITIVE)
+    np.testing.assert_array_equal(mirrored[positive], weights[positive])
+    np.testing.assert_array_equal(mirrored[negative], weights[symmetry_map.indices[negative]])
+    np.testing.assert_array_equal(mirrored, mirrored[symmetry_map.indices])
+
+    flipped = symmetry_map.flip(weights)
+    np.testing.assert_array_equal(flipped, weights[symmetry_map.indices])
+    np.testing.assert_array_equal(symmetry_map.flip(flipped), weights)
@@ -0,0 +1,118 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    Weight file round trips: raw sections, whole SkinWeights, vertex and influence subsets.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import skinWeights
+from MeshDeformer.app import weightIO
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+def random_weights(vertex_count=500, influence_count=20, per_vertex=4, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.repeat(np.arange(vertex_count), per_vertex)
+    columns = np.concatenate([rng.choice(influence_count, per_vertex, replace=False) for _ in range(vertex_count)])
+    influences = ["joint{}".format(i) for i in range(influence_count)]
+    weights = skinWeights.SkinWeights.from_coo(rows, columns, rng.random(rows.size) + 0.01, vertex_count,
+                                               influences, np.arange(influence_count) + 3)
+    return weights.normalize()
+
+
+def assert_same(weights, other):
+    assert other.influences == weights.influences
+    np.testing.assert_array_equal(other.influence_indices, weights.influence_indices)
+    np.testing.assert_array_equal(other.indptr, weights.indptr)
+    np.testing.assert_array_equal(other.indices, weights.indices)
+    np.testing.assert_array_equal(other.data, weights.data)
+
+
+def test_write_file_sections(tmp_path):
+    sections = {"ints": np.arange(17, dtype=np.int32),
+                "matrix": np.random.default_rng(0).random((5, 3)),
+                "empty": np.zeros(0, dtype=np.float32)}
+    path = weightIO.write_file(str(tmp_path / "raw.mdw"), {"name": "raw"}, sections)
+
+    weight_file = weightIO.WeightFile(path)
+    assert weight_file.header["name"] == "raw"
+    for name, array in sections.items():
+        section = weight_file.section(name)
+        assert section.dtype == array.dtype and section.shape == array.shape
+        np.testing.assert_array_equal(section, array)
+        assert (weight_file.data_offset + weight_file.header["sections"][name]["offset"]) % weightIO.ALIGNMENT == 0
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "other.mdw"
+    path.write_bytes(b"NOTMDWGT" + bytes(64))
+    with pytest.raises(ValueError):
+        weightIO.WeightFile(str(path))
+
+
+@pytest.mark.parametrize("column_index", [True, False])
+def test_weights_round_trip(tmp_path, column_index):
+    weights = random_weights()
+    path = weightIO.write_weights(str(tmp_path / "skin.mdw"), weights, "abc", column_index=column_index,
+                                  skin_cluster="skinCluster1")
+
+    weight_file = weightIO.WeightFile(path)
+    assert weight_file.topology_hash == "abc"
+    assert weight_file.vertex_count == weights.vertex_count
+    assert weight_file.header["skin_cluster"] == "skinCluster1"
+    assert ("column_indptr" in weight_file) == column_index
+    assert_same(weights, weight_file.read())
+
+    dense = weights.to_dense()
+    vertices = np.array([3, 4, 5, 99, 498])
+    subset = weight_file.read_vertices(vertices)
+    expected = np.zeros_like(dense)
+    expected[vertices] = dense[vertices]
+    assert subset.shape == weights.shape
+    np.testing.assert_array_equal(subset.to_dense(), expected)
+
+    rows, values = weight_file.read_influence("joint7")
+    np.testing.assert_array_equal(rows, np.flatnonzero(dense[:, 7]))
+    np.testing.assert_array_equal(values, dense[rows, 7])
+
+    influences = weight_file.read_influences(["joint2", "joint11"])
+    expected = np.zeros_like(dense)
+    expected[:, [2, 11]] = dense[:, [2, 11]]
+    np.testing.assert_array_equal(influences.to_dense(), expected)
+
+
+def test_remap_keeps_influence_subset_share():
+    # Source: a 10 x 10 vertex grid in XY, the target samples it at its own vertices and face centers
+    grid = np.arange(100).reshape(10, 10)
+    points = np.stack(np.meshgrid(np.arange(10.0), np.arange(10.0), indexing="xy"), axis=-1).reshape(-1, 2)
+    points = np.column_stack((points, np.zeros(100)))
+    quads = np.stack((grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]), axis=-1).reshape(-1, 4)
+    triangles = np.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]))
+    centers = points[quads].mean(axis=1)
+
+    weights = random_weights(vertex_count=100)
+    dense = weights.to_dense()
+    subset = weights.copy()
+    subset.replace_influences(skinWeights.SkinWeights.from_dense(np.zeros_like(dense), weights.influences),
+                              [name for name in weights.influences if name not in ("joint2", "joint11")])
+
+    remapped, distances = weightIO.remap_weights(subset, points, triangles, np.concatenate((points, centers)))
+    result = remapped.to_dense()
+
+    np.testing.assert_allclose(distances, 0.0, atol=1e-9)
+    np.testing.assert_allclose(result[:100], subset.to_dense(), atol=1e-6)
+    assert np.count_nonzero(result[:, [2, 11]].sum(axis=1) < 0.999) > 50
+    assert not np.delete(result, [2, 11], axis=1).any()
@@ -0,0 +1,124 @@
+# ---------------------------------------------------------------------------- #
+# ------------------------------------------------------------------ HEADER -- #
+"""
+Authors:   Maxime Lecompte, maxime.lecompte10@gmail.com
+
+Departments:    Rigging TD
+
+Description:
+    WeightDelta replay, WeightUndoStack memory accounting and the modifier command hand over,
+    setAttr is recorded instead of run.
+
+Dependencies:  maya, numpy, pytest
+"""
+
+# ---------------------------------------------------------------------------- #
+# ----------------------------------------------------------------- IMPORTS -- #
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("maya")
+
+from MeshDeformer.app import deformerWeights
+from MeshDeformer.app import weightUndo
+
+# ---------------------------------------------------------------------------- #
+# --------------------------------------------------------------- FUNCTIONS -- #
+class RecordingCmds:
+    """ Only setAttr exists, any read of the scene raises AttributeError. """
+
+    def __init__(self):
+        self.calls = []
+
+    def setAttr(self, plug, *values, **kwargs):
+        self.calls.append((plug, values))
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    cmds = RecordingCmds()
+    created = []
+
+    def resolve(deformer, geometry=None, target=None):
+        created.append(deformer)
+        return types.SimpleNamespace(plug="{}.weightList[0].weights".format(deformer))
+
+    monkeypatch.setattr(deformerWeights, "cmds", cmds)
+    monkeypatch.setattr(deformerWeights, "DeformerWeights", resolve)
+    cmds.created = created
+    return cmds
+
+
+def test_set_weight_runs(recorder):
+    indices = np.array([2, 3, 4, 9, 11, 12])
+    values = np.arange(6, dtype=np.float32) / 10
+    deformerWeights.set_weight_runs("cluster1.weightList[0].weights", indices, values)
+
+    assert [plug for plug, _ in recorder.calls] == ["cluster1.weightList[0].weights[2:4]",
+                                                     "cluster1.weightList[0].weights[9:9]",
+                                                     "cluster1.weightList[0].weights[11:12]"]
+    np.testing.assert_allclose(np.concatenate([run for _, run in recorder.calls]), values)
+
+
+def test_weight_delta_writes_without_reading(recorder):
+    before = np.zeros(10, dtype=np.float32)
+    after = before.copy()
+    after[[1, 2, 7]] = (0.5, 0.25, 1.0)
+    delta = weightUndo.WeightDelta("cluster1", "body", None, np.flatnonzero(after != before),
+                                   before[after != before], after[after != before])
+
+    delta.apply(redo=True)
+    delta.apply(redo=False)
+
+    assert recorder.created == ["cluster1"]
+    assert [plug for plug, _ in recorder.calls] == ["cluster1.weightList[0].weights[1:2]",
+                                                     "cluster1.weightList[0].weights[7:7]"] * 2
+    assert [value for _, run in recorder.calls[:2] for value in run] == [0.5, 0.25, 1.0]
+    assert [value for _, run in recorder.calls[2:] for value in run] == [0.0, 0.0, 0.0]
+
+
+def test_stack_evicts_oldest_steps():
+    stack = weightUndo.WeightUndoStack(max_bytes=100)
+    delta = weightUndo.WeightDelta("cluster1", "body", None, np.arange(4), np.zeros(4), np.ones(4))
+
+    first = stack.push([delta])
+    second = stack.push([delta])
+    assert stack.nbytes == 2 * delta.nbytes
+    third = stack.push([delta])
+
+    assert first not in stack and second in stack and third in stack
+    assert stack.evicted == 1
+    assert stack.nbytes == 2 * delta.nbytes
+
+
+class RecordingModifier:
+    def __init__(self):
+        self.calls = []
+
+    def doIt(self):
+        self.calls.append("doIt")
+
+    def undoIt(self):
+        self.calls.append("undoIt")
+
+
+def test_modifier_command_keeps_the_modifier(monkeypatch):
+    commands = []
+
+    def run_command():
+        command = weightUndo.ModifierCommand()
+        command.doIt(None)
+        commands.append(command)
+
+    cmds = types.SimpleNamespace(pluginInfo=lambda *args, **kwargs: True, meshDeformerModifier=run_command)
+    monkeypatch.setattr(weightUndo, "cmds", cmds)
+    modifier = RecordingModifier()
+    weightUndo.execute_modifier(modifier)
+
+    command, = commands
+    assert command.isUndoable() and not weightUndo.pending_modifiers
+    command.undoIt()
+    command.redoIt()
+    assert modifier.calls == ["doIt", "undoIt", "doIt"]